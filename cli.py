@@ -82,11 +82,12 @@ def list_purchases():
     cursor.execute("""
         SELECT p.id, p.quantity_bought, p.purchase_date, 
                u.name as buyer_name, u.email as buyer_email,
-               f.name as food_name, f.price, ow.name as owner_name
+               COALESCE(f.name, af.name) as food_name, COALESCE(f.price, af.price), ow.name as owner_name
         FROM purchase p 
         JOIN user u ON p.user_id = u.id
-        JOIN food_listing f ON p.food_id = f.id
-        JOIN user ow ON f.user_id = ow.id
+        LEFT JOIN food_listing f ON p.food_id = f.id
+        LEFT JOIN archived_food_listing af ON p.archived_food_id = af.id
+        JOIN user ow ON COALESCE(f.user_id, af.user_id) = ow.id
         ORDER BY p.purchase_date DESC
     """)
     
@@ -41,7 +41,8 @@ export const AuthProvider: React.FC<{ children: React.ReactNode }> = ({ children
       const backendUserData = await userApi.syncFirebaseUser(
         firebaseUser.uid,
         firebaseUser.email || '',
-        firebaseUser.displayName || firebaseUser.email?.split('@')[0] || 'User'
+        firebaseUser.displayName || firebaseUser.email?.split('@')[0] || 'User',
+        await firebaseUser.getIdToken()
       );
       setBackendUser(backendUserData);
       
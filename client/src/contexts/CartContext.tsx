@@ -215,15 +215,14 @@ export const useCartActions = () => {
     }
 
     try {
-      // Create purchase records for each item in cart
-      for (const item of state.items) {
-        await purchaseApi.createPurchase({
-          user_id: backendUser.id,
+      // Create purchase records for every item in the cart in a single request
+      await purchaseApi.createPurchases(
+        backendUser.id,
+        state.items.map((item) => ({
           food_id: parseInt(item.id),
-          quantity_bought: item.quantity,
-          purchase_date: new Date().toISOString()
-        });
-      }
+          quantity_bought: item.quantity
+        }))
+      );
 
       // Clear cart after successful purchase
       dispatch({ type: 'CLEAR_CART' });
@@ -26,6 +26,7 @@ export interface Purchase {
   user_id: number;
   food_id: number;
   quantity_bought: number;
+  unit_price: number;
   purchase_date: string;
 }
 
@@ -34,14 +35,41 @@ export interface ApiResponse<T> {
   data: T;
 }
 
+export interface PageResponse<T> extends ApiResponse<T[]> {
+  next_cursor: string | null;
+}
+
+// Largest page the list endpoints return
+const PAGE_SIZE = 200;
+
+// List endpoints return one page per request; follow next_cursor until the last page
+async function fetchAllPages<T>(url: string, errorMessage: string, init?: RequestInit): Promise<T[]> {
+  const rows: T[] = [];
+  let cursor: string | null = null;
+  do {
+    const after = cursor ? `&after=${encodeURIComponent(cursor)}` : '';
+    const response = await fetch(`${url}?limit=${PAGE_SIZE}${after}`, init);
+
+    if (!response.ok) {
+      throw new Error(errorMessage);
+    }
+
+    const result: PageResponse<T> = await response.json();
+    rows.push(...result.data);
+    cursor = result.next_cursor;
+  } while (cursor);
+  return rows;
+}
+
 // User API functions
 export const userApi = {
-  // Sync Firebase user with backend
-  async syncFirebaseUser(firebaseUid: string, email: string, name: string): Promise<User> {
+  // Sync Firebase user with backend; the ID token proves the caller owns firebaseUid
+  async syncFirebaseUser(firebaseUid: string, email: string, name: string, idToken?: string): Promise<User> {
     const response = await fetch(`${API_BASE_URL}/users/sync-firebase`, {
       method: 'POST',
       headers: {
         'Content-Type': 'application/json',
+        ...(idToken ? { Authorization: `Bearer ${idToken}` } : {}),
       },
       body: JSON.stringify({
         firebase_uid: firebaseUid,
@@ -84,22 +112,16 @@ export const userApi = {
 
   // Get all users (for admin)
   async getAllUsers(): Promise<User[]> {
-    const response = await fetch(`${API_BASE_URL}/users/`);
-    
-    if (!response.ok) {
-      throw new Error('Failed to fetch users');
-    }
-
-    const result: ApiResponse<User[]> = await response.json();
-    return result.data;
+    return fetchAllPages<User>(`${API_BASE_URL}/users/`, 'Failed to fetch users');
   },
 
-  // Create user
-  async createUser(userData: { name: string; email: string; role: string; firebase_uid?: string }): Promise<User> {
+  // Create user; the server links the Firebase UID named by the ID token
+  async createUser(userData: { name: string; email: string; role: string; firebase_uid?: string }, idToken?: string): Promise<User> {
     const response = await fetch(`${API_BASE_URL}/users/`, {
       method: 'POST',
       headers: {
         'Content-Type': 'application/json',
+        ...(idToken ? { Authorization: `Bearer ${idToken}` } : {}),
       },
       body: JSON.stringify(userData),
     });
@@ -117,14 +139,7 @@ export const userApi = {
 export const foodApi = {
   // Get all food listings
   async getAllFoods(): Promise<FoodListing[]> {
-    const response = await fetch(`${API_BASE_URL}/foods/`);
-    
-    if (!response.ok) {
-      throw new Error('Failed to fetch food listings');
-    }
-
-    const result: ApiResponse<FoodListing[]> = await response.json();
-    return result.data;
+    return fetchAllPages<FoodListing>(`${API_BASE_URL}/foods/`, 'Failed to fetch food listings');
   },
 
   // Get food by ID
@@ -162,14 +177,7 @@ export const foodApi = {
 export const purchaseApi = {
   // Get all purchases
   async getAllPurchases(): Promise<Purchase[]> {
-    const response = await fetch(`${API_BASE_URL}/purchases/`);
-    
-    if (!response.ok) {
-      throw new Error('Failed to fetch purchases');
-    }
-
-    const result: ApiResponse<Purchase[]> = await response.json();
-    return result.data;
+    return fetchAllPages<Purchase>(`${API_BASE_URL}/purchases/`, 'Failed to fetch purchases');
   },
 
   // Create purchase
@@ -189,6 +197,63 @@ export const purchaseApi = {
     const result: ApiResponse<Purchase> = await response.json();
     return result.data;
   },
+
+  // Check out several cart lines in one all-or-nothing request
+  async createPurchases(userId: number, items: { food_id: number; quantity_bought: number }[]): Promise<Purchase[]> {
+    const response = await fetch(`${API_BASE_URL}/purchases/batch`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+      body: JSON.stringify({ user_id: userId, items }),
+    });
+
+    if (!response.ok) {
+      throw new Error('Failed to create purchases');
+    }
+
+    const result: ApiResponse<Purchase[]> = await response.json();
+    return result.data;
+  },
+};
+
+export interface StoreOrder extends Purchase {
+  food: { name: string | null; price: number | null; category: string | null };
+  buyer: { name: string; email: string };
+}
+
+export interface StoreDashboardSummary {
+  listings: { total: number; active: number; urgent: number; units_in_stock: number };
+  orders: { total: number; last_24h: number; units_sold: number; revenue: number };
+}
+
+// Store owner API functions
+export const storeApi = {
+  // Listing and sales totals for a store, aggregated on the server
+  async getDashboard(userId: number): Promise<StoreDashboardSummary> {
+    const response = await fetch(`${API_BASE_URL}/stores/${userId}/dashboard`);
+
+    if (!response.ok) {
+      throw new Error('Failed to fetch store dashboard');
+    }
+
+    const result: ApiResponse<StoreDashboardSummary> = await response.json();
+    return result.data;
+  },
+
+  // Most recent orders for a store's listings, newest first
+  async getOrders(userId: number, idToken?: string, limit = 200): Promise<StoreOrder[]> {
+    const response = await fetch(`${API_BASE_URL}/stores/${userId}/orders?limit=${limit}`, {
+      headers: idToken ? { Authorization: `Bearer ${idToken}` } : {},
+    });
+
+    if (!response.ok) {
+      throw new Error('Failed to fetch store orders');
+    }
+
+    const result: ApiResponse<StoreOrder[]> = await response.json();
+    return result.data;
+  },
 };
 
 export interface SystemStats {
@@ -198,10 +263,16 @@ export interface SystemStats {
   activeUsers: number;
 }
 
+// Signed token from adminLogin, required by every other admin endpoint
+const adminHeaders = (headers: Record<string, string> = {}): Record<string, string> => ({
+  ...headers,
+  Authorization: `Bearer ${localStorage.getItem('admin_token') ?? ''}`,
+});
+
 // Admin API functions
 export const adminApi = {
   // Admin login
-  async adminLogin(email: string, secretKey: string): Promise<{ token: string; user: User }> {
+  async adminLogin(email: string, secretKey: string): Promise<{ admin_token: string; expires_at: string; user: User }> {
     const response = await fetch(`${API_BASE_URL}/admin/login`, {
       method: 'POST',
       headers: {
@@ -214,50 +285,36 @@ export const adminApi = {
       throw new Error('Admin authentication failed');
     }
 
-    const result: ApiResponse<{ token: string; user: User }> = await response.json();
+    const result: ApiResponse<{ admin_token: string; expires_at: string; user: User }> = await response.json();
     return result.data;
   },
 
   // Get all users (admin only)
   async getAllUsers(): Promise<User[]> {
-    const response = await fetch(`${API_BASE_URL}/admin/users`);
-    
-    if (!response.ok) {
-      throw new Error('Failed to fetch users');
-    }
-
-    const result: ApiResponse<User[]> = await response.json();
-    return result.data;
+    return fetchAllPages<User>(`${API_BASE_URL}/admin/users`, 'Failed to fetch users', {
+      headers: adminHeaders(),
+    });
   },
 
   // Get all food listings (admin only)
   async getAllFoods(): Promise<FoodListing[]> {
-    const response = await fetch(`${API_BASE_URL}/admin/foods`);
-    
-    if (!response.ok) {
-      throw new Error('Failed to fetch food listings');
-    }
-
-    const result: ApiResponse<FoodListing[]> = await response.json();
-    return result.data;
+    return fetchAllPages<FoodListing>(`${API_BASE_URL}/admin/foods`, 'Failed to fetch food listings', {
+      headers: adminHeaders(),
+    });
   },
 
   // Get all purchases (admin only)
   async getAllPurchases(): Promise<Purchase[]> {
-    const response = await fetch(`${API_BASE_URL}/admin/purchases`);
-    
-    if (!response.ok) {
-      throw new Error('Failed to fetch purchases');
-    }
-
-    const result: ApiResponse<Purchase[]> = await response.json();
-    return result.data;
+    return fetchAllPages<Purchase>(`${API_BASE_URL}/admin/purchases`, 'Failed to fetch purchases', {
+      headers: adminHeaders(),
+    });
   },
 
   // Delete food listing (admin only)
   async deleteFood(foodId: number): Promise<void> {
     const response = await fetch(`${API_BASE_URL}/admin/foods/${foodId}`, {
       method: 'DELETE',
+      headers: adminHeaders(),
     });
 
     if (!response.ok) {
@@ -269,9 +326,9 @@ export const adminApi = {
   async toggleUserStatus(userId: number): Promise<User> {
     const response = await fetch(`${API_BASE_URL}/admin/users/${userId}/toggle-status`, {
       method: 'PUT',
-      headers: {
+      headers: adminHeaders({
         'Content-Type': 'application/json',
-      },
+      }),
     });
 
     if (!response.ok) {
@@ -284,7 +341,9 @@ export const adminApi = {
 
   // Get system statistics (admin only)
   async getSystemStats(): Promise<SystemStats> {
-    const response = await fetch(`${API_BASE_URL}/admin/stats`);
+    const response = await fetch(`${API_BASE_URL}/admin/stats`, {
+      headers: adminHeaders(),
+    });
     
     if (!response.ok) {
       throw new Error('Failed to fetch system statistics');
@@ -103,7 +103,7 @@ const EnhancedStoreDashboard = () => {
           customerEmail: customer?.email || 'unknown@email.com',
           foodName: food?.name || 'Unknown Food',
           quantity: purchase.quantity_bought,
-          totalAmount: (food?.price || 0) * purchase.quantity_bought,
+          totalAmount: purchase.unit_price * purchase.quantity_bought,
           orderTime: purchase.purchase_date,
           pickupTime: 'ASAP', // Default pickup time
           status: 'pending' as const, // Default status
@@ -55,7 +55,7 @@ const SignInPage = () => {
 
     try {
       const cred = await signInWithEmailAndPassword(auth, values.email, values.password);
-      const backendUser = await userApi.syncFirebaseUser(cred.user.uid, values.email, cred.user.displayName || values.email.split('@')[0]);
+      const backendUser = await userApi.syncFirebaseUser(cred.user.uid, values.email, cred.user.displayName || values.email.split('@')[0], await cred.user.getIdToken());
       
       if (backendUser.role !== 'customer') {
         toast.error("This email is not registered as a customer. Please use the 'Store Owner' tab or a customer email.");
@@ -119,7 +119,7 @@ const SignInPage = () => {
             email: values.email,
             role: 'store_owner',
             firebase_uid: cred.user.uid,
-          });
+          }, await cred.user.getIdToken());
         } catch (createError) {
           toast.error("Failed to create backend user. Please try signing up again.");
           await auth.signOut();
@@ -128,7 +128,7 @@ const SignInPage = () => {
       }
       
       // Sync Firebase user but preserve the store_owner role
-      await userApi.syncFirebaseUser(cred.user.uid, values.email, cred.user.displayName || values.email.split('@')[0]);
+      await userApi.syncFirebaseUser(cred.user.uid, values.email, cred.user.displayName || values.email.split('@')[0], await cred.user.getIdToken());
 
       // Explicitly set the role and backend user in AuthContext
       setUserRole('store_owner');
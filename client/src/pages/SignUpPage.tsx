@@ -67,7 +67,7 @@ const SignUpPage = () => {
           email: values.email,
           role: 'customer',
           firebase_uid: cred.user.uid,
-        });
+        }, await cred.user.getIdToken());
       } catch (error: any) {
         console.error("Backend user creation error:", error);
         // Continue anyway - backend user will be created on first sign-in
@@ -118,7 +118,7 @@ const SignUpPage = () => {
           email: values.email,
           role: 'store_owner',
           firebase_uid: cred.user.uid,
-        });
+        }, await cred.user.getIdToken());
       } catch (error: any) {
         console.error("Backend user creation error:", error);
         // Continue anyway - backend user will be created on first sign-in
@@ -55,12 +55,13 @@ import { toast } from "sonner";
 import { useAuth } from "@/contexts/AuthContext";
 import { signOut } from "firebase/auth";
 import { auth } from "@/firebase-config";
-import { purchaseApi, foodApi, userApi } from "@/lib/api";
+import { storeApi, StoreDashboardSummary } from "@/lib/api";
 
 const StoreDashboard = () => {
   const [activeTab, setActiveTab] = useState("overview");
   const [sidebarOpen, setSidebarOpen] = useState(false);
   const [orders, setOrders] = useState<any[]>([]);
+  const [summary, setSummary] = useState<StoreDashboardSummary | null>(null);
   const [loading, setLoading] = useState(true);
   const [newOrdersCount, setNewOrdersCount] = useState(3);
   const [notifications, setNotifications] = useState([
@@ -89,43 +90,35 @@ const StoreDashboard = () => {
       try {
         setLoading(true);
         
-        // Fetch all foods and purchases in parallel
-        const [foods, purchases, users] = await Promise.all([
-          foodApi.getAllFoods(),
-          purchaseApi.getAllPurchases(),
-          userApi.getAllUsers()
+        // The server filters to this store's listings and joins item and buyer details;
+        // totals come from the dashboard endpoint, since the order list is only the latest page
+        const [storeOrders, storeSummary] = await Promise.all([
+          storeApi.getOrders(backendUser.id, await currentUser?.getIdToken()),
+          storeApi.getDashboard(backendUser.id)
         ]);
-        
-        // Filter foods belonging to this store owner
-        const storeFoods = foods.filter(food => food.user_id === backendUser.id);
-        const storeFoodIds = storeFoods.map(food => food.id);
-        
-        // Filter purchases for this store owner's food listings only
-        const storeOrders = purchases.filter((purchase: any) => 
-          storeFoodIds.includes(purchase.food_id)
-        );
+        setSummary(storeSummary);
 
         // Transform purchases into order format with real data
-        const transformedOrders = storeOrders.map((purchase: any) => {
-          const food = storeFoods.find(f => f.id === purchase.food_id);
-          const customer = users.find(u => u.id === purchase.user_id);
+        const transformedOrders = storeOrders.map((purchase) => {
+          const food = purchase.food;
+          const customer = purchase.buyer;
           const purchaseDate = new Date(purchase.purchase_date);
           
           return {
             id: purchase.id,
-            customerName: customer ? customer.name : `Customer ${purchase.user_id}`,
-            customerEmail: customer ? customer.email : `customer${purchase.user_id}@example.com`,
-            customerPhone: customer ? `+254 ${Math.floor(Math.random() * 1000000000)}` : null,
+            customerName: customer.name,
+            customerEmail: customer.email,
+            customerPhone: `+254 ${Math.floor(Math.random() * 1000000000)}`,
             items: [
               {
-                name: food ? food.name : `Food Item ${purchase.food_id}`,
+                name: food.name ?? `Food Item ${purchase.food_id}`,
                 quantity: purchase.quantity_bought,
-                price: food ? food.price : 0,
+                price: purchase.unit_price,
                 image: null, // Could be added later
-                category: food ? food.category : 'Unknown'
+                category: food.category ?? 'Unknown'
               }
             ],
-            total: food ? food.price * purchase.quantity_bought : 0,
+            total: purchase.unit_price * purchase.quantity_bought,
             status: 'pending', // All new orders start as pending
             orderDate: purchaseDate.toLocaleDateString(),
             orderTime: purchaseDate.toLocaleTimeString(),
@@ -134,9 +127,7 @@ const StoreDashboard = () => {
           };
         });
 
-        // Sort by most recent first
-        transformedOrders.sort((a, b) => new Date(b.orderDate).getTime() - new Date(a.orderDate).getTime());
-        
+        // Already newest first from the server
         setOrders(transformedOrders);
         
         // Update new orders count based on pending orders
@@ -161,7 +152,7 @@ const StoreDashboard = () => {
     };
 
     fetchOrders();
-  }, [backendUser]);
+  }, [backendUser, currentUser]);
 
   const handleLogout = async () => {
     try {
@@ -210,15 +201,15 @@ const StoreDashboard = () => {
   ]);
 
 
-  // Calculate stats from listings and orders
+  // Totals from the server's dashboard summary, falling back to local data until it loads
   const storeStats = {
-    totalListings: listings.length,
-    activeListings: listings.filter(l => l.status === "active").length,
-    soldItems: listings.reduce((sum, l) => sum + l.sold, 0),
-    totalRevenue: orders.filter(o => o.status === 'completed').reduce((sum, o) => sum + o.total, 0),
+    totalListings: summary?.listings.total ?? listings.length,
+    activeListings: summary?.listings.active ?? listings.filter(l => l.status === "active").length,
+    soldItems: summary?.orders.units_sold ?? listings.reduce((sum, l) => sum + l.sold, 0),
+    totalRevenue: summary?.orders.revenue ?? orders.filter(o => o.status === 'completed').reduce((sum, o) => sum + o.total, 0),
     wasteReduced: listings.reduce((sum, l) => sum + (l.sold * 0.5), 0), // Estimate 0.5kg per item
     avgDiscount: Math.round(listings.reduce((sum, l) => sum + ((l.originalPrice - l.discountedPrice) / l.originalPrice * 100), 0) / listings.length),
-    totalOrders: orders.length,
+    totalOrders: summary?.orders.total ?? orders.length,
     pendingOrders: orders.filter(o => o.status === 'pending').length,
     completedOrders: orders.filter(o => o.status === 'completed').length
   };
@@ -0,0 +1,109 @@
+import base64
+import hashlib
+import hmac
+import json
+import secrets
+import time
+from flask import current_app, g, jsonify, request
+
+DEFAULT_TOKEN_TTL = 8 * 3600  # seconds
+
+
+class AdminTokenError(ValueError):
+    """Raised for a missing, malformed, forged or expired admin token"""
+
+
+def parse_token_keys(value):
+    """
+    Signing keys from "kid:secret,kid:secret". The first key signs new tokens;
+    every listed key is accepted, so a key can be rotated by putting the new one
+    first and dropping the old one once its tokens have expired.
+    """
+    keys = []
+    for entry in filter(None, (part.strip() for part in value.split(","))):
+        kid, sep, secret = entry.partition(":")
+        if not sep or not kid or not secret:
+            raise ValueError("ADMIN_TOKEN_KEYS entries must look like kid:secret")
+        keys.append((kid, secret.encode()))
+    return keys
+
+
+def init_admin_tokens(app, value):
+    """
+    Load the signing keys. Without any, a debug app signs with a random
+    per-process key; any other app gets no keys, which disables admin login.
+    """
+    keys = parse_token_keys(value)
+    if not keys:
+        if app.debug:
+            # Fine for development; tokens won't survive a restart or work across workers
+            app.logger.warning("ADMIN_TOKEN_KEYS is not set; using a random per-process admin token key")
+            keys = [("dev", secrets.token_bytes(32))]
+        else:
+            app.logger.error("ADMIN_TOKEN_KEYS is not set; admin login is disabled")
+    app.config["ADMIN_TOKEN_KEYS"] = keys
+    app.config["ADMIN_TOKEN_VERIFY_KEYS"] = dict(keys)
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(data):
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _sign(secret, payload):
+    return hmac.new(secret, payload.encode(), hashlib.sha256).digest()
+
+
+def admin_login_enabled():
+    return bool(current_app.config["ADMIN_TOKEN_KEYS"])
+
+
+def issue_token(user, ttl=None):
+    """Signed token for an admin user; returns (token, expiry as a unix timestamp)"""
+    kid, secret = current_app.config["ADMIN_TOKEN_KEYS"][0]
+    expires = int(time.time()) + (ttl or current_app.config.get("ADMIN_TOKEN_TTL", DEFAULT_TOKEN_TTL))
+    payload = _b64encode(json.dumps(
+        {"sub": user.id, "role": user.role, "exp": expires, "kid": kid},
+        separators=(",", ":")
+    ).encode())
+    return f"{payload}.{_b64encode(_sign(secret, payload))}", expires
+
+
+def verify_token(token):
+    """Claims of a valid token; checked with HMAC only, no database access"""
+    try:
+        payload, signature = token.split(".")
+        claims = json.loads(_b64decode(payload))
+        signature = _b64decode(signature)
+    except ValueError:
+        raise AdminTokenError("Malformed admin token")
+    if not isinstance(claims, dict):
+        raise AdminTokenError("Malformed admin token")
+
+    secret = current_app.config["ADMIN_TOKEN_VERIFY_KEYS"].get(claims.get("kid"))
+    if secret is None or not hmac.compare_digest(_sign(secret, payload), signature):
+        raise AdminTokenError("Invalid admin token")
+    if not isinstance(claims.get("exp"), int) or claims["exp"] <= time.time():
+        raise AdminTokenError("Admin token has expired")
+    return claims
+
+
+def require_admin_token():
+    """before_request guard for admin_bp; the login endpoint is the only way in"""
+    if request.method == "OPTIONS" or request.endpoint == "admin.admin_login":
+        return None
+
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return jsonify({"message": "Admin token required"}), 401
+    try:
+        claims = verify_token(token.strip())
+    except AdminTokenError as err:
+        return jsonify({"message": str(err)}), 401
+    if claims.get("role") != "admin":
+        return jsonify({"message": "Access denied. Admin role required"}), 403
+    g.admin = claims
+    return None
@@ -1,7 +1,18 @@
 from flask import Flask
+import click
 from flask_cors import CORS
 import os
+import tempfile
 from extensions import db, ma  # keep extensions separate
+from search import ensure_search_index
+from migrations import ensure_schema
+from json_provider import make_json_provider
+from versioning import register_version_events, ensure_table_versions
+from counters import ensure_stat_counters
+from admin_auth import init_admin_tokens
+from entity_cache import init_entity_cache
+from firebase_auth import init_firebase_auth
+import transactions  # noqa: F401  (registers SQLite WAL / busy_timeout pragmas)
 
 def create_app():
     app = Flask(__name__)
@@ -19,26 +30,97 @@ def create_app():
     
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+    # Seconds between background listing sweeps (0 = disabled; use `flask sweep-listings` from a scheduler instead)
+    app.config['EXPIRY_SWEEP_INTERVAL'] = int(os.environ.get('EXPIRY_SWEEP_INTERVAL', 0))
+
+    # JSON encoder for requests and responses: 'orjson' (falls back to 'json' if not installed) or 'json'
+    app.config['JSON_PROVIDER'] = os.environ.get('JSON_PROVIDER', 'orjson')
+    app.json = make_json_provider(app)
+
+    # Admin token signing keys "kid:secret,..." (first one signs) and lifetime in seconds
+    init_admin_tokens(app, os.environ.get('ADMIN_TOKEN_KEYS', ''))
+    app.config['ADMIN_TOKEN_TTL'] = int(os.environ.get('ADMIN_TOKEN_TTL', 8 * 3600))
+
+    # Entity cache for user / listing lookups: seconds an entry may be served (0 = off),
+    # entries per model, and an optional redis:// URL for a cache shared by all workers
+    app.config['ENTITY_CACHE_TTL'] = int(os.environ.get('ENTITY_CACHE_TTL', 30))
+    app.config['ENTITY_CACHE_SIZE'] = int(os.environ.get('ENTITY_CACHE_SIZE', 10000))
+    app.config['ENTITY_CACHE_URL'] = os.environ.get('ENTITY_CACHE_URL')
+
+    # Firebase ID tokens (Authorization: Bearer) are verified against this project's audience with
+    # Google's signing keys (FIREBASE_KEYS_URL points elsewhere for tests); set FIREBASE_AUTH_REQUIRED
+    # to reject identity routes that come without one
+    app.config['FIREBASE_PROJECT_ID'] = os.environ.get('FIREBASE_PROJECT_ID', 'lastbite-food-rescue')
+    app.config['FIREBASE_KEYS_URL'] = os.environ.get('FIREBASE_KEYS_URL')
+    app.config['FIREBASE_AUTH_REQUIRED'] = os.environ.get('FIREBASE_AUTH_REQUIRED', '').lower() in ('1', 'true', 'yes')
+
+    # Where background admin exports are written (files are removed after a day)
+    app.config['EXPORT_DIR'] = os.environ.get('EXPORT_DIR', os.path.join(tempfile.gettempdir(), 'lastbite-exports'))
+
+    # Keep trigger-maintained row counts for the admin dashboard (adds a counter write to every insert/delete)
+    app.config['STATS_COUNTERS'] = os.environ.get('STATS_COUNTERS', '').lower() in ('1', 'true', 'yes')
+
     # Initialize extensions
     db.init_app(app)
+    register_version_events()
+    init_entity_cache(app)
     ma.init_app(app)
     CORS(app)
+    init_firebase_auth(app)
 
     # Register blueprints (import inside function to avoid circular imports)
     from routes.foods import food_bp
     from routes.users import user_bp
     from routes.purchases import purchase_bp
     from routes.admin import admin_bp
+    from routes.reservations import reservation_bp
+    from routes.stores import store_bp
 
     app.register_blueprint(food_bp, url_prefix="/api/foods")
     app.register_blueprint(user_bp, url_prefix="/api/users")
     app.register_blueprint(purchase_bp, url_prefix="/api/purchases")
+    app.register_blueprint(reservation_bp, url_prefix="/api/reservations")
+    app.register_blueprint(store_bp, url_prefix="/api/stores")
     app.register_blueprint(admin_bp, url_prefix="/api")
 
     @app.route("/")
     def home():
         return "Last Bite Rescue API is running!"
 
+    @app.cli.command("sweep-listings")
+    def sweep_listings_command():
+        """Archive expired and long-sold-out food listings"""
+        from sweeper import sweep_listings
+        archived = sweep_listings()
+        print(f"Archived {archived} listings")
+
+    @app.cli.command("release-reservations")
+    def release_reservations_command():
+        """Return the stock of expired reservations to their listings"""
+        from inventory import release_expired_reservations
+        released = release_expired_reservations()
+        print(f"Released {released} expired reservations")
+
+    @app.cli.command("sweep-idempotency-keys")
+    def sweep_idempotency_keys_command():
+        """Delete expired Idempotency-Key records"""
+        from idempotency import sweep_idempotency_keys
+        removed = sweep_idempotency_keys()
+        print(f"Removed {removed} expired idempotency keys")
+
+    @app.cli.command("backfill-sales")
+    @click.option("--from", "start", type=click.DateTime(formats=["%Y-%m-%d"]), help="first day to rebuild (UTC)")
+    @click.option("--to", "end", type=click.DateTime(formats=["%Y-%m-%d"]), help="last day to rebuild (UTC)")
+    def backfill_sales_command(start, end):
+        """Rebuild the sales rollup from purchase history"""
+        from rollups import backfill_sales
+        written = backfill_sales(start and start.date(), end and end.date())
+        print(f"Wrote {written} sales rollup rows")
+
+    if app.config['EXPIRY_SWEEP_INTERVAL'] > 0:
+        from sweeper import start_sweeper
+        start_sweeper(app, app.config['EXPIRY_SWEEP_INTERVAL'])
+
     return app
 
 
@@ -48,6 +130,10 @@ app = create_app()
 # Initialize database tables
 with app.app_context():
     db.create_all()
+    ensure_schema()
+    ensure_search_index()
+    ensure_table_versions()
+    ensure_stat_counters()
 
 if __name__ == "__main__":
     app.run(debug=True)
\ No newline at end of file
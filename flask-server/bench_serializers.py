@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Compare list serialization throughput: marshmallow schema dump of ORM
+objects vs. RowSerializer over plain column tuples.
+Usage: python bench_serializers.py [rows]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+# Benchmark against a throwaway SQLite database, never the real one
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db")
+
+from app import app
+from extensions import db
+from models import User, FoodListing, Purchase
+from schemas import UserSchema, FoodListingSchema, PurchaseSchema
+from serializers import RowSerializer
+
+
+def seed(rows):
+    owner = User(name="Bench Store", email="bench@store.test", role="store_owner")
+    db.session.add(owner)
+    db.session.flush()
+    db.session.execute(db.insert(FoodListing), [
+        {"name": f"Item {i}", "description": "Benchmark listing", "category": "Bakery",
+         "user_id": owner.id, "stock": 10, "price": 1.5 + i % 7,
+         "expiry_date": date.today() + timedelta(days=i % 30)}
+        for i in range(rows)
+    ])
+    db.session.execute(db.insert(Purchase), [
+        {"user_id": owner.id, "food_id": i % rows + 1, "quantity_bought": 1, "unit_price": 1.5 + i % rows % 7}
+        for i in range(rows)
+    ])
+    db.session.commit()
+
+
+def bench(label, fn, rows):
+    db.session.expunge_all()
+    start = time.perf_counter()
+    data = fn()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<16} {elapsed * 1000:8.1f} ms  {rows / elapsed:12,.0f} rows/s")
+    return data
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    with app.app_context():
+        seed(rows)
+        for model, schema in [(FoodListing, FoodListingSchema()), (Purchase, PurchaseSchema()), (User, UserSchema())]:
+            count = model.query.count()
+            fast = RowSerializer(schema)
+            print(f"{model.__name__} ({count} rows)")
+            before = bench("schema.dump", lambda: schema.dump(model.query.order_by(model.id).all(), many=True), count)
+            after = bench("RowSerializer", lambda: fast.dump_many(fast.query().order_by(model.id).all()), count)
+            same = json.dumps(before, sort_keys=True) == json.dumps(after, sort_keys=True)
+            print(f"  identical output: {same}")
+
+
+if __name__ == "__main__":
+    main()
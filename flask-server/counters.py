@@ -0,0 +1,118 @@
+from flask import current_app
+from sqlalchemy import select, text
+from extensions import db
+from models import StatCounter
+
+# Tables whose row counts are kept; users are also counted per role as "user:<role>"
+COUNTED_TABLES = ["user", "food_listing", "purchase"]
+
+SQLITE_UPSERT = (
+    "INSERT INTO stat_counter(name, value) VALUES ({name}, {delta}) "
+    "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value;"
+)
+
+SQLITE_SETUP = [
+    f"""CREATE TRIGGER IF NOT EXISTS stat_counter_{table}_ai AFTER INSERT ON "{table}" BEGIN
+        {SQLITE_UPSERT.format(name=repr(table), delta=1)}
+    END""" for table in COUNTED_TABLES
+] + [
+    f"""CREATE TRIGGER IF NOT EXISTS stat_counter_{table}_ad AFTER DELETE ON "{table}" BEGIN
+        {SQLITE_UPSERT.format(name=repr(table), delta=-1)}
+    END""" for table in COUNTED_TABLES
+] + [
+    f"""CREATE TRIGGER IF NOT EXISTS stat_counter_user_role_ai AFTER INSERT ON "user" BEGIN
+        {SQLITE_UPSERT.format(name="'user:' || new.role", delta=1)}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS stat_counter_user_role_ad AFTER DELETE ON "user" BEGIN
+        {SQLITE_UPSERT.format(name="'user:' || old.role", delta=-1)}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS stat_counter_user_role_au AFTER UPDATE OF role ON "user"
+        WHEN old.role IS NOT new.role BEGIN
+        {SQLITE_UPSERT.format(name="'user:' || old.role", delta=-1)}
+        {SQLITE_UPSERT.format(name="'user:' || new.role", delta=1)}
+    END""",
+]
+SQLITE_TRIGGERS = [
+    f"stat_counter_{table}_{event}" for table in COUNTED_TABLES for event in ("ai", "ad")
+] + ["stat_counter_user_role_ai", "stat_counter_user_role_ad", "stat_counter_user_role_au"]
+
+POSTGRES_FUNCTION = """CREATE OR REPLACE FUNCTION stat_counter_bump() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP <> 'UPDATE' THEN
+        INSERT INTO stat_counter AS c (name, value)
+        VALUES (TG_TABLE_NAME, CASE TG_OP WHEN 'DELETE' THEN -1 ELSE 1 END)
+        ON CONFLICT (name) DO UPDATE SET value = c.value + excluded.value;
+    END IF;
+    IF TG_TABLE_NAME = 'user' THEN
+        IF TG_OP <> 'INSERT' THEN
+            INSERT INTO stat_counter AS c (name, value) VALUES ('user:' || OLD.role, -1)
+            ON CONFLICT (name) DO UPDATE SET value = c.value + excluded.value;
+        END IF;
+        IF TG_OP <> 'DELETE' THEN
+            INSERT INTO stat_counter AS c (name, value) VALUES ('user:' || NEW.role, 1)
+            ON CONFLICT (name) DO UPDATE SET value = c.value + excluded.value;
+        END IF;
+    END IF;
+    RETURN NULL;
+END $$"""
+
+POSTGRES_SETUP = [POSTGRES_FUNCTION] + [
+    f"""CREATE TRIGGER stat_counter_{table} AFTER INSERT OR DELETE ON "{table}"
+        FOR EACH ROW EXECUTE FUNCTION stat_counter_bump()""" for table in COUNTED_TABLES
+] + [
+    """CREATE TRIGGER stat_counter_user_role AFTER UPDATE OF role ON "user"
+        FOR EACH ROW WHEN (OLD.role IS DISTINCT FROM NEW.role) EXECUTE FUNCTION stat_counter_bump()""",
+]
+POSTGRES_TRIGGERS = [(f"stat_counter_{table}", table) for table in COUNTED_TABLES] + [("stat_counter_user_role", "user")]
+
+
+def _recount(conn):
+    """Replace every counter with a fresh COUNT(*) (runs once, when the triggers are installed)"""
+    conn.execute(text("DELETE FROM stat_counter"))
+    for table in COUNTED_TABLES:
+        conn.execute(text(f'INSERT INTO stat_counter(name, value) SELECT :name, count(*) FROM "{table}"'), {"name": table})
+    conn.execute(text(
+        """INSERT INTO stat_counter(name, value) SELECT 'user:' || role, count(*) FROM "user" GROUP BY role"""
+    ))
+
+
+def ensure_stat_counters():
+    """
+    Install (STATS_COUNTERS on) or remove (off) the triggers that keep stat_counter
+    in step with inserts and deletes. Counts are rebuilt whenever the triggers are
+    (re)installed, so turning the option off and on again never leaves them stale.
+    Safe to run on every start.
+    """
+    enabled = current_app.config.get("STATS_COUNTERS", False)
+    dialect = db.engine.dialect.name
+    if dialect == "sqlite":
+        with db.engine.begin() as conn:
+            installed = conn.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'stat_counter_user_ai'"
+            )).first() is not None
+            if enabled and not installed:
+                for statement in SQLITE_SETUP:
+                    conn.execute(text(statement))
+                _recount(conn)
+            elif installed and not enabled:
+                for name in SQLITE_TRIGGERS:
+                    conn.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+    elif dialect == "postgresql":
+        with db.engine.begin() as conn:
+            installed = conn.execute(text(
+                "SELECT 1 FROM pg_trigger WHERE tgname = 'stat_counter_user'"
+            )).first() is not None
+            if enabled and not installed:
+                # CREATE TRIGGER locks each table against writes until commit, so the
+                # recount below can't miss a row that the triggers didn't see
+                for statement in POSTGRES_SETUP:
+                    conn.execute(text(statement))
+                _recount(conn)
+            elif installed and not enabled:
+                for name, table in POSTGRES_TRIGGERS:
+                    conn.execute(text(f'DROP TRIGGER IF EXISTS {name} ON "{table}"'))
+
+
+def counter(name):
+    """Scalar subquery reading one counter (0 when it has never been written)"""
+    return db.func.coalesce(select(StatCounter.value).where(StatCounter.name == name).scalar_subquery(), 0)
@@ -0,0 +1,310 @@
+import json
+import logging
+from datetime import date, datetime
+from types import SimpleNamespace
+from flask import g, has_app_context
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+from cache import LRUCache
+from extensions import db
+from models import User, FoodListing
+
+try:
+    import redis
+except ImportError:  # the shared tier is optional
+    redis = None
+
+log = logging.getLogger(__name__)
+
+DEFAULT_TTL = 30        # seconds an entry may be served before it is re-read
+DEFAULT_MAXSIZE = 10000
+NEGATIVE_TTL = 5        # lookups that found nothing are remembered for at most this long
+ALL = "all"             # invalidate every cached row of a model
+
+_caches = {}
+
+
+class RedisBackend:
+    """Shared cache tier so workers can fill entries for each other; values are JSON"""
+
+    def __init__(self, url, ttl):
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+
+    def get(self, key):
+        value = self.client.get(key)
+        return None if value is None else json.loads(value)
+
+    def set(self, key, value):
+        self.client.set(key, json.dumps(value, default=lambda v: v.isoformat()), ex=self.ttl)
+
+    def delete(self, keys):
+        if keys:
+            self.client.delete(*keys)
+
+    def delete_prefix(self, prefix):
+        keys = list(self.client.scan_iter(match=prefix + "*", count=1000))
+        self.delete(keys)
+
+
+class EntityCache:
+    """
+    Read-through cache of one model's rows, by primary key and by unique columns.
+    Lookups return a read-only snapshot (attribute access, dumpable by the model's
+    schema), never a session-bound instance, so writes must still load the row
+    through the session. Entries are dropped when a transaction that changed them
+    commits (see register_cache_events); reads inside a transaction that has
+    written the table go straight to the database so it sees its own changes.
+    get_by also remembers values that matched no row, until the next committed
+    write to the table or NEGATIVE_TTL, whichever comes first.
+
+    Entries are tagged with the table's version counter when a @versioned view
+    read it first; such views only get entries read at the version their ETag
+    names, so a body is never older than its ETag. Columns in `exclude` (counts
+    that change on every sale) are not cached at all.
+    """
+
+    def __init__(self, model, unique_keys=(), exclude=()):
+        self.model = model
+        self.name = model.__table__.name
+        self.columns = [column for column in model.__table__.columns if column.key not in exclude]
+        self.primary_key = model.__table__.primary_key.columns.values()[0]
+        self.unique_keys = tuple(unique_keys)
+        self.shared = None
+        self.shared_hits = 0
+        self._generation = 0
+        self.configure(DEFAULT_MAXSIZE, DEFAULT_TTL)
+        _caches[self.name] = self
+
+    def configure(self, maxsize, ttl, shared=None):
+        self.enabled = ttl > 0
+        self.entries = LRUCache(maxsize=maxsize, ttl=ttl)
+        self.index = LRUCache(maxsize=maxsize, ttl=ttl)  # unique value -> primary key
+        self.negative = LRUCache(maxsize=maxsize, ttl=min(ttl, NEGATIVE_TTL))
+        self.shared = shared
+        self.shared_hits = 0
+
+    # Shared keys have no generation so every worker agrees on them
+    def _shared_key(self, *parts):
+        return ":".join(["entity", self.name] + [str(part) for part in parts])
+
+    def _local_key(self, *parts):
+        return (self._generation,) + parts
+
+    def _bypass(self):
+        return not self.enabled or self.name in db.session.info.get("entity_writes", ())
+
+    def _version(self):
+        """Version counter of the table read by the current @versioned view, else None"""
+        if not has_app_context():
+            return None
+        return g.get("table_versions", {}).get(self.name)
+
+    def _load(self, condition):
+        row = db.session.execute(select(*self.columns).where(condition).limit(1)).mappings().first()
+        return None if row is None else dict(row)
+
+    def _from_shared(self, key):
+        try:
+            entry = self.shared.get(key)
+        except Exception:
+            log.warning("Shared entity cache unavailable", exc_info=True)
+            return None
+        if entry is not None:
+            # JSON has no dates; restore them from the column types
+            values = entry["values"]
+            for column in self.columns:
+                value = values.get(column.key)
+                if isinstance(value, str) and column.type.python_type in (date, datetime):
+                    values[column.key] = column.type.python_type.fromisoformat(value)
+        return entry
+
+    def _store(self, values, version):
+        pk = values[self.primary_key.key]
+        entry = {"version": version, "values": values}
+        self.entries.set(self._local_key(pk), entry)
+        for key in self.unique_keys:
+            if values.get(key) is not None:
+                self.index.set(self._local_key(key, values[key]), pk)
+        if self.shared is not None:
+            try:
+                self.shared.set(self._shared_key(pk), entry)
+            except Exception:
+                log.warning("Shared entity cache unavailable", exc_info=True)
+
+    def get(self, pk):
+        """Snapshot of the row with this primary key, or None"""
+        if pk is None:
+            return None
+        if self._bypass():
+            values = self._load(self.primary_key == pk)
+            return None if values is None else SimpleNamespace(**values)
+
+        version = self._version()
+        entry = self.entries.get(self._local_key(pk))
+        if entry is None and self.shared is not None:
+            entry = self._from_shared(self._shared_key(pk))
+            if entry is not None:
+                self.shared_hits += 1
+                self.entries.set(self._local_key(pk), entry)
+        if entry is None or (version is not None and entry["version"] != version):
+            values = self._load(self.primary_key == pk)
+            if values is None:
+                return None
+            self._store(values, version)
+            return SimpleNamespace(**values)
+        return SimpleNamespace(**entry["values"])
+
+    def get_by(self, key, value):
+        """Snapshot of the row whose unique column `key` equals `value`, or None"""
+        column = self.model.__table__.c[key]
+        if self._bypass():
+            values = self._load(column == value)
+            return None if values is None else SimpleNamespace(**values)
+
+        version = self._version()
+        pk = self.index.get(self._local_key(key, value))
+        if pk is not None:
+            entity = self.get(pk)
+            # The index is never invalidated; a changed or deleted row just misses here
+            if entity is not None and getattr(entity, key) == value:
+                return entity
+        else:
+            missing = self.negative.get((key, value))
+            if missing is not None and (version is None or missing[0] == version):
+                return None
+        values = self._load(column == value)
+        if values is None:
+            self.negative.set((key, value), (version,))
+            return None
+        self._store(values, version)
+        return SimpleNamespace(**values)
+
+    def forget_missing(self, key, value):
+        """Drop a remembered miss, once the caller knows a row with `value` exists"""
+        self.negative.delete((key, value))
+
+    def prime(self, values):
+        """Cache a row the caller has just read or written (after its commit)"""
+        if not self._bypass():
+            self._store(values, None)
+
+    def mark_changed(self, pks):
+        """Drop these rows when the current transaction commits, for writes the session events can't see"""
+        _note(db.session, self.name, pks)
+
+    def invalidate(self, pks):
+        # Any committed write may have created a row a negative entry says is missing
+        self.negative.clear()
+        if pks == ALL:
+            self._generation += 1
+            if self.shared is not None:
+                try:
+                    self.shared.delete_prefix(self._shared_key())
+                except Exception:
+                    log.warning("Shared entity cache unavailable", exc_info=True)
+            return
+        for pk in pks:
+            self.entries.delete(self._local_key(pk))
+        if self.shared is not None and pks:
+            try:
+                self.shared.delete([self._shared_key(pk) for pk in pks])
+            except Exception:
+                log.warning("Shared entity cache unavailable", exc_info=True)
+
+    def stats(self):
+        return {
+            "hits": self.entries.hits,
+            "shared_hits": self.shared_hits,
+            "negative_hits": self.negative.hits,
+            "misses": self.entries.misses - self.shared_hits,
+            "size": len(self.entries),
+        }
+
+
+user_cache = EntityCache(User, unique_keys=["email", "firebase_uid"])
+# Stock changes on every sale and is read fresh where it matters
+food_cache = EntityCache(FoodListing, exclude=["stock"])
+
+
+def cache_stats():
+    return {name: cache.stats() for name, cache in _caches.items()}
+
+
+def _note(session, name, pks):
+    """Remember rows of a cached table this transaction changed (ALL when unknown)"""
+    session.info.setdefault("entity_writes", set()).add(name)
+    pending = session.info.setdefault("entity_invalidations", {})
+    current = pending.get(name, set())
+    if pks == ALL or current == ALL:
+        pending[name] = ALL
+    else:
+        pending[name] = current | set(pks)
+
+
+def _after_flush(session, flush_context):
+    for instance in session.new:
+        if instance.__table__.name in _caches:
+            _note(session, instance.__table__.name, ())
+    for instance in list(session.dirty) + list(session.deleted):
+        cache = _caches.get(instance.__table__.name)
+        if cache is not None:
+            _note(session, cache.name, [getattr(instance, cache.primary_key.key)])
+
+
+def _do_orm_execute(state):
+    """
+    Bulk statements skip the flush. They can name the rows they touch with the
+    `entity_ids` execution option; bulk UPDATE by primary key carries them in its
+    parameters; anything else invalidates the whole table.
+    """
+    if not (state.is_insert or state.is_update or state.is_delete):
+        return
+    table = getattr(state.statement, "table", None)
+    cache = _caches.get(getattr(table, "name", None))
+    if cache is None:
+        return
+    if state.is_insert:
+        _note(state.session, cache.name, ())
+        return
+    pks = state.execution_options.get("entity_ids")
+    key = cache.primary_key.key
+    if pks is None and isinstance(state.parameters, list) and all(key in params for params in state.parameters):
+        pks = [params[key] for params in state.parameters]
+    _note(state.session, cache.name, ALL if pks is None else pks)
+
+
+def _after_commit(session):
+    session.info.pop("entity_writes", None)
+    for name, pks in session.info.pop("entity_invalidations", {}).items():
+        _caches[name].invalidate(pks)
+
+
+def _after_rollback(session, previous_transaction):
+    # A savepoint rollback leaves the outer transaction's writes in place
+    if previous_transaction.parent is not None:
+        return
+    # Nothing was written, and nothing written was cached (those reads bypass the cache)
+    session.info.pop("entity_writes", None)
+    session.info.pop("entity_invalidations", None)
+
+
+def init_entity_cache(app):
+    """Size the caches from config, connect the optional shared tier and hook the session"""
+    ttl = app.config.get("ENTITY_CACHE_TTL", DEFAULT_TTL)
+    maxsize = app.config.get("ENTITY_CACHE_SIZE", DEFAULT_MAXSIZE)
+    shared = None
+    url = app.config.get("ENTITY_CACHE_URL")
+    if url and ttl > 0:
+        if redis is None:
+            app.logger.warning("ENTITY_CACHE_URL is set but the redis package is not installed; using the local cache only")
+        else:
+            shared = RedisBackend(url, ttl)
+    for cache in _caches.values():
+        cache.configure(maxsize, ttl, shared)
+
+    if not event.contains(Session, "after_commit", _after_commit):
+        event.listen(Session, "after_flush", _after_flush)
+        event.listen(Session, "do_orm_execute", _do_orm_execute)
+        event.listen(Session, "after_commit", _after_commit)
+        event.listen(Session, "after_soft_rollback", _after_rollback)
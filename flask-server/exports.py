@@ -0,0 +1,220 @@
+import csv
+import io
+import os
+import re
+import secrets
+import threading
+import time
+from datetime import date, datetime, timedelta
+from flask import current_app
+from models import User, FoodListing, Purchase
+from schemas import UserSchema, FoodListingSchema, PurchaseSchema
+from serializers import RowSerializer
+from streaming import NDJSON_MIMETYPE, STREAM_BATCH_SIZE
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet exports are optional
+    pa = pq = None
+
+# entity -> (serializer, timestamp column that ?from= / ?to= filter on)
+EXPORTS = {
+    "users": (RowSerializer(UserSchema()), User.created_at),
+    "foods": (RowSerializer(FoodListingSchema()), FoodListing.created_at),
+    "purchases": (RowSerializer(PurchaseSchema()), Purchase.purchase_date),
+}
+
+FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": (NDJSON_MIMETYPE, "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+JOB_ID = re.compile(r"^[0-9a-f]{32}$")
+JOB_TTL = timedelta(hours=24)
+
+
+def _batches(entity, start, end):
+    """Raw rows of `entity` created between the two dates, STREAM_BATCH_SIZE at a time"""
+    serializer, created = EXPORTS[entity]
+    query = serializer.query(extra=[serializer.primary_key])
+    if start is not None:
+        query = query.filter(created >= datetime.combine(start, datetime.min.time()))
+    if end is not None:
+        query = query.filter(created < datetime.combine(end + timedelta(days=1), datetime.min.time()))
+    # yield_per streams from a server-side cursor where the driver has one
+    query = query.order_by(serializer.primary_key).yield_per(STREAM_BATCH_SIZE)
+
+    batch = []
+    for row in query:
+        batch.append(row)
+        if len(batch) >= STREAM_BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _csv_chunks(serializer, batches):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=serializer.keys)
+    writer.writeheader()
+    for batch in batches:
+        writer.writerows(serializer.dump_many(batch))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _ndjson_chunks(serializer, batches):
+    dumps = current_app.json.dumps
+    for batch in batches:
+        yield "".join(dumps(item) + "\n" for item in serializer.dump_many(batch))
+
+
+class _ChunkSink:
+    """Write-only file object that hands back whatever was written since the last drain()"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def writable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _arrow_schema(serializer):
+    types = {
+        int: pa.int64(), float: pa.float64(), str: pa.string(), bool: pa.bool_(),
+        date: pa.date32(), datetime: pa.timestamp("us"),
+    }
+    return pa.schema([
+        (name, types[column.type.python_type])
+        for name, column in zip(serializer.keys, serializer.columns)
+    ])
+
+
+def _parquet_chunks(serializer, batches):
+    """One Parquet row group per batch, each yielded as soon as it's written; the footer comes last"""
+    schema = _arrow_schema(serializer)
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema)
+    try:
+        for batch in batches:
+            # Raw column values, not the JSON-ready dump, so types survive
+            columns = [pa.array([row[i] for row in batch], type=field.type) for i, field in enumerate(schema)]
+            writer.write_batch(pa.record_batch(columns, schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def export_chunks(entity, fmt, start=None, end=None):
+    """Generate the whole export as str (csv, ndjson) or bytes (parquet) chunks"""
+    serializer = EXPORTS[entity][0]
+    batches = _batches(entity, start, end)
+    if fmt == "csv":
+        return _csv_chunks(serializer, batches)
+    if fmt == "parquet":
+        return _parquet_chunks(serializer, batches)
+    return _ndjson_chunks(serializer, batches)
+
+
+def parquet_available():
+    return pq is not None
+
+
+def _export_dir():
+    path = current_app.config["EXPORT_DIR"]
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _remove_old_jobs(path):
+    cutoff = time.time() - JOB_TTL.total_seconds()
+    for name in os.listdir(path):
+        full = os.path.join(path, name)
+        try:
+            if os.path.getmtime(full) < cutoff:
+                os.remove(full)
+        except OSError:
+            pass
+
+
+def start_export_job(entity, fmt, start=None, end=None):
+    """
+    Write the export to EXPORT_DIR on a background thread and return its job id.
+    Job state lives in the file names (`.part` while running, `.error` on
+    failure), so any worker process on the host can report on it.
+    """
+    app = current_app._get_current_object()
+    path = _export_dir()
+    _remove_old_jobs(path)
+
+    job_id = secrets.token_hex(16)
+    final = os.path.join(path, f"{job_id}.{entity}.{FORMATS[fmt][1]}")
+    partial = final + ".part"
+
+    def run():
+        with app.app_context():
+            try:
+                if fmt == "parquet":
+                    out = open(partial, "wb")
+                else:
+                    out = open(partial, "w", newline="", encoding="utf-8")
+                with out:
+                    for chunk in export_chunks(entity, fmt, start, end):
+                        out.write(chunk)
+                os.replace(partial, final)
+            except Exception as err:
+                app.logger.exception("Export job %s failed", job_id)
+                with open(os.path.join(path, f"{job_id}.error"), "w") as out:
+                    out.write(str(err))
+                if os.path.exists(partial):
+                    os.remove(partial)
+
+    open(partial, "w").close()  # visible as running before the thread starts
+    threading.Thread(target=run, name=f"export-{job_id}", daemon=True).start()
+    return job_id
+
+
+def export_job_status(job_id):
+    """(status, path or error message) for a job; status is None for unknown ids"""
+    if not JOB_ID.match(job_id):
+        return None, None
+    path = _export_dir()
+    for name in os.listdir(path):
+        if not name.startswith(job_id + "."):
+            continue
+        full = os.path.join(path, name)
+        if name.endswith(".part"):
+            return "running", None
+        if name.endswith(".error"):
+            with open(full) as error:
+                return "failed", error.read()
+        return "done", full
+    return None, None
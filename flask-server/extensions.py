@@ -1,6 +1,14 @@
 # extensions.py
 from flask_sqlalchemy import SQLAlchemy
 from flask_marshmallow import Marshmallow
+from sqlalchemy.dialects import postgresql, sqlite
 
 db = SQLAlchemy()
 ma = Marshmallow()
+
+
+def upsert(model):
+    """INSERT for the current database that supports on_conflict_do_update / _do_nothing"""
+    if db.engine.dialect.name == "postgresql":
+        return postgresql.insert(model)
+    return sqlite.insert(model)
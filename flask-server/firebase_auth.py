@@ -0,0 +1,230 @@
+import json
+import logging
+import re
+import threading
+import time
+import urllib.request
+import jwt
+from flask import current_app, g, jsonify, request
+from sqlalchemy import select
+from cache import LRUCache
+from extensions import db
+from models import User
+
+log = logging.getLogger(__name__)
+
+# Google's signing keys for Firebase ID tokens, as JWKs (the same keys as the x509 endpoint)
+GOOGLE_KEYS_URL = "https://www.googleapis.com/service_accounts/v1/jwk/securetoken@system.gserviceaccount.com"
+ISSUER_PREFIX = "https://securetoken.google.com/"
+
+DEFAULT_KEYS_TTL = 3600  # when the response carries no max-age
+MIN_KEYS_REFRESH = 60    # never refetch more often than this, even for an unknown kid
+FETCH_TIMEOUT = 5
+CLOCK_SKEW = 10          # seconds iat / auth_time may be ahead of our clock
+VERIFIED_TOKENS = 10000  # memoized tokens per process
+
+MAX_AGE = re.compile(r"max-age=(\d+)")
+
+
+class FirebaseTokenError(ValueError):
+    """Raised for a missing, malformed, forged or expired Firebase ID token"""
+
+
+class FirebaseKeysError(RuntimeError):
+    """Raised when the signing keys can't be fetched and none are cached"""
+
+
+def _cache_lifetime(headers):
+    """Seconds the key response may be reused, from Cache-Control max-age less Age"""
+    match = MAX_AGE.search(headers.get("Cache-Control", ""))
+    if match is None:
+        return DEFAULT_KEYS_TTL
+    try:
+        age = int(headers.get("Age", 0))
+    except ValueError:
+        age = 0
+    return max(int(match.group(1)) - age, MIN_KEYS_REFRESH)
+
+
+class SigningKeys:
+    """Google's public keys by kid, refetched when their HTTP cache lifetime runs out"""
+
+    def __init__(self, url):
+        self.url = url
+        self.keys = {}
+        self.expires = 0
+        self.fetched = 0
+        self._lock = threading.Lock()
+
+    def _stale(self, kid, now):
+        return now >= self.expires or (kid not in self.keys and now - self.fetched >= MIN_KEYS_REFRESH)
+
+    def get(self, kid):
+        if self._stale(kid, time.time()):
+            with self._lock:
+                # Another thread may have refreshed while we waited
+                if self._stale(kid, time.time()):
+                    self._refresh()
+        return self.keys.get(kid)
+
+    def _refresh(self):
+        now = time.time()
+        try:
+            with urllib.request.urlopen(self.url, timeout=FETCH_TIMEOUT) as response:
+                body = json.load(response)
+                lifetime = _cache_lifetime(response.headers)
+            keys = {jwk["kid"]: jwt.PyJWK(jwk, algorithm="RS256").key for jwk in body["keys"] if jwk.get("kty") == "RSA"}
+        except (OSError, ValueError, KeyError, TypeError, jwt.PyJWKError) as err:
+            self.fetched = now
+            if not self.keys:
+                raise FirebaseKeysError(f"Could not fetch Firebase signing keys: {err}")
+            # Keep the keys we have and try again shortly
+            log.warning("Could not refresh Firebase signing keys: %s", err)
+            self.expires = now + MIN_KEYS_REFRESH
+            return
+        self.keys = keys
+        self.fetched = now
+        self.expires = now + lifetime
+
+
+class FirebaseVerifier:
+    """
+    Verifies Firebase ID tokens in-process with PyJWT: RS256 signature against the
+    cached signing keys, then the audience, issuer and time claims. Verified tokens
+    are memoized until they expire, so a client's repeat requests cost a dict lookup.
+    """
+
+    def __init__(self, project_id, keys_url=GOOGLE_KEYS_URL):
+        self.project_id = project_id
+        self.keys = SigningKeys(keys_url)
+        self.verified = LRUCache(maxsize=VERIFIED_TOKENS)
+
+    def verify(self, token):
+        claims = self.verified.get(token)
+        if claims is not None:
+            return claims
+
+        try:
+            header = jwt.get_unverified_header(token)
+        except jwt.InvalidTokenError:
+            raise FirebaseTokenError("Malformed ID token")
+        if header.get("alg") != "RS256":
+            raise FirebaseTokenError("ID token must be signed with RS256")
+        kid = header.get("kid")
+        if not isinstance(kid, str):
+            raise FirebaseTokenError("ID token has no valid key id")
+
+        key = self.keys.get(kid)
+        if key is None:
+            raise FirebaseTokenError("ID token was signed with an unknown key")
+        try:
+            # iat is checked below, with some allowance for clock skew
+            claims = jwt.decode(
+                token, key, algorithms=["RS256"], audience=self.project_id,
+                issuer=ISSUER_PREFIX + self.project_id,
+                options={"require": ["exp", "iat", "sub"], "verify_iat": False},
+            )
+        except jwt.ExpiredSignatureError:
+            raise FirebaseTokenError("ID token has expired")
+        except jwt.InvalidAudienceError:
+            raise FirebaseTokenError("ID token was issued for another project")
+        except jwt.InvalidIssuerError:
+            raise FirebaseTokenError("ID token has the wrong issuer")
+        except jwt.InvalidSignatureError:
+            raise FirebaseTokenError("Invalid ID token signature")
+        except jwt.InvalidTokenError:
+            raise FirebaseTokenError("Malformed ID token")
+
+        self._check_claims(claims)
+        self.verified.set(token, claims, ttl=claims["exp"] - time.time())
+        return claims
+
+    def _check_claims(self, claims):
+        """What PyJWT leaves to us: Firebase's subject rules and iat / auth_time"""
+        now = time.time()
+        sub = claims.get("sub")
+        if not isinstance(sub, str) or not sub or len(sub) > 128:
+            raise FirebaseTokenError("ID token has no valid subject")
+        for name in ("exp", "iat", "auth_time"):
+            if not isinstance(claims.get(name), int):
+                raise FirebaseTokenError(f"ID token has no valid {name}")
+        if claims["iat"] > now + CLOCK_SKEW or claims["auth_time"] > now + CLOCK_SKEW:
+            raise FirebaseTokenError("ID token was issued in the future")
+
+
+def init_firebase_auth(app):
+    app.extensions["firebase_auth"] = FirebaseVerifier(
+        app.config["FIREBASE_PROJECT_ID"], app.config.get("FIREBASE_KEYS_URL") or GOOGLE_KEYS_URL
+    )
+    app.before_request(authenticate_firebase_request)
+
+
+def verify_id_token(token):
+    """Claims of a valid Firebase ID token; the uid is claims["sub"]"""
+    return current_app.extensions["firebase_auth"].verify(token)
+
+
+def authenticate_firebase_request():
+    """
+    before_request: verify a Firebase ID token sent as `Authorization: Bearer`
+    and put its claims on g.firebase. Requests without one pass through;
+    routes that act on a Firebase identity call check_firebase_identity.
+    Admin routes carry their own tokens and are skipped.
+    """
+    g.firebase = None
+    if request.method == "OPTIONS" or request.blueprint == "admin":
+        return None
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        g.firebase = verify_id_token(token.strip())
+    except FirebaseTokenError as err:
+        return jsonify({"message": str(err)}), 401
+    except FirebaseKeysError:
+        log.exception("Firebase ID token could not be verified")
+        return jsonify({"message": "Authentication is temporarily unavailable"}), 503
+    return None
+
+
+def check_firebase_identity(firebase_uid, email=None):
+    """
+    Error response if this request may not act as `firebase_uid`, else None.
+    A verified token must name that uid (and email, when given); without a
+    token the request is only allowed while FIREBASE_AUTH_REQUIRED is off.
+    """
+    claims = g.get("firebase")
+    if claims is None:
+        if current_app.config.get("FIREBASE_AUTH_REQUIRED"):
+            return jsonify({"message": "Firebase ID token required"}), 401
+        return None
+    if claims["sub"] != firebase_uid or (email is not None and claims.get("email", email) != email):
+        return jsonify({"message": "ID token does not match this Firebase user"}), 403
+    return None
+
+
+def caller_is_admin():
+    """True when the verified token belongs to an admin user (role read from the database)"""
+    claims = g.get("firebase")
+    if claims is None:
+        return False
+    role = db.session.execute(select(User.role).where(User.firebase_uid == claims["sub"])).scalar()
+    return role == "admin"
+
+
+def check_acting_user(user_id, required=False):
+    """
+    Error response if this request may not act for user `user_id`, else None.
+    A verified token must belong to that user (read from the database, not the
+    entity cache); without a token the request is refused when `required` or
+    FIREBASE_AUTH_REQUIRED is set.
+    """
+    claims = g.get("firebase")
+    if claims is None:
+        if required or current_app.config.get("FIREBASE_AUTH_REQUIRED"):
+            return jsonify({"message": "Firebase ID token required"}), 401
+        return None
+    firebase_uid = db.session.execute(select(User.firebase_uid).where(User.id == user_id)).scalar()
+    if firebase_uid is None or firebase_uid != claims["sub"]:
+        return jsonify({"message": "ID token does not belong to this user"}), 403
+    return None
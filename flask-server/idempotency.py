@@ -0,0 +1,134 @@
+import hashlib
+from collections import namedtuple
+from datetime import timedelta
+from functools import wraps
+from flask import current_app, g, jsonify, make_response, request
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+from cache import LRUCache
+from extensions import db
+from models import IdempotencyKey, utcnow
+
+KEY_TTL = timedelta(hours=24)
+MAX_KEY_LENGTH = 255
+SWEEP_BATCH_SIZE = 1000
+
+StoredResponse = namedtuple("StoredResponse", "request_hash status_code body expires_at")
+
+# Completed responses only; in-flight claims always live in the database
+_recent = LRUCache(maxsize=4096, ttl=KEY_TTL.total_seconds())
+
+
+def _load(key):
+    """Stored response for `key` from the LRU, falling back to the table"""
+    stored = _recent.get(key)
+    if stored is not None:
+        return stored
+    row = db.session.get(IdempotencyKey, key)
+    if row is None:
+        return None
+    if row.expires_at <= utcnow():
+        db.session.delete(row)
+        db.session.commit()
+        return None
+    stored = StoredResponse(row.request_hash, row.status_code, row.response_body, row.expires_at)
+    if stored.status_code is not None:
+        _recent.set(key, stored)
+    return stored
+
+
+def _scope():
+    """Whose key this is: the verified Firebase user, else the user the body acts for"""
+    claims = g.get("firebase")
+    if claims is not None:
+        return f"firebase:{claims['sub']}"
+    body = request.get_json(silent=True)
+    if isinstance(body, dict) and body.get("user_id") is not None:
+        return f"user:{body['user_id']}"
+    return ""
+
+
+def _replay(stored, request_hash):
+    if stored.request_hash != request_hash:
+        return jsonify({"message": "Idempotency-Key was already used for a different request"}), 422
+    if stored.status_code is None:
+        return jsonify({"message": "A request with this Idempotency-Key is still in progress"}), 409
+    response = current_app.response_class(stored.body, status=stored.status_code, mimetype="application/json")
+    response.headers["Idempotent-Replayed"] = "true"
+    return response
+
+
+def idempotent(view):
+    """
+    Honour an Idempotency-Key header on a POST view. The first request claims the
+    key and its response is stored; retries with the same key and body get that
+    response back without the view (validation, writes) running again. 5xx
+    responses are not stored, and a view that raises gives its key back, so the
+    client can retry those for real. Keys are scoped to the user and the path.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        header = request.headers.get("Idempotency-Key")
+        if not header:
+            return view(*args, **kwargs)
+        if len(header) > MAX_KEY_LENGTH:
+            return jsonify({"message": f"Idempotency-Key must be at most {MAX_KEY_LENGTH} characters"}), 400
+
+        # Hashed so the scope and a header of any allowed length fit the column
+        key = hashlib.sha256("\0".join([_scope(), request.path, header]).encode()).hexdigest()
+        request_hash = hashlib.sha256(request.get_data()).hexdigest()
+
+        stored = _load(key)
+        if stored is not None:
+            return _replay(stored, request_hash)
+
+        # Claim the key; a concurrent duplicate loses the primary-key race
+        try:
+            db.session.add(IdempotencyKey(key=key, request_hash=request_hash, expires_at=utcnow() + KEY_TTL))
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            stored = _load(key)
+            if stored is None:
+                return jsonify({"message": "A request with this Idempotency-Key is still in progress"}), 409
+            return _replay(stored, request_hash)
+
+        try:
+            response = make_response(view(*args, **kwargs))
+        except Exception:
+            # Release the claim, or every retry would get 409 until the key expires
+            db.session.rollback()
+            db.session.execute(delete(IdempotencyKey).where(IdempotencyKey.key == key))
+            db.session.commit()
+            raise
+
+        claim = db.session.get(IdempotencyKey, key)
+        if claim is not None:
+            if response.status_code >= 500:
+                db.session.delete(claim)
+            else:
+                claim.status_code = response.status_code
+                claim.response_body = response.get_data()
+                _recent.set(key, StoredResponse(request_hash, claim.status_code, claim.response_body, claim.expires_at))
+            db.session.commit()
+        return response
+    return wrapper
+
+
+def sweep_idempotency_keys(batch_size=SWEEP_BATCH_SIZE):
+    """Delete expired keys in bounded batches; returns how many were removed"""
+    removed = 0
+    while True:
+        keys = db.session.scalars(
+            select(IdempotencyKey.key)
+            .where(IdempotencyKey.expires_at <= utcnow())
+            .limit(batch_size)
+        ).all()
+        if not keys:
+            break
+        db.session.execute(delete(IdempotencyKey).where(IdempotencyKey.key.in_(keys)))
+        db.session.commit()
+        removed += len(keys)
+        if len(keys) < batch_size:
+            break
+    return removed
@@ -1,7 +1,15 @@
 #!/usr/bin/env python3
 from app import app
 from extensions import db
+from search import ensure_search_index
+from migrations import ensure_schema
+from versioning import ensure_table_versions
+from counters import ensure_stat_counters
 
 with app.app_context():
     db.create_all()
+    ensure_schema()
+    ensure_search_index()
+    ensure_table_versions()
+    ensure_stat_counters()
     print("Database tables created successfully!")
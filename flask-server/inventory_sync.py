@@ -0,0 +1,172 @@
+import csv
+import io
+import json
+from marshmallow import ValidationError
+from sqlalchemy import exists, func, insert, select, update
+from extensions import db
+from models import FoodListing, Reservation
+from schemas import InventoryRowSchema
+from sweeper import archive_batch
+
+SYNC_BATCH_SIZE = 1000
+ARCHIVE_BATCH_SIZE = 500
+MAX_REPORTED_ERRORS = 100
+SYNCED_FIELDS = ["name", "description", "category", "stock", "price", "expiry_date"]
+
+inventory_row_schema = InventoryRowSchema()
+
+
+class InventoryFormatError(ValueError):
+    """The upload isn't readable CSV/NDJSON; nothing is removed when this is raised"""
+
+
+def read_rows(stream, fmt):
+    """Yield (line number, row dict) from a CSV or NDJSON byte stream without reading it all"""
+    text = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+    try:
+        if fmt == "ndjson":
+            for number, line in enumerate(text, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    yield number, json.loads(line)
+                except ValueError:
+                    raise InventoryFormatError(f"Line {number} is not valid JSON")
+        else:
+            reader = csv.DictReader(text)
+            if not reader.fieldnames or "sku" not in reader.fieldnames:
+                raise InventoryFormatError("CSV header must include a sku column")
+            try:
+                for row in reader:
+                    # Empty cells mean "not set" rather than empty strings
+                    yield reader.line_num, {key: value for key, value in row.items() if key and value != ""}
+            except csv.Error as err:
+                raise InventoryFormatError(f"Line {reader.line_num}: {err}")
+    except UnicodeDecodeError:
+        raise InventoryFormatError("Upload must be UTF-8 encoded")
+
+
+class InventorySync:
+    """
+    Diff a store's uploaded inventory against its listings by SKU and apply it in
+    batches: new SKUs are inserted, changed ones updated, and (with delete_missing)
+    listings whose SKU isn't in the upload are archived, unless the upload had no
+    valid rows at all. Each batch commits on its
+    own; re-running the same upload is a no-op, so a failed sync can be retried.
+    Memory is bounded by one batch plus the set of SKUs seen.
+    """
+
+    def __init__(self, user_id, delete_missing=False):
+        self.user_id = user_id
+        self.delete_missing = delete_missing
+        self.seen = set()
+        self.valid = 0
+        self.counts = {"rows": 0, "inserted": 0, "updated": 0, "unchanged": 0, "removed": 0, "kept_held": 0, "invalid": 0}
+        self.errors = []
+
+    def summary(self):
+        return {**self.counts, "errors": self.errors}
+
+    def _error(self, line, sku, messages):
+        self.counts["invalid"] += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "sku": sku, "errors": messages})
+
+    def run(self, rows):
+        batch = []
+        for line, item in rows:
+            self.counts["rows"] += 1
+            sku = item.get("sku") if isinstance(item, dict) else None
+            if isinstance(sku, str):
+                if sku in self.seen:
+                    self._error(line, sku, {"sku": ["Duplicate SKU in upload"]})
+                    continue
+                # Counted as present even if the row is invalid, so it isn't removed
+                self.seen.add(sku)
+            try:
+                batch.append(inventory_row_schema.load(item))
+                self.valid += 1
+            except ValidationError as err:
+                self._error(line, sku, err.messages)
+                continue
+            if len(batch) >= SYNC_BATCH_SIZE:
+                self._apply(batch)
+                batch = []
+        if batch:
+            self._apply(batch)
+        # Only reached once the whole upload has been read
+        if self.delete_missing:
+            if not self.valid:
+                # An empty or unreadable export would otherwise archive the whole store
+                raise InventoryFormatError("Upload has no valid rows; nothing was removed")
+            self._remove_missing()
+        return self.summary()
+
+    def _apply(self, batch):
+        existing = {
+            row.sku: row for row in db.session.execute(
+                select(FoodListing.id, FoodListing.sku, *[getattr(FoodListing, field) for field in SYNCED_FIELDS])
+                .where(FoodListing.user_id == self.user_id, FoodListing.sku.in_([item["sku"] for item in batch]))
+            )
+        }
+        # Units held by reservations are already out of stock, so they come off the POS count
+        held = {}
+        if existing:
+            held = dict(db.session.execute(
+                select(Reservation.food_id, func.sum(Reservation.quantity))
+                .where(Reservation.food_id.in_([row.id for row in existing.values()]))
+                .group_by(Reservation.food_id)
+            ).all())
+
+        inserts = []
+        updates = []
+        for item in batch:
+            values = {field: item[field] for field in SYNCED_FIELDS}
+            current = existing.get(item["sku"])
+            if current is None:
+                inserts.append({**values, "sku": item["sku"], "user_id": self.user_id})
+                continue
+            values["stock"] = max(values["stock"] - held.get(current.id, 0), 0)
+            if any(getattr(current, field) != value for field, value in values.items()):
+                updates.append({"id": current.id, **values})
+            else:
+                self.counts["unchanged"] += 1
+
+        try:
+            if inserts:
+                db.session.execute(insert(FoodListing), inserts)
+            if updates:
+                # ORM bulk UPDATE by primary key: one executemany
+                db.session.execute(update(FoodListing), updates)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        self.counts["inserted"] += len(inserts)
+        self.counts["updated"] += len(updates)
+
+    def _remove_missing(self):
+        rows = db.session.execute(
+            select(FoodListing.id, FoodListing.sku, exists().where(Reservation.food_id == FoodListing.id))
+            .where(FoodListing.user_id == self.user_id, FoodListing.sku.is_not(None))
+            .order_by(FoodListing.id)
+        ).all()
+        missing = []
+        for food_id, sku, is_held in rows:
+            if sku in self.seen:
+                continue
+            if is_held:
+                # Leave it until its holds are checked out or released
+                self.counts["kept_held"] += 1
+            else:
+                missing.append(food_id)
+
+        # Archived rather than deleted so purchase history keeps pointing somewhere
+        for start in range(0, len(missing), ARCHIVE_BATCH_SIZE):
+            ids = missing[start:start + ARCHIVE_BATCH_SIZE]
+            try:
+                archive_batch(ids, reason="removed")
+            except Exception:
+                db.session.rollback()
+                raise
+            self.counts["removed"] += len(ids)
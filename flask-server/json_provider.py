@@ -0,0 +1,58 @@
+from datetime import date
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional speedup; stdlib json is used without it
+    orjson = None
+
+
+def _default(o):
+    # ISO 8601 like orjson, not Flask's HTTP date format, so both providers agree
+    if isinstance(o, date):
+        return o.isoformat()
+    return DefaultJSONProvider.default(o)
+
+
+class StdlibJSONProvider(DefaultJSONProvider):
+    """Flask's stdlib json provider, encoding dates/datetimes the way orjson does"""
+
+    default = staticmethod(_default)
+
+
+class OrjsonProvider(StdlibJSONProvider):
+    """
+    Flask JSON provider backed by orjson. dates/datetimes are encoded natively
+    as ISO 8601; anything orjson doesn't know goes through default().
+    """
+
+    def _options(self):
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if self.compact is False or (self.compact is None and self._app.debug):
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            # Custom json.dumps arguments (indent=, cls=, ...) only make sense for stdlib json
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self._options()).decode()
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=self.default, option=self._options())
+        return self._app.response_class(body + b"\n", mimetype=self.mimetype)
+
+
+def make_json_provider(app):
+    """Pick the JSON provider named by app.config['JSON_PROVIDER'] ('orjson' or 'json')"""
+    if app.config.get("JSON_PROVIDER") == "orjson" and orjson is not None:
+        return OrjsonProvider(app)
+    return StdlibJSONProvider(app)
@@ -0,0 +1,166 @@
+from sqlalchemy import MetaData, Table, inspect, insert, literal, literal_column, select, text, update
+from sqlalchemy.schema import AddConstraint, CreateTable
+from extensions import db
+
+_FIRST_PURCHASE = "SELECT min(purchase_date) FROM purchase"
+
+
+def _listing_price(columns):
+    # Purchases of archived listings can only exist if archived_food_id already did
+    archived = ("(SELECT price FROM archived_food_listing WHERE archived_food_listing.id = purchase.archived_food_id), "
+                if "archived_food_id" in columns else "")
+    return f"coalesce((SELECT price FROM food_listing WHERE food_listing.id = purchase.food_id), {archived}0)"
+
+
+# Values for NOT NULL columns added to tables that already have rows, as SQL evaluated
+# per existing row (or a function of the row's existing column names returning it);
+# columns not listed here get their model default
+BACKFILL = {
+    # Creation times weren't recorded: use the row's first purchase, else the first purchase
+    # on record, so existing rows don't all count as new in the admin stats' last-7-day figures
+    ("user", "created_at"):
+        f'coalesce(({_FIRST_PURCHASE} WHERE purchase.user_id = "user".id), ({_FIRST_PURCHASE}), CURRENT_TIMESTAMP)',
+    ("food_listing", "created_at"):
+        f"coalesce(({_FIRST_PURCHASE} WHERE purchase.food_id = food_listing.id), ({_FIRST_PURCHASE}), CURRENT_TIMESTAMP)",
+    # Sale prices weren't recorded: the listing's price now is the best there is
+    ("purchase", "unit_price"): _listing_price,
+}
+
+# Arbitrary key for pg_advisory_xact_lock, so workers starting together migrate one at a time
+POSTGRES_LOCK_KEY = 7313001
+
+
+def _fill(table, column, columns):
+    """Expression for `column` in rows that predate it and have `columns`"""
+    expression = BACKFILL.get((table.name, column.name))
+    if callable(expression):
+        expression = expression(columns)
+    if expression is not None:
+        return literal_column(f"({expression})", type_=column.type)
+    default = column.default
+    if default is not None:
+        if default.is_callable:
+            return literal(default.arg(None), type_=column.type)
+        if default.is_clause_element:
+            return default.arg
+        return literal(default.arg, type_=column.type)
+    if column.nullable:
+        return literal(None, type_=column.type)
+    raise RuntimeError(f"No backfill for new NOT NULL column {table.name}.{column.name}")
+
+
+def _changes(conn, table):
+    """(missing columns, columns whose NOT NULL the model dropped) of an existing table"""
+    existing = {column["name"]: column for column in inspect(conn).get_columns(table.name)}
+    missing = [column for column in table.columns if column.name not in existing]
+    relaxed = [
+        column for column in table.columns
+        if column.name in existing and not column.primary_key
+        and column.nullable and not existing[column.name]["nullable"]
+    ]
+    return missing, relaxed
+
+
+def _sqlite_autoincrement_differs(conn, table):
+    sql = conn.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                       {"name": table.name}).scalar()
+    return ("AUTOINCREMENT" in sql.upper()) != bool(table.dialect_options["sqlite"]["autoincrement"])
+
+
+def _sqlite_rebuild(conn, table):
+    """
+    SQLite can't change a column's constraints in place: build the table as the
+    model defines it, copy the rows over (ids included), and swap it in. Indexes
+    and triggers go with the old table; indexes are recreated below and the
+    search / counter triggers by their own ensure_* hooks.
+    """
+    scratch = MetaData()
+    for other in db.metadata.sorted_tables:
+        other.to_metadata(scratch)
+    staging = table.to_metadata(scratch, name=f"{table.name}__migrating")
+    old = Table(table.name, MetaData(), autoload_with=conn)
+
+    conn.execute(CreateTable(staging))
+    conn.execute(insert(staging).from_select(
+        [column.name for column in table.columns],
+        select(*[
+            old.c[column.name] if column.name in old.c else _fill(table, column, old.c.keys()).label(column.name)
+            for column in table.columns
+        ])
+    ))
+    conn.execute(text(f'DROP TABLE "{table.name}"'))
+    conn.execute(text(f'ALTER TABLE "{staging.name}" RENAME TO "{table.name}"'))
+
+
+def _postgres_alter(conn, table, missing, relaxed):
+    quote = conn.dialect.identifier_preparer.quote
+    added = {column.name for column in missing}
+    columns = [column.name for column in table.columns if column.name not in added]
+    for column in missing:
+        # Added nullable, filled, then tightened, so it works on tables that have rows
+        conn.execute(text(
+            f"ALTER TABLE {quote(table.name)} ADD COLUMN {quote(column.name)} {column.type.compile(conn.dialect)}"
+        ))
+        for key in column.foreign_keys:
+            conn.execute(AddConstraint(key.constraint))
+        if not column.nullable:
+            conn.execute(update(table).values({column.name: _fill(table, column, columns)}))
+            conn.execute(text(f"ALTER TABLE {quote(table.name)} ALTER COLUMN {quote(column.name)} SET NOT NULL"))
+        columns.append(column.name)
+    for column in relaxed:
+        conn.execute(text(f"ALTER TABLE {quote(table.name)} ALTER COLUMN {quote(column.name)} DROP NOT NULL"))
+
+
+def _reserve_archived_ids(conn):
+    """
+    Archived listings keep their ids, so a new listing must never reuse one.
+    AUTOINCREMENT never hands out an id below its sequence; start the sequence
+    past every archived id (they may predate the AUTOINCREMENT table).
+    """
+    conn.execute(text(
+        "INSERT INTO sqlite_sequence(name, seq) SELECT 'food_listing', 0 "
+        "WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'food_listing')"
+    ))
+    conn.execute(text(
+        "UPDATE sqlite_sequence SET seq = max(seq, "
+        "(SELECT coalesce(max(id), 0) FROM archived_food_listing), "
+        "(SELECT coalesce(max(id), 0) FROM food_listing)) WHERE name = 'food_listing'"
+    ))
+
+
+def ensure_schema(engine=None):
+    """
+    Bring tables created by older versions up to the models: db.create_all()
+    only creates missing tables, so this adds missing columns (backfilling
+    NOT NULL ones), drops NOT NULL where the model allows NULL, switches
+    SQLite tables to AUTOINCREMENT where the model asks for it, and creates
+    missing indexes. Runs in one transaction; safe to run on every start.
+    """
+    engine = engine or db.engine
+    dialect = engine.dialect.name
+    with engine.connect() as conn:
+        if dialect == "sqlite":
+            # Take the write lock up front so DDL and the copies commit (or roll back) together
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+        elif dialect == "postgresql":
+            conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": POSTGRES_LOCK_KEY})
+        try:
+            tables = set(inspect(conn).get_table_names())
+            for table in db.metadata.sorted_tables:
+                if table.name not in tables:
+                    continue
+                missing, relaxed = _changes(conn, table)
+                if dialect == "sqlite":
+                    if missing or relaxed or _sqlite_autoincrement_differs(conn, table):
+                        _sqlite_rebuild(conn, table)
+                elif dialect == "postgresql":
+                    _postgres_alter(conn, table, missing, relaxed)
+            for table in db.metadata.sorted_tables:
+                for index in table.indexes:
+                    index.create(conn, checkfirst=True)
+            if dialect == "sqlite":
+                _reserve_archived_ids(conn)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
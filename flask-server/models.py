@@ -1,11 +1,18 @@
+from datetime import datetime, timezone
 from extensions import db
 
+def utcnow():
+    # Generated in Python (not CURRENT_TIMESTAMP) so SQLite stores the same format that
+    # SQLAlchemy binds for comparisons, which keyset cursors on timestamps rely on
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
     role = db.Column(db.String(20), nullable=False, default='customer')  # customer, store_owner, admin
     firebase_uid = db.Column(db.String(128), unique=True, nullable=True)  # Firebase UID for linking
+    created_at = db.Column(db.DateTime, nullable=False, default=utcnow, index=True)
     
     # One-to-many relationship: User has many FoodListings
     food_listings = db.relationship('FoodListing', backref='owner', lazy=True, cascade='all, delete-orphan')
@@ -13,6 +20,9 @@ class User(db.Model):
     # Many-to-many relationship: User has many Purchases
     purchases = db.relationship('Purchase', backref='buyer', lazy=True, cascade='all, delete-orphan')
 
+    # Holds go with the user; routes/users.py puts their stock back first
+    reservations = db.relationship('Reservation', backref='holder', lazy=True, cascade='all, delete-orphan')
+
 class FoodListing(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -22,15 +32,109 @@ class FoodListing(db.Model):
     stock = db.Column(db.Integer, nullable=False, default=1)
     price = db.Column(db.Float, nullable=False, default=0.0)
     expiry_date = db.Column(db.Date, nullable=True)
+    sku = db.Column(db.String(64), nullable=True)  # store's own item code, used by inventory sync
+    created_at = db.Column(db.DateTime, nullable=False, default=utcnow, index=True)
     
     # Many-to-many relationship: FoodListing has many Purchases
     purchases = db.relationship('Purchase', backref='food_item', lazy=True, cascade='all, delete-orphan')
 
+    # Holds on a deleted listing are simply dropped
+    reservations = db.relationship('Reservation', backref='food_item', lazy=True, cascade='all, delete-orphan')
+
+    # Composite indexes backing the GET /api/foods filters and sort orders
+    __table_args__ = (
+        db.Index('ix_food_listing_user_expiry', 'user_id', 'expiry_date'),
+        db.Index('ux_food_listing_user_sku', 'user_id', 'sku', unique=True),
+        db.Index('ix_food_listing_category_price', 'category', 'price'),
+        db.Index('ix_food_listing_category_expiry', 'category', 'expiry_date'),
+        db.Index('ix_food_listing_price', 'price', 'id'),
+        db.Index('ix_food_listing_expiry', 'expiry_date', 'id'),
+        # Partial index for the expiring-soon feed: only sellable, dated rows
+        db.Index(
+            'ix_food_listing_expiring', 'expiry_date', 'id',
+            sqlite_where=db.text('stock > 0 AND expiry_date IS NOT NULL'),
+            postgresql_where=db.text('stock > 0 AND expiry_date IS NOT NULL'),
+        ),
+        # Archived listings keep their ids, so SQLite must never hand one out again
+        {'sqlite_autoincrement': True},
+    )
+
+class ArchivedFoodListing(db.Model):
+    # Expired / sold-out listings moved out of food_listing by the sweeper; ids are preserved
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    name = db.Column(db.String(100), nullable=False)
+    description = db.Column(db.String(500), nullable=True)
+    category = db.Column(db.String(50), nullable=False, default='General')
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    stock = db.Column(db.Integer, nullable=False, default=0)
+    price = db.Column(db.Float, nullable=False, default=0.0)
+    expiry_date = db.Column(db.Date, nullable=True)
+    sku = db.Column(db.String(64), nullable=True)
+    created_at = db.Column(db.DateTime, nullable=True)
+    archived_at = db.Column(db.DateTime, nullable=False, default=db.func.current_timestamp())
+    archive_reason = db.Column(db.String(20), nullable=False)  # expired, sold_out, removed
+
+    owner = db.relationship('User', backref=db.backref('archived_listings', lazy=True, cascade='all, delete-orphan'))
+    purchases = db.relationship('Purchase', backref='archived_food_item', lazy=True, cascade='all, delete-orphan')
+
 class Purchase(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    food_id = db.Column(db.Integer, db.ForeignKey('food_listing.id'), nullable=False)
+    # Exactly one of food_id / archived_food_id is set; the sweeper moves it to archived_food_id
+    food_id = db.Column(db.Integer, db.ForeignKey('food_listing.id'), nullable=True)
+    archived_food_id = db.Column(db.Integer, db.ForeignKey('archived_food_listing.id'), nullable=True, index=True)
     quantity_bought = db.Column(db.Integer, nullable=False, default=1)
+    # Listing price when the sale was made; revenue (and any reversal of it) uses this, never the current price
+    unit_price = db.Column(db.Float, nullable=False)
     
     # User-submittable attribute for many-to-many relationship
-    purchase_date = db.Column(db.DateTime, nullable=False, default=db.func.current_timestamp())
+    purchase_date = db.Column(db.DateTime, nullable=False, default=utcnow)
+
+    __table_args__ = (
+        db.Index('ix_purchase_food_date', 'food_id', 'purchase_date'),
+        # Per-user purchase history, newest first
+        db.Index('ix_purchase_user_date', 'user_id', 'purchase_date', 'id'),
+    )
+
+class TableVersion(db.Model):
+    # Change counter per table, bumped in the same transaction as every write (see versioning.py)
+    name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=db.func.current_timestamp())
+
+class SalesRollup(db.Model):
+    # Sales per UTC day, store and category, kept current by rollups.record_sales
+    day = db.Column(db.Date, primary_key=True)
+    store_id = db.Column(db.Integer, primary_key=True)  # listing owner; no FK so history outlives the user
+    category = db.Column(db.String(50), primary_key=True)
+    orders = db.Column(db.Integer, nullable=False, default=0)
+    units = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0.0)
+
+    __table_args__ = (
+        db.Index('ix_sales_rollup_store_day', 'store_id', 'day'),
+    )
+
+class StatCounter(db.Model):
+    # Row counts kept by database triggers when STATS_COUNTERS is on (see counters.py)
+    name = db.Column(db.String(64), primary_key=True)  # table name, or "user:<role>"
+    value = db.Column(db.BigInteger, nullable=False, default=0)
+
+class IdempotencyKey(db.Model):
+    # Stored response for a POST retried with the same Idempotency-Key header (see idempotency.py)
+    key = db.Column(db.String(320), primary_key=True)  # sha256 of the user, path and header value
+    request_hash = db.Column(db.String(64), nullable=False)
+    status_code = db.Column(db.Integer, nullable=True)  # NULL while the first request is still running
+    response_body = db.Column(db.LargeBinary, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=db.func.current_timestamp())
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+class Reservation(db.Model):
+    # Stock held for a cart. The held units are already taken out of FoodListing.stock;
+    # the row is deleted when it is checked out, cancelled or expires (see inventory.py)
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    food_id = db.Column(db.Integer, db.ForeignKey('food_listing.id'), nullable=False, index=True)
+    quantity = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=db.func.current_timestamp())
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
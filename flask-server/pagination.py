@@ -0,0 +1,152 @@
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from flask import request
+from sqlalchemy import and_, or_, false
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class PaginationError(ValueError):
+    """Raised when limit/after query parameters can't be used"""
+
+
+def encode_cursor(values):
+    """Pack the sort key of the last row into an opaque URL-safe token"""
+    raw = json.dumps([_encode_value(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """Unpack a token produced by encode_cursor back into a list of values"""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (ValueError, TypeError):
+        raise PaginationError("Invalid cursor")
+    if not isinstance(values, list):
+        raise PaginationError("Invalid cursor")
+    return [_decode_value(v) for v in values]
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    if isinstance(value, date):
+        return {"d": value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        try:
+            if "dt" in value:
+                return datetime.fromisoformat(value["dt"])
+            if "d" in value:
+                return date.fromisoformat(value["d"])
+        except (ValueError, TypeError):
+            pass
+        raise PaginationError("Invalid cursor")
+    return value
+
+
+def get_limit():
+    """Read ?limit= from the current request, clamped to MAX_PAGE_SIZE"""
+    try:
+        limit = int(request.args.get("limit", DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise PaginationError("limit must be an integer")
+    if limit < 1:
+        raise PaginationError("limit must be positive")
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def get_page_args(keys):
+    """Read ?limit= and ?after= from the current request; the cursor must fit `keys`"""
+    limit = get_limit()
+    after = request.args.get("after")
+    if not after:
+        return limit, None
+    values = decode_cursor(after)
+    check_cursor(keys, values)
+    return limit, values
+
+
+class SortKey:
+    """One column of a keyset ordering"""
+
+    def __init__(self, column, descending=False, nullable=False):
+        self.column = column
+        self.descending = descending
+        self.nullable = nullable
+
+    def order_by(self):
+        clause = self.column.desc() if self.descending else self.column.asc()
+        # NULLs always sort after real values so the cursor predicate stays simple
+        return clause.nulls_last() if self.nullable else clause
+
+    def accepts(self, value):
+        """Whether a cursor value has this column's type (a bad one would fail in the database)"""
+        if value is None:
+            return self.nullable
+        try:
+            expected = self.column.type.python_type
+        except NotImplementedError:
+            return True
+        if isinstance(value, bool):
+            return expected is bool
+        if expected in (float, Decimal):
+            return isinstance(value, (int, float))
+        if expected is date:
+            return isinstance(value, date) and not isinstance(value, datetime)
+        return isinstance(value, expected)
+
+    def equals(self, value):
+        return self.column.is_(None) if value is None else self.column == value
+
+    def past(self, value):
+        """Rows strictly after `value` in this key's direction"""
+        if value is None:
+            return false()
+        beyond = self.column < value if self.descending else self.column > value
+        return or_(beyond, self.column.is_(None)) if self.nullable else beyond
+
+
+def check_cursor(keys, values):
+    """Raise PaginationError unless `values` has one value of the right type per key"""
+    if len(values) != len(keys) or not all(key.accepts(value) for key, value in zip(keys, values)):
+        raise PaginationError("Invalid cursor")
+
+
+def keyset_filter(keys, values):
+    """WHERE clause selecting rows that come after `values` in `keys` order"""
+    check_cursor(keys, values)
+    clauses = []
+    for i, key in enumerate(keys):
+        prefix = [keys[j].equals(values[j]) for j in range(i)]
+        clauses.append(and_(*prefix, key.past(values[i])))
+    return or_(*clauses)
+
+
+def paginate(query, keys, limit, after=None, key_of=None):
+    """
+    Apply keyset pagination to `query` ordered by `keys`.
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    `key_of` extracts the sort values from a row (defaults to attribute access).
+    """
+    if after is not None:
+        query = query.filter(keyset_filter(keys, after))
+    rows = query.order_by(*[key.order_by() for key in keys]).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        if key_of is None:
+            values = [getattr(last, key.column.key) for key in keys]
+        else:
+            values = key_of(last)
+        next_cursor = encode_cursor(values)
+    return rows, next_cursor
@@ -0,0 +1,132 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from sqlalchemy import delete, func, insert, select, union_all
+from extensions import db, upsert
+from models import FoodListing, ArchivedFoodListing, Purchase, SalesRollup
+
+
+def record_sales(day, lines):
+    """
+    Add sales to the rollup in the caller's transaction. `lines` are
+    (listing, units, orders, unit_price) where listing has user_id and category
+    (e.g. the row adjust_stock returns) and unit_price is the purchase's own;
+    use negative units/orders to take a sale back. Sales of listings that are
+    later deleted stay in the rollup.
+    """
+    totals = defaultdict(lambda: [0, 0, 0.0])
+    for listing, units, orders, unit_price in lines:
+        total = totals[(listing.user_id, listing.category)]
+        total[0] += orders
+        total[1] += units
+        total[2] += units * unit_price
+    if not totals:
+        return
+
+    # One multi-row upsert; sorted keys keep concurrent writers locking rows in the same order
+    statement = upsert(SalesRollup).values([
+        {"day": day, "store_id": store_id, "category": category,
+         "orders": orders, "units": units, "revenue": revenue}
+        for (store_id, category), (orders, units, revenue) in sorted(totals.items())
+    ])
+    db.session.execute(statement.on_conflict_do_update(
+        index_elements=["day", "store_id", "category"],
+        set_={
+            "orders": SalesRollup.orders + statement.excluded.orders,
+            "units": SalesRollup.units + statement.excluded.units,
+            "revenue": SalesRollup.revenue + statement.excluded.revenue,
+        },
+    ))
+
+
+def backfill_sales(start=None, end=None):
+    """
+    Rebuild the rollup from the purchase table for days in [start, end] (both
+    optional) in one transaction. Run it while purchases are quiet, or over past
+    days only, so live increments aren't counted twice. Returns rows written.
+    """
+    def sales_of(listing_model, purchase_fk):
+        query = select(
+            func.date(Purchase.purchase_date).label("day"),
+            listing_model.user_id.label("store_id"),
+            listing_model.category.label("category"),
+            Purchase.quantity_bought.label("units"),
+            (Purchase.quantity_bought * Purchase.unit_price).label("revenue"),
+        ).join(listing_model, listing_model.id == purchase_fk)
+        if start is not None:
+            query = query.where(Purchase.purchase_date >= datetime.combine(start, time.min))
+        if end is not None:
+            query = query.where(Purchase.purchase_date < datetime.combine(end + timedelta(days=1), time.min))
+        return query
+
+    sales = union_all(
+        sales_of(FoodListing, Purchase.food_id),
+        sales_of(ArchivedFoodListing, Purchase.archived_food_id),
+    ).subquery()
+
+    stale = delete(SalesRollup)
+    if start is not None:
+        stale = stale.where(SalesRollup.day >= start)
+    if end is not None:
+        stale = stale.where(SalesRollup.day <= end)
+    try:
+        db.session.execute(stale)
+        result = db.session.execute(insert(SalesRollup).from_select(
+            ["day", "store_id", "category", "orders", "units", "revenue"],
+            select(
+                sales.c.day, sales.c.store_id, sales.c.category,
+                func.count(), func.sum(sales.c.units), func.sum(sales.c.revenue),
+            ).group_by(sales.c.day, sales.c.store_id, sales.c.category)
+        ))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return result.rowcount
+
+
+def _bucket(day, granularity):
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())  # ISO weeks start on Monday
+    if granularity == "month":
+        return day.replace(day=1)
+    return day
+
+
+def sales_series(granularity, start, end, store_id=None, category=None, group_by=()):
+    """
+    Orders, units and revenue per day/week/month between start and end
+    (inclusive), optionally split by store and/or category. Reads one rollup
+    row per day and group, then folds days into weeks or months.
+    """
+    dimensions = [SalesRollup.store_id if name == "store" else SalesRollup.category for name in group_by]
+    query = select(
+        SalesRollup.day,
+        *dimensions,
+        func.sum(SalesRollup.orders),
+        func.sum(SalesRollup.units),
+        func.sum(SalesRollup.revenue),
+    ).where(SalesRollup.day >= start, SalesRollup.day <= end).group_by(SalesRollup.day, *dimensions)
+    if store_id is not None:
+        query = query.where(SalesRollup.store_id == store_id)
+    if category is not None:
+        query = query.where(SalesRollup.category == category)
+
+    buckets = defaultdict(lambda: [0, 0, 0.0])
+    for row in db.session.execute(query):
+        key = (_bucket(row[0], granularity),) + tuple(row[1:1 + len(dimensions)])
+        total = buckets[key]
+        total[0] += row[-3]
+        total[1] += row[-2]
+        total[2] += row[-1]
+
+    series = []
+    for key in sorted(buckets, key=lambda k: tuple("" if v is None else v for v in k)):
+        orders, units, revenue = buckets[key]
+        if not orders and not units:
+            continue  # everything in the bucket was cancelled
+        item = {"bucket": key[0].isoformat()}
+        for name, value in zip(group_by, key[1:]):
+            item["store_id" if name == "store" else name] = value
+        item.update({"orders": orders, "units": units, "revenue": round(revenue, 2)})
+        series.append(item)
+    return series
@@ -1,35 +1,62 @@
-from flask import Blueprint, jsonify, request
-from models import User, FoodListing, Purchase
+from flask import Blueprint, Response, jsonify, request, current_app, send_file, stream_with_context, url_for
+from models import User, FoodListing, Purchase, utcnow
 from extensions import db
-from schemas import UserSchema, FoodListingSchema, PurchaseSchema
+from schemas import UserSchema, FoodListingSchema, PurchaseSchema, SalesQuerySchema, ExportQuerySchema
 from marshmallow import ValidationError
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import case, func, select, true
+from counters import counter
+from rollups import sales_series
+from exports import EXPORTS, FORMATS, export_chunks, export_job_status, parquet_available, start_export_job
+import os
+from admin_auth import admin_login_enabled, issue_token, require_admin_token
+from entity_cache import cache_stats
+from pagination import SortKey, PaginationError, get_page_args, paginate
+from serializers import RowSerializer, Expansion, Projection, FieldSelectionError
+from streaming import wants_stream, stream_rows
 import secrets
-import hashlib
 
 admin_bp = Blueprint("admin", __name__)
 user_schema = UserSchema()
 food_schema = FoodListingSchema()
 purchase_schema = PurchaseSchema()
+user_rows = RowSerializer(user_schema)
+food_rows = RowSerializer(food_schema)
+purchase_rows = RowSerializer(purchase_schema)
+sales_query_schema = SalesQuerySchema()
+export_query_schema = ExportQuerySchema()
+food_expansions = {"owner": Expansion(FoodListing.user_id, user_rows)}
+purchase_expansions = {
+    "food_item": Expansion(Purchase.food_id, food_rows),
+    "buyer": Expansion(Purchase.user_id, user_rows),
+}
 
-# Admin secret key (in production, this should be in env vars)
-ADMIN_SECRET_KEY = "lastbite_admin_2024_secret"
+# Shared secret for /admin/login (set ADMIN_SECRET_KEY in production)
+ADMIN_SECRET_KEY = os.environ.get("ADMIN_SECRET_KEY", "lastbite_admin_2024_secret")
+
+# Every admin route except login needs a signed admin token
+admin_bp.before_request(require_admin_token)
 
 @admin_bp.route("/admin/login", methods=["POST"])
 def admin_login():
     """Admin login endpoint - separate from regular auth"""
+    if not admin_login_enabled():
+        return jsonify({"message": "Admin login is not configured"}), 503
     try:
-        data = request.json
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({"message": "Invalid admin credentials"}), 401
         secret_key = data.get("secret_key")
         email = data.get("email")
         
-        if not secret_key or secret_key != ADMIN_SECRET_KEY:
+        # Compared as bytes: compare_digest refuses non-ASCII str
+        if not isinstance(secret_key, str) or not secrets.compare_digest(secret_key.encode(), ADMIN_SECRET_KEY.encode()):
             return jsonify({"message": "Invalid admin credentials"}), 401
         
         if not email:
             return jsonify({"message": "Email required"}), 400
         
-        # Check if user exists
+        # Check if user exists (from the database: a cached role may be up to a TTL old)
         user = User.query.filter_by(email=email).first()
         if not user:
             return jsonify({"message": "User not found"}), 404
@@ -37,16 +64,15 @@ def admin_login():
         if user.role != 'admin':
             return jsonify({"message": "Access denied. Admin role required"}), 403
         
-        # Generate admin session token
-        token_data = f"{user.id}:{email}:{datetime.now().isoformat()}"
-        admin_token = hashlib.sha256(f"{token_data}:{ADMIN_SECRET_KEY}".encode()).hexdigest()
+        # Signed, self-contained session token: verified later without a user lookup
+        admin_token, expires = issue_token(user)
         
         return jsonify({
             "message": "Admin access granted",
             "data": {
                 "user": user_schema.dump(user),
                 "admin_token": admin_token,
-                "expires_at": datetime.now().isoformat()
+                "expires_at": datetime.fromtimestamp(expires, timezone.utc).isoformat()
             }
         }), 200
         
@@ -57,10 +83,25 @@ def admin_login():
 def admin_get_all_users():
     """Get all users for admin"""
     try:
-        users = User.query.all()
+        projection = Projection(user_rows)
+    except FieldSelectionError as err:
+        return jsonify({"message": str(err)}), 400
+
+    keys = [SortKey(User.id)]
+    if wants_stream():
+        return stream_rows(projection.query(keys), keys, projection.dump_many)
+
+    try:
+        limit, after = get_page_args(keys)
+    except PaginationError as err:
+        return jsonify({"message": str(err)}), 400
+
+    try:
+        users, next_cursor = paginate(projection.query(keys), keys, limit, after)
         return jsonify({
             "message": "All users retrieved",
-            "data": [user_schema.dump(user) for user in users]
+            "data": projection.dump_many(users),
+            "next_cursor": next_cursor
         }), 200
     except Exception as e:
         return jsonify({"message": "Failed to retrieve users"}), 500
@@ -91,10 +132,25 @@ def admin_toggle_user_status(user_id):
 def admin_get_all_foods():
     """Get all food listings for admin"""
     try:
-        foods = FoodListing.query.all()
+        projection = Projection(food_rows, food_expansions)
+    except FieldSelectionError as err:
+        return jsonify({"message": str(err)}), 400
+
+    keys = [SortKey(FoodListing.id)]
+    if wants_stream():
+        return stream_rows(projection.query(keys), keys, projection.dump_many)
+
+    try:
+        limit, after = get_page_args(keys)
+    except PaginationError as err:
+        return jsonify({"message": str(err)}), 400
+
+    try:
+        foods, next_cursor = paginate(projection.query(keys), keys, limit, after)
         return jsonify({
             "message": "All food listings retrieved",
-            "data": [food_schema.dump(food) for food in foods]
+            "data": projection.dump_many(foods),
+            "next_cursor": next_cursor
         }), 200
     except Exception as e:
         return jsonify({"message": "Failed to retrieve food listings"}), 500
@@ -119,58 +175,201 @@ def admin_delete_food(food_id):
 def admin_get_all_purchases():
     """Get all purchases for admin"""
     try:
-        purchases = Purchase.query.all()
+        projection = Projection(purchase_rows, purchase_expansions)
+    except FieldSelectionError as err:
+        return jsonify({"message": str(err)}), 400
+
+    keys = [SortKey(Purchase.id)]
+    if wants_stream():
+        return stream_rows(projection.query(keys), keys, projection.dump_many)
+
+    try:
+        limit, after = get_page_args(keys)
+    except PaginationError as err:
+        return jsonify({"message": str(err)}), 400
+
+    try:
+        purchases, next_cursor = paginate(projection.query(keys), keys, limit, after)
         return jsonify({
             "message": "All purchases retrieved",
-            "data": [purchase_schema.dump(purchase) for purchase in purchases]
+            "data": projection.dump_many(purchases),
+            "next_cursor": next_cursor
         }), 200
     except Exception as e:
         return jsonify({"message": "Failed to retrieve purchases"}), 500
 
+def _count_where(condition):
+    return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+def stats_query(week_ago):
+    """
+    Every admin dashboard number in one statement. With STATS_COUNTERS on the
+    totals are trigger-maintained counters and only the last-week counts touch the
+    tables (as created_at index range scans); otherwise each table is scanned once
+    with conditional aggregation.
+    """
+    if current_app.config.get("STATS_COUNTERS"):
+        def recent(column):
+            return select(func.count()).where(column >= week_ago).scalar_subquery()
+        return select(
+            counter("user").label("total_users"),
+            counter("user:customer").label("customers"),
+            counter("user:store_owner").label("store_owners"),
+            counter("user:admin").label("admins"),
+            counter("food_listing").label("total_foods"),
+            counter("purchase").label("total_purchases"),
+            recent(User.created_at).label("recent_users"),
+            recent(FoodListing.created_at).label("recent_foods"),
+            recent(Purchase.purchase_date).label("recent_purchases"),
+        )
+
+    users = select(
+        func.count(User.id).label("total_users"),
+        _count_where(User.role == 'customer').label("customers"),
+        _count_where(User.role == 'store_owner').label("store_owners"),
+        _count_where(User.role == 'admin').label("admins"),
+        _count_where(User.created_at >= week_ago).label("recent_users"),
+    ).subquery()
+    foods = select(
+        func.count(FoodListing.id).label("total_foods"),
+        _count_where(FoodListing.created_at >= week_ago).label("recent_foods"),
+    ).subquery()
+    purchases = select(
+        func.count(Purchase.id).label("total_purchases"),
+        _count_where(Purchase.purchase_date >= week_ago).label("recent_purchases"),
+    ).subquery()
+    # One-row subqueries, so the joins just glue the columns together
+    return select(users, foods, purchases).select_from(
+        users.join(foods, true()).join(purchases, true())
+    )
+
 @admin_bp.route("/admin/stats", methods=["GET"])
 def admin_get_stats():
     """Get system statistics for admin dashboard"""
     try:
-        # Count users by role
-        customer_count = User.query.filter_by(role='customer').count()
-        store_owner_count = User.query.filter_by(role='store_owner').count()
-        admin_count = User.query.filter_by(role='admin').count()
-        total_users = User.query.count()
-        
-        # Count food listings
-        total_foods = FoodListing.query.count()
-        
-        # Count purchases
-        total_purchases = Purchase.query.count()
-        
-        # Recent activity (last 7 days)
-        week_ago = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-        recent_users = User.query.filter(User.created_at >= week_ago).count() if hasattr(User, 'created_at') else 0
-        recent_foods = FoodListing.query.filter(FoodListing.created_at >= week_ago).count() if hasattr(FoodListing, 'created_at') else 0
-        recent_purchases = Purchase.query.filter(Purchase.purchase_date >= week_ago).count()
+        # Recent activity (last 7 days); timestamps are stored in UTC
+        week_ago = utcnow() - timedelta(days=7)
+        row = db.session.execute(stats_query(week_ago)).one()
         
         return jsonify({
             "message": "System statistics retrieved",
             "data": {
                 "users": {
-                    "total": total_users,
-                    "customers": customer_count,
-                    "store_owners": store_owner_count,
-                    "admins": admin_count
+                    "total": row.total_users,
+                    "customers": row.customers,
+                    "store_owners": row.store_owners,
+                    "admins": row.admins
                 },
                 "foods": {
-                    "total": total_foods
+                    "total": row.total_foods
                 },
                 "purchases": {
-                    "total": total_purchases,
-                    "recent_week": recent_purchases
+                    "total": row.total_purchases,
+                    "recent_week": row.recent_purchases
                 },
                 "activity": {
-                    "new_users_week": recent_users,
-                    "new_foods_week": recent_foods,
-                    "new_purchases_week": recent_purchases
+                    "new_users_week": row.recent_users,
+                    "new_foods_week": row.recent_foods,
+                    "new_purchases_week": row.recent_purchases
                 }
             }
         }), 200
     except Exception as e:
         return jsonify({"message": "Failed to retrieve statistics"}), 500
+
+@admin_bp.route("/admin/analytics/sales", methods=["GET"])
+def admin_sales_analytics():
+    """Orders, units and revenue per day/week/month from the sales rollup"""
+    try:
+        args = sales_query_schema.load(request.args)
+    except ValidationError as err:
+        return jsonify({"message": "Validation error", "errors": err.messages}), 400
+
+    # Defaults to the last 30 days (UTC, like the purchase timestamps)
+    end = args.get("end") or utcnow().date()
+    start = args.get("start") or end - timedelta(days=29)
+    group_by = [name for name in args["group_by"].split(",") if name]
+
+    try:
+        series = sales_series(
+            args["granularity"], start, end,
+            store_id=args.get("store_id"), category=args.get("category"), group_by=group_by
+        )
+        return jsonify({
+            "message": "Sales analytics retrieved",
+            "data": series
+        }), 200
+    except Exception as e:
+        return jsonify({"message": "Failed to retrieve sales analytics"}), 500
+
+def _export_args(entity):
+    """Validated (format, start, end) for an export request, or an error response"""
+    if entity not in EXPORTS:
+        return None, (jsonify({"message": f"Unknown export: {entity}"}), 404)
+    try:
+        args = export_query_schema.load(request.args)
+    except ValidationError as err:
+        return None, (jsonify({"message": "Validation error", "errors": err.messages}), 400)
+    if args["format"] == "parquet" and not parquet_available():
+        return None, (jsonify({"message": "Parquet export requires pyarrow to be installed"}), 501)
+    return (args["format"], args.get("start"), args.get("end")), None
+
+@admin_bp.route("/admin/export/<entity>", methods=["GET"])
+def admin_export(entity):
+    """Stream a full users/foods/purchases export as CSV, NDJSON or Parquet"""
+    args, error = _export_args(entity)
+    if error:
+        return error
+    fmt, start, end = args
+    mimetype, extension = FORMATS[fmt]
+    return Response(
+        stream_with_context(export_chunks(entity, fmt, start, end)),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f'attachment; filename="{entity}.{extension}"'}
+    )
+
+@admin_bp.route("/admin/export/<entity>/jobs", methods=["POST"])
+def admin_start_export_job(entity):
+    """Write the export to a file in the background; poll the returned job for the download"""
+    args, error = _export_args(entity)
+    if error:
+        return error
+    job_id = start_export_job(entity, *args)
+    return jsonify({
+        "message": "Export started",
+        "data": {
+            "id": job_id,
+            "status": "running",
+            "status_url": url_for("admin.admin_export_job", job_id=job_id)
+        }
+    }), 202
+
+@admin_bp.route("/admin/export/jobs/<job_id>", methods=["GET"])
+def admin_export_job(job_id):
+    status, detail = export_job_status(job_id)
+    if status is None:
+        return jsonify({"message": "Export job not found"}), 404
+    data = {"id": job_id, "status": status}
+    if status == "done":
+        data["download_url"] = url_for("admin.admin_download_export", job_id=job_id)
+    elif status == "failed":
+        data["error"] = detail
+    return jsonify({"message": f"Export job {status}", "data": data}), 200
+
+@admin_bp.route("/admin/export/jobs/<job_id>/download", methods=["GET"])
+def admin_download_export(job_id):
+    status, path = export_job_status(job_id)
+    if status != "done":
+        return jsonify({"message": "Export is not ready"}), 404 if status is None else 409
+    # Stored as <job id>.<entity>.<ext>
+    download_name = os.path.basename(path).split(".", 1)[1]
+    mimetype = FORMATS[download_name.rsplit(".", 1)[1]][0]
+    return send_file(path, mimetype=mimetype, as_attachment=True, download_name=download_name)
+
+@admin_bp.route("/admin/cache-stats", methods=["GET"])
+def admin_cache_stats():
+    """Hit/miss counts and sizes of the user and food listing caches"""
+    return jsonify({
+        "message": "Cache statistics retrieved",
+        "data": cache_stats()
+    }), 200
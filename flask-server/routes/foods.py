@@ -1,23 +1,146 @@
 from flask import Blueprint, jsonify, request
 from models import FoodListing, User
 from extensions import db
-from schemas import FoodListingSchema, FoodListingCreateSchema
+from sqlalchemy import insert, or_, select, tuple_
+from sqlalchemy.exc import IntegrityError
+from schemas import FoodListingSchema, FoodListingCreateSchema, FoodListingQuerySchema, ExpiringQuerySchema, UserSchema
 from marshmallow import ValidationError
+from datetime import date, datetime, timedelta
+from pagination import SortKey, PaginationError, get_limit, get_page_args, paginate
+from search import search_food_ids
+from serializers import RowSerializer, Expansion, Projection, FieldSelectionError
+from streaming import wants_stream, stream_rows
+from versioning import versioned
+from idempotency import idempotent
+from entity_cache import user_cache
+from firebase_auth import check_acting_user
+from inventory import release_expired_before_request
 
 food_bp = Blueprint("foods", __name__)
+food_bp.before_request(release_expired_before_request)
 food_schema = FoodListingSchema()
 foods_schema = FoodListingSchema(many=True)
+food_rows = RowSerializer(food_schema)  # fast path for read-only lists
+food_expansions = {"owner": Expansion(FoodListing.user_id, RowSerializer(UserSchema()))}
 food_create_schema = FoodListingCreateSchema()
+food_bulk_create_schema = FoodListingCreateSchema(many=True)
+food_query_schema = FoodListingQuerySchema()
+expiring_query_schema = ExpiringQuerySchema()
+
+# Keyset orderings for ?sort=; id is always the final tie-breaker
+SORT_KEYS = {
+    None: [SortKey(FoodListing.id)],
+    "price": [SortKey(FoodListing.price), SortKey(FoodListing.id)],
+    "expiry": [SortKey(FoodListing.expiry_date, nullable=True), SortKey(FoodListing.id)],
+    "newest": [SortKey(FoodListing.id, descending=True)],
+}
+
+BULK_MAX_ITEMS = 1000
+
+def filter_foods(query, filters):
+    """Apply validated FoodListingQuerySchema filters to a FoodListing query"""
+    if "owner" in filters:
+        query = query.filter(FoodListing.user_id == filters["owner"])
+    if "category" in filters:
+        query = query.filter(FoodListing.category == filters["category"])
+    if "min_price" in filters:
+        query = query.filter(FoodListing.price >= filters["min_price"])
+    if "max_price" in filters:
+        query = query.filter(FoodListing.price <= filters["max_price"])
+    if "expires_before" in filters:
+        query = query.filter(FoodListing.expiry_date < filters["expires_before"])
+    if not filters.get("include_expired"):
+        # Expired rows are rare between sweeps, so this stays a cheap filter on the id scan
+        query = query.filter(or_(FoodListing.expiry_date.is_(None), FoodListing.expiry_date >= date.today()))
+    if "in_stock" in filters:
+        if filters["in_stock"]:
+            query = query.filter(FoodListing.stock > 0)
+        else:
+            query = query.filter(FoodListing.stock <= 0)
+    return query
 
 @food_bp.route("/", methods=["GET"])
+@versioned("food_listing", expand={"owner": "user"}, clock="day")
 def get_foods():
-    foods = FoodListing.query.all()
+    try:
+        filters = food_query_schema.load(request.args)
+        projection = Projection(food_rows, food_expansions)
+    except ValidationError as err:
+        return jsonify({"message": "Validation error", "errors": err.messages}), 400
+    except FieldSelectionError as err:
+        return jsonify({"message": str(err)}), 400
+
+    keys = SORT_KEYS[filters.get("sort")]
+    query = filter_foods(projection.query(keys), filters)
+    if wants_stream():
+        return stream_rows(query, keys, projection.dump_many)
+
+    try:
+        limit, after = get_page_args(keys)
+    except PaginationError as err:
+        return jsonify({"message": str(err)}), 400
+
+    foods, next_cursor = paginate(query, keys, limit, after)
     return jsonify({
         "message": "All food items retrieved successfully",
-        "data": foods_schema.dump(foods)
+        "data": projection.dump_many(foods),
+        "next_cursor": next_cursor
+    }), 200
+
+@food_bp.route("/search", methods=["GET"])
+@versioned("food_listing", expand={"owner": "user"})
+def search_foods():
+    q = request.args.get("q", "").strip()
+    if not q:
+        return jsonify({"message": "Search query is required"}), 400
+
+    try:
+        limit = get_limit()
+        projection = Projection(food_rows, food_expansions)
+    except (PaginationError, FieldSelectionError) as err:
+        return jsonify({"message": str(err)}), 400
+
+    # Rank in the text index, then load the matching rows in rank order
+    ids = search_food_ids(q, limit)
+    query = projection.query([SortKey(FoodListing.id)]).filter(FoodListing.id.in_(ids))
+    foods_by_id = {row.id: row for row in query} if ids else {}
+    foods = [foods_by_id[food_id] for food_id in ids if food_id in foods_by_id]
+    return jsonify({
+        "message": f"Found {len(foods)} food items matching '{q}'",
+        "data": projection.dump_many(foods)
+    }), 200
+
+@food_bp.route("/expiring", methods=["GET"])
+@versioned("food_listing", expand={"owner": "user"}, clock="hour")
+def get_expiring_foods():
+    keys = [SortKey(FoodListing.expiry_date), SortKey(FoodListing.id)]
+    try:
+        args = expiring_query_schema.load(request.args)
+        limit, after = get_page_args(keys)
+        projection = Projection(food_rows, food_expansions)
+    except ValidationError as err:
+        return jsonify({"message": "Validation error", "errors": err.messages}), 400
+    except (PaginationError, FieldSelectionError) as err:
+        return jsonify({"message": str(err)}), 400
+
+    cutoff = (datetime.now() + timedelta(hours=args["within"])).date()
+
+    # Range scan over ix_food_listing_expiring: predicates match its WHERE clause
+    query = projection.query(keys).filter(
+        FoodListing.stock > 0,
+        FoodListing.expiry_date.isnot(None),
+        FoodListing.expiry_date >= date.today(),
+        FoodListing.expiry_date <= cutoff,
+    )
+    foods, next_cursor = paginate(query, keys, limit, after)
+    return jsonify({
+        "message": f"Food items expiring within {args['within']} hours retrieved successfully",
+        "data": projection.dump_many(foods),
+        "next_cursor": next_cursor
     }), 200
 
 @food_bp.route("/<int:food_id>", methods=["GET"])
+@versioned("food_listing")
 def get_food(food_id):
     food = FoodListing.query.get(food_id)
     if not food:
@@ -28,6 +151,7 @@ def get_food(food_id):
     }), 200
 
 @food_bp.route("/", methods=["POST"])
+@idempotent
 def create_food():
     try:
         # Validate input data
@@ -41,9 +165,12 @@ def create_food():
         return jsonify({"message": "User ID is required"}), 400
     
     # Check if user exists
-    user = User.query.get(user_id)
+    user = user_cache.get(user_id)
     if not user:
         return jsonify({"message": "User not found"}), 404
+    denied = check_acting_user(user.id)
+    if denied:
+        return denied
 
     # Create food listing
     food = FoodListing(
@@ -53,7 +180,8 @@ def create_food():
         user_id=user_id,
         stock=validated_data["stock"],
         price=validated_data["price"],
-        expiry_date=validated_data.get("expiry_date")
+        expiry_date=validated_data.get("expiry_date"),
+        sku=validated_data.get("sku")
     )
     
     try:
@@ -63,15 +191,89 @@ def create_food():
             "message": "Food listing created successfully",
             "data": food_schema.dump(food)
         }), 201
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({"message": "A listing with this SKU already exists"}), 409
     except Exception:
         db.session.rollback()
         return jsonify({"message": "Failed to create food listing"}), 500
 
+@food_bp.route("/bulk", methods=["POST"])
+@idempotent
+def create_foods_bulk():
+    items = request.get_json(silent=True)
+    if not isinstance(items, list) or not items:
+        return jsonify({"message": "Expected a non-empty JSON array of food listings"}), 400
+    if len(items) > BULK_MAX_ITEMS:
+        return jsonify({"message": f"At most {BULK_MAX_ITEMS} listings per request"}), 400
+    atomic = request.args.get("atomic", "").lower() in ("1", "true")
+
+    # Validate every item in one pass; invalid items are reported, not fatal
+    errors = {}
+    try:
+        validated = food_bulk_create_schema.load(items)
+    except ValidationError as err:
+        validated = err.valid_data
+        errors = {index: messages for index, messages in err.messages.items()}
+
+    # One IN query for all owners instead of a lookup per listing
+    owner_ids = {item["user_id"] for index, item in enumerate(validated) if index not in errors}
+    existing = set(db.session.scalars(select(User.id).where(User.id.in_(owner_ids)))) if owner_ids else set()
+    for index, item in enumerate(validated):
+        if index not in errors and item["user_id"] not in existing:
+            errors[index] = {"user_id": ["User not found"]}
+    for owner_id in sorted(existing):
+        denied = check_acting_user(owner_id)
+        if denied:
+            return denied
+
+    # SKUs are unique per store: check repeats in the request and (in one query) the table
+    skus = {}
+    for index, item in enumerate(validated):
+        if index not in errors and item.get("sku"):
+            key = (item["user_id"], item["sku"])
+            if key in skus:
+                errors[index] = {"sku": ["Duplicate SKU in request"]}
+            else:
+                skus[key] = index
+    if skus:
+        taken = db.session.execute(
+            select(FoodListing.user_id, FoodListing.sku).where(tuple_(FoodListing.user_id, FoodListing.sku).in_(list(skus)))
+        ).all()
+        for key in taken:
+            errors[skus[tuple(key)]] = {"sku": ["A listing with this SKU already exists"]}
+
+    error_list = [{"index": index, "errors": errors[index]} for index in sorted(errors)]
+    rows = [item for index, item in enumerate(validated) if index not in errors]
+    if not rows or (atomic and errors):
+        return jsonify({"message": "No food listings were created", "errors": error_list}), 400
+
+    try:
+        # One multi-row INSERT ... RETURNING; ids are assigned in VALUES order, so
+        # sorting by id gives input order without per-row round trips
+        created = sorted(db.session.execute(
+            insert(FoodListing).returning(*food_rows.columns),
+            [{"description": None, "expiry_date": None, "sku": None, **item} for item in rows]
+        ).all(), key=lambda row: row.id)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        return jsonify({"message": "Failed to create food listings"}), 500
+
+    return jsonify({
+        "message": f"{len(created)} food listings created successfully",
+        "data": food_rows.dump_many(created),
+        "errors": error_list
+    }), 201
+
 @food_bp.route("/<int:food_id>", methods=["PUT"])
 def update_food(food_id):
     food = FoodListing.query.get(food_id)
     if not food:
         return jsonify({"message": "Food not found"}), 404
+    denied = check_acting_user(food.user_id)
+    if denied:
+        return denied
     
     try:
         # Validate input data
@@ -89,6 +291,9 @@ def update_food(food_id):
             "message": f"Food item {food_id} updated successfully",
             "data": food_schema.dump(food)
         }), 200
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({"message": "A listing with this SKU already exists"}), 409
     except Exception:
         db.session.rollback()
         return jsonify({"message": "Failed to update food listing"}), 500
@@ -98,6 +303,9 @@ def delete_food(food_id):
     food = FoodListing.query.get(food_id)
     if not food:
         return jsonify({"message": "Food not found"}), 404
+    denied = check_acting_user(food.user_id)
+    if denied:
+        return denied
     
     try:
         db.session.delete(food)
@@ -1,23 +1,63 @@
 from flask import Blueprint, jsonify, request
-from models import Purchase, User, FoodListing
+from models import Purchase, FoodListing, ArchivedFoodListing, utcnow
 from extensions import db
-from schemas import PurchaseSchema, PurchaseCreateSchema
+from sqlalchemy import insert
+from schemas import PurchaseSchema, PurchaseCreateSchema, PurchaseBatchCreateSchema, FoodListingSchema, UserSchema
 from marshmallow import ValidationError
+from pagination import SortKey, PaginationError, get_page_args, paginate
+from serializers import RowSerializer, Expansion, Projection, FieldSelectionError
+from streaming import wants_stream, stream_rows
+from versioning import versioned
+from transactions import with_retries
+from idempotency import idempotent
+from inventory import adjust_stock
+from rollups import record_sales
+from entity_cache import user_cache, food_cache
+from firebase_auth import check_acting_user
 
 purchase_bp = Blueprint("purchases", __name__)
 purchase_schema = PurchaseSchema()
 purchases_schema = PurchaseSchema(many=True)
+purchase_rows = RowSerializer(purchase_schema)  # fast path for read-only lists
+purchase_expansions = {
+    "food_item": Expansion(Purchase.food_id, RowSerializer(FoodListingSchema())),
+    "buyer": Expansion(Purchase.user_id, RowSerializer(UserSchema())),
+}
 purchase_create_schema = PurchaseCreateSchema()
+purchase_batch_create_schema = PurchaseBatchCreateSchema()
+
+def stock_error(food_id):
+    """Response for a failed adjust_stock: tell missing listings apart from sold-out ones"""
+    if food_cache.get(food_id) is None:
+        return jsonify({"message": "User or Food not found"}), 404
+    return jsonify({"message": "Not enough stock available"}), 400
 
 @purchase_bp.route("/", methods=["GET"])
+@versioned("purchase", expand={"food_item": "food_listing", "buyer": "user"})
 def get_purchases():
-    purchases = Purchase.query.all()
+    try:
+        projection = Projection(purchase_rows, purchase_expansions)
+    except FieldSelectionError as err:
+        return jsonify({"message": str(err)}), 400
+
+    keys = [SortKey(Purchase.id)]
+    if wants_stream():
+        return stream_rows(projection.query(keys), keys, projection.dump_many)
+
+    try:
+        limit, after = get_page_args(keys)
+    except PaginationError as err:
+        return jsonify({"message": str(err)}), 400
+
+    purchases, next_cursor = paginate(projection.query(keys), keys, limit, after)
     return jsonify({
         "message": "All purchases retrieved successfully",
-        "data": purchases_schema.dump(purchases)
+        "data": projection.dump_many(purchases),
+        "next_cursor": next_cursor
     }), 200
 
 @purchase_bp.route("/<int:purchase_id>", methods=["GET"])
+@versioned("purchase")
 def get_purchase(purchase_id):
     purchase = Purchase.query.get(purchase_id)
     if not purchase:
@@ -28,6 +68,7 @@ def get_purchase(purchase_id):
     }), 200
 
 @purchase_bp.route("/", methods=["POST"])
+@idempotent
 def create_purchase():
     try:
         # Validate input data
@@ -35,29 +76,39 @@ def create_purchase():
     except ValidationError as err:
         return jsonify({"message": "Validation error", "errors": err.messages}), 400
     
-    user = User.query.get(validated_data["user_id"])
-    food = FoodListing.query.get(validated_data["food_id"])
+    user = user_cache.get(validated_data["user_id"])
+    food_id = validated_data["food_id"]
     quantity = validated_data["quantity_bought"]
 
-    if not user or not food:
+    if not user:
         return jsonify({"message": "User or Food not found"}), 404
-    
-    if quantity > food.stock:
-        return jsonify({"message": "Not enough stock available"}), 400
+    denied = check_acting_user(user.id)
+    if denied:
+        return denied
 
-    try:
-        # Update stock
-        food.stock -= quantity
-        
-        # Create purchase
+    def buy():
+        # Check-and-decrement happens in the UPDATE itself, not in Python
+        listing = adjust_stock(food_id, -quantity)
+        if listing is None:
+            db.session.rollback()
+            return None
+        now = utcnow()
         purchase = Purchase(
-            user_id=user.id, 
-            food_id=food.id, 
-            quantity_bought=quantity
+            user_id=user.id,
+            food_id=food_id,
+            quantity_bought=quantity,
+            unit_price=listing.price,
+            purchase_date=now
         )
-        
         db.session.add(purchase)
+        record_sales(now.date(), [(listing, quantity, 1, listing.price)])
         db.session.commit()
+        return purchase
+
+    try:
+        purchase = with_retries(buy)
+        if purchase is None:
+            return stock_error(food_id)
         
         return jsonify({
             "message": "Purchase created successfully",
@@ -67,11 +118,86 @@ def create_purchase():
         db.session.rollback()
         return jsonify({"message": "Failed to create purchase"}), 500
 
+@purchase_bp.route("/batch", methods=["POST"])
+@idempotent
+def create_purchases_batch():
+    try:
+        # Validate input data
+        validated_data = purchase_batch_create_schema.load(request.json)
+    except ValidationError as err:
+        return jsonify({"message": "Validation error", "errors": err.messages}), 400
+
+    user = user_cache.get(validated_data["user_id"])
+    if not user:
+        return jsonify({"message": "User not found"}), 404
+    denied = check_acting_user(user.id)
+    if denied:
+        return denied
+
+    atomic = validated_data["atomic"]
+    # Always touch listings in food_id order so concurrent checkouts can't deadlock
+    lines = sorted(enumerate(validated_data["items"]), key=lambda line: line[1]["food_id"])
+
+    def checkout():
+        failed = []
+        rows = []
+        sales = []
+        now = utcnow()
+        for index, item in lines:
+            listing = adjust_stock(item["food_id"], -item["quantity_bought"])
+            if listing is not None:
+                rows.append({"user_id": user.id, "food_id": item["food_id"], "quantity_bought": item["quantity_bought"],
+                             "unit_price": listing.price, "purchase_date": now})
+                sales.append((listing, item["quantity_bought"], 1, listing.price))
+            else:
+                failed.append((index, item["food_id"]))
+                if atomic:
+                    break
+
+        if failed and (atomic or not rows):
+            db.session.rollback()
+            return [], failed
+
+        # One multi-row INSERT for every line that got its stock
+        purchases = db.session.scalars(insert(Purchase).returning(Purchase), rows).all()
+        record_sales(now.date(), sales)
+        db.session.commit()
+        return purchases, failed
+
+    try:
+        purchases, failed = with_retries(checkout)
+    except Exception:
+        db.session.rollback()
+        return jsonify({"message": "Failed to create purchases"}), 500
+
+    errors = []
+    if failed:
+        existing = {row[0] for row in db.session.query(FoodListing.id).filter(
+            FoodListing.id.in_([food_id for _, food_id in failed])
+        )}
+        errors = [{
+            "index": index,
+            "food_id": food_id,
+            "message": "Not enough stock available" if food_id in existing else "Food not found"
+        } for index, food_id in sorted(failed)]
+
+    if not purchases:
+        return jsonify({"message": "No purchases were created", "errors": errors}), 400
+
+    return jsonify({
+        "message": f"{len(purchases)} purchases created successfully",
+        "data": purchases_schema.dump(purchases),
+        "errors": errors
+    }), 201
+
 @purchase_bp.route("/<int:purchase_id>", methods=["PUT"])
 def update_purchase(purchase_id):
     purchase = Purchase.query.get(purchase_id)
     if not purchase:
         return jsonify({"message": "Purchase not found"}), 404
+    denied = check_acting_user(purchase.user_id)
+    if denied:
+        return denied
     
     try:
         # Validate input data
@@ -80,18 +206,24 @@ def update_purchase(purchase_id):
         return jsonify({"message": "Validation error", "errors": err.messages}), 400
     
     quantity = validated_data.get("quantity_bought", purchase.quantity_bought)
-    food = FoodListing.query.get(purchase.food_id)
-    
-    # Check if new quantity is valid
-    if quantity > food.stock + purchase.quantity_bought:
-        return jsonify({"message": "Not enough stock available"}), 400
+    if not purchase.food_id:
+        return jsonify({"message": "Food listing has been archived"}), 400
     
-    try:
-        # Adjust stock
-        food.stock += purchase.quantity_bought - quantity
+    def change_quantity():
+        # Give back the old quantity and take the new one in one conditional UPDATE
+        listing = adjust_stock(purchase.food_id, purchase.quantity_bought - quantity)
+        if listing is None:
+            db.session.rollback()
+            return False
+        # Extra units sell at the purchase's price, whatever the listing costs now
+        record_sales(purchase.purchase_date.date(), [(listing, quantity - purchase.quantity_bought, 0, purchase.unit_price)])
         purchase.quantity_bought = quantity
-        
         db.session.commit()
+        return True
+
+    try:
+        if not with_retries(change_quantity):
+            return jsonify({"message": "Not enough stock available"}), 400
         return jsonify({
             "message": f"Purchase {purchase_id} updated successfully",
             "data": purchase_schema.dump(purchase)
@@ -105,14 +237,23 @@ def delete_purchase(purchase_id):
     purchase = Purchase.query.get(purchase_id)
     if not purchase:
         return jsonify({"message": "Purchase not found"}), 404
+    denied = check_acting_user(purchase.user_id)
+    if denied:
+        return denied
     
-    try:
-        # Restore stock
-        food = FoodListing.query.get(purchase.food_id)
-        food.stock += purchase.quantity_bought
-        
+    def cancel():
+        # Restore stock (archived listings are no longer sellable)
+        if purchase.food_id:
+            listing = adjust_stock(purchase.food_id, purchase.quantity_bought)
+        else:
+            listing = db.session.get(ArchivedFoodListing, purchase.archived_food_id)
+        if listing is not None:
+            record_sales(purchase.purchase_date.date(), [(listing, -purchase.quantity_bought, -1, purchase.unit_price)])
         db.session.delete(purchase)
         db.session.commit()
+
+    try:
+        with_retries(cancel)
         return jsonify({"message": f"Purchase {purchase_id} deleted successfully"}), 200
     except Exception:
         db.session.rollback()
@@ -0,0 +1,160 @@
+from flask import Blueprint, jsonify, request
+from models import Reservation, Purchase, FoodListing, utcnow
+from extensions import db
+from sqlalchemy import delete, select
+from schemas import ReservationSchema, ReservationCreateSchema, PurchaseSchema
+from marshmallow import ValidationError
+from datetime import timedelta
+from transactions import with_retries
+from idempotency import idempotent
+from inventory import adjust_stock
+from rollups import record_sales
+from entity_cache import user_cache, food_cache
+from firebase_auth import check_acting_user
+
+reservation_bp = Blueprint("reservations", __name__)
+reservation_schema = ReservationSchema()
+reservation_create_schema = ReservationCreateSchema()
+purchase_schema = PurchaseSchema()
+
+def _check_holder(reservation_id):
+    """Error response if this request may not act for the reservation's user; a missing reservation is left to the view"""
+    user_id = db.session.execute(select(Reservation.user_id).where(Reservation.id == reservation_id)).scalar()
+    return None if user_id is None else check_acting_user(user_id)
+
+@reservation_bp.route("/", methods=["POST"])
+@idempotent
+def create_reservation():
+    try:
+        # Validate input data
+        validated_data = reservation_create_schema.load(request.json)
+    except ValidationError as err:
+        return jsonify({"message": "Validation error", "errors": err.messages}), 400
+
+    if not user_cache.get(validated_data["user_id"]):
+        return jsonify({"message": "User not found"}), 404
+    denied = check_acting_user(validated_data["user_id"])
+    if denied:
+        return denied
+
+    food_id = validated_data["food_id"]
+    quantity = validated_data["quantity"]
+
+    def hold():
+        # Held units leave FoodListing.stock now, so checkout never has to touch the listing row
+        if not adjust_stock(food_id, -quantity):
+            db.session.rollback()
+            return None
+        reservation = Reservation(
+            user_id=validated_data["user_id"],
+            food_id=food_id,
+            quantity=quantity,
+            expires_at=utcnow() + timedelta(minutes=validated_data["minutes"])
+        )
+        db.session.add(reservation)
+        db.session.commit()
+        return reservation
+
+    try:
+        reservation = with_retries(hold)
+    except Exception:
+        db.session.rollback()
+        return jsonify({"message": "Failed to create reservation"}), 500
+
+    if reservation is None:
+        if food_cache.get(food_id) is None:
+            return jsonify({"message": "Food not found"}), 404
+        return jsonify({"message": "Not enough stock available"}), 400
+
+    return jsonify({
+        "message": "Reservation created successfully",
+        "data": reservation_schema.dump(reservation)
+    }), 201
+
+@reservation_bp.route("/<int:reservation_id>", methods=["GET"])
+def get_reservation(reservation_id):
+    reservation = Reservation.query.get(reservation_id)
+    if not reservation or reservation.expires_at <= utcnow():
+        return jsonify({"message": "Reservation not found"}), 404
+    return jsonify({
+        "message": f"Reservation {reservation_id} retrieved successfully",
+        "data": reservation_schema.dump(reservation)
+    }), 200
+
+@reservation_bp.route("/<int:reservation_id>/checkout", methods=["POST"])
+@idempotent
+def checkout_reservation(reservation_id):
+    denied = _check_holder(reservation_id)
+    if denied:
+        return denied
+
+    def convert():
+        # Claiming the hold and creating the purchase touch only reservation/purchase rows
+        row = db.session.execute(
+            delete(Reservation)
+            .where(Reservation.id == reservation_id, Reservation.expires_at > utcnow())
+            .returning(Reservation.user_id, Reservation.food_id, Reservation.quantity)
+            .execution_options(synchronize_session=False)
+        ).first()
+        if row is None:
+            db.session.rollback()
+            return None
+        now = utcnow()
+        # A plain read: the stock was already taken when the hold was placed.
+        # The hold fixes the quantity, not the price; the sale is priced now.
+        listing = db.session.execute(
+            select(FoodListing.user_id, FoodListing.category, FoodListing.price)
+            .where(FoodListing.id == row.food_id)
+        ).first()
+        unit_price = listing.price if listing is not None else 0.0
+        purchase = Purchase(user_id=row.user_id, food_id=row.food_id, quantity_bought=row.quantity,
+                            unit_price=unit_price, purchase_date=now)
+        db.session.add(purchase)
+        if listing is not None:
+            record_sales(now.date(), [(listing, row.quantity, 1, unit_price)])
+        db.session.commit()
+        return purchase
+
+    try:
+        purchase = with_retries(convert)
+    except Exception:
+        db.session.rollback()
+        return jsonify({"message": "Failed to check out reservation"}), 500
+
+    if purchase is None:
+        return jsonify({"message": "Reservation not found or expired"}), 404
+
+    return jsonify({
+        "message": "Purchase created successfully",
+        "data": purchase_schema.dump(purchase)
+    }), 201
+
+@reservation_bp.route("/<int:reservation_id>", methods=["DELETE"])
+def delete_reservation(reservation_id):
+    denied = _check_holder(reservation_id)
+    if denied:
+        return denied
+
+    def release():
+        row = db.session.execute(
+            delete(Reservation)
+            .where(Reservation.id == reservation_id)
+            .returning(Reservation.food_id, Reservation.quantity)
+            .execution_options(synchronize_session=False)
+        ).first()
+        if row is None:
+            db.session.rollback()
+            return False
+        adjust_stock(row.food_id, row.quantity)
+        db.session.commit()
+        return True
+
+    try:
+        released = with_retries(release)
+    except Exception:
+        db.session.rollback()
+        return jsonify({"message": "Failed to release reservation"}), 500
+
+    if not released:
+        return jsonify({"message": "Reservation not found"}), 404
+    return jsonify({"message": f"Reservation {reservation_id} released successfully"}), 200
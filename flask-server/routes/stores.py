@@ -0,0 +1,160 @@
+from flask import Blueprint, jsonify, request
+from models import User, FoodListing, ArchivedFoodListing, Purchase, utcnow
+from extensions import db
+from sqlalchemy import and_, case, func, or_, select, true
+from schemas import PurchaseSchema
+from datetime import date, timedelta
+from pagination import SortKey, PaginationError, get_page_args, paginate
+from serializers import RowSerializer
+from versioning import versioned
+from streaming import NDJSON_MIMETYPE
+from inventory_sync import InventorySync, InventoryFormatError, read_rows
+from entity_cache import user_cache
+from firebase_auth import caller_is_admin, check_acting_user
+from inventory import release_expired_before_request
+
+store_bp = Blueprint("stores", __name__)
+store_bp.before_request(release_expired_before_request)
+purchase_rows = RowSerializer(PurchaseSchema())
+
+URGENT_DAYS = 2  # listings expiring within this many days count as urgent
+
+def _sales(listing_model, purchase_fk, user_id, since):
+    """One-row aggregate of purchases of a store's listings (live or archived)"""
+    return select(
+        func.count(Purchase.id).label("orders"),
+        func.coalesce(func.sum(Purchase.quantity_bought), 0).label("units"),
+        func.coalesce(func.sum(Purchase.quantity_bought * Purchase.unit_price), 0).label("revenue"),
+        func.coalesce(func.sum(case((Purchase.purchase_date >= since, 1), else_=0)), 0).label("recent"),
+    ).select_from(Purchase).join(listing_model, listing_model.id == purchase_fk).where(
+        listing_model.user_id == user_id
+    ).subquery()
+
+@store_bp.route("/<int:user_id>/dashboard", methods=["GET"])
+@versioned("user", "food_listing", "purchase", clock="day")
+def get_store_dashboard(user_id):
+    today = date.today()
+    active = and_(
+        FoodListing.stock > 0,
+        or_(FoodListing.expiry_date.is_(None), FoodListing.expiry_date >= today)
+    )
+    urgent = and_(active, FoodListing.expiry_date <= today + timedelta(days=URGENT_DAYS))
+
+    listings = select(
+        func.count(FoodListing.id).label("total"),
+        func.coalesce(func.sum(case((active, 1), else_=0)), 0).label("active"),
+        func.coalesce(func.sum(case((urgent, 1), else_=0)), 0).label("urgent"),
+        func.coalesce(func.sum(case((active, FoodListing.stock), else_=0)), 0).label("units_in_stock"),
+    ).where(FoodListing.user_id == user_id).subquery()
+
+    since = utcnow() - timedelta(hours=24)
+    live = _sales(FoodListing, Purchase.food_id, user_id, since)
+    archived = _sales(ArchivedFoodListing, Purchase.archived_food_id, user_id, since)
+
+    # Each subquery is a single row, so joining them is free and every
+    # aggregate comes back in one round trip
+    row = db.session.execute(select(
+        select(User.id).where(User.id == user_id).scalar_subquery().label("store_id"),
+        listings.c.total, listings.c.active, listings.c.urgent, listings.c.units_in_stock,
+        (live.c.orders + archived.c.orders).label("orders"),
+        (live.c.units + archived.c.units).label("units_sold"),
+        (live.c.revenue + archived.c.revenue).label("revenue"),
+        (live.c.recent + archived.c.recent).label("recent_orders"),
+    ).select_from(listings.join(live, true()).join(archived, true()))).one()
+
+    if row.store_id is None:
+        return jsonify({"message": "User not found"}), 404
+
+    return jsonify({
+        "message": f"Dashboard for store {user_id} retrieved successfully",
+        "data": {
+            "listings": {
+                "total": row.total,
+                "active": row.active,
+                "urgent": row.urgent,
+                "units_in_stock": row.units_in_stock
+            },
+            "orders": {
+                "total": row.orders,
+                "last_24h": row.recent_orders,
+                "units_sold": row.units_sold,
+                "revenue": round(float(row.revenue), 2)
+            }
+        }
+    }), 200
+
+@store_bp.route("/<int:user_id>/orders", methods=["GET"])
+@versioned("user", "food_listing", "purchase")
+def get_store_orders(user_id):
+    keys = [SortKey(Purchase.purchase_date, descending=True), SortKey(Purchase.id, descending=True)]
+    try:
+        limit, after = get_page_args(keys)
+    except PaginationError as err:
+        return jsonify({"message": str(err)}), 400
+
+    if user_cache.get(user_id) is None:
+        return jsonify({"message": "User not found"}), 404
+    # Orders carry buyers' names and emails: only the store itself or an admin may see them
+    if not caller_is_admin():
+        denied = check_acting_user(user_id)
+        if denied:
+            return denied
+
+    # Both IN lists come from the store's own listings, so this walks the
+    # food_id / archived_food_id indexes rather than the whole purchase table
+    store_listings = select(FoodListing.id).where(FoodListing.user_id == user_id)
+    store_archived = select(ArchivedFoodListing.id).where(ArchivedFoodListing.user_id == user_id)
+    query = (
+        purchase_rows.query()
+        .filter(or_(Purchase.food_id.in_(store_listings), Purchase.archived_food_id.in_(store_archived)))
+        .outerjoin(FoodListing, FoodListing.id == Purchase.food_id)
+        .outerjoin(ArchivedFoodListing, ArchivedFoodListing.id == Purchase.archived_food_id)
+        .join(User, User.id == Purchase.user_id)
+        .add_columns(
+            func.coalesce(FoodListing.name, ArchivedFoodListing.name).label("food_name"),
+            func.coalesce(FoodListing.price, ArchivedFoodListing.price).label("food_price"),
+            func.coalesce(FoodListing.category, ArchivedFoodListing.category).label("food_category"),
+            User.name.label("buyer_name"),
+            User.email.label("buyer_email"),
+        )
+    )
+    orders, next_cursor = paginate(query, keys, limit, after)
+
+    data = purchase_rows.dump_many(orders)
+    for item, row in zip(data, orders):
+        item["food"] = {"name": row.food_name, "price": row.food_price, "category": row.food_category}
+        item["buyer"] = {"name": row.buyer_name, "email": row.buyer_email}
+
+    return jsonify({
+        "message": f"Orders for store {user_id} retrieved successfully",
+        "data": data,
+        "next_cursor": next_cursor
+    }), 200
+
+@store_bp.route("/<int:user_id>/inventory-sync", methods=["POST"])
+def sync_store_inventory(user_id):
+    """Apply a full CSV/NDJSON inventory export (raw request body) from the store's POS"""
+    # Only the store itself may rewrite its listings
+    denied = check_acting_user(user_id, required=True)
+    if denied:
+        return denied
+
+    fmt = request.args.get("format") or ("ndjson" if request.mimetype == NDJSON_MIMETYPE else "csv")
+    if fmt not in ("csv", "ndjson"):
+        return jsonify({"message": "format must be csv or ndjson"}), 400
+    delete_missing = request.args.get("delete_missing", "false").lower() in ("1", "true", "yes")
+
+    sync = InventorySync(user_id, delete_missing=delete_missing)
+    try:
+        summary = sync.run(read_rows(request.stream, fmt))
+    except InventoryFormatError as err:
+        # Batches before the bad line are applied; nothing was removed
+        return jsonify({"message": str(err), "data": sync.summary()}), 400
+    except Exception:
+        db.session.rollback()
+        return jsonify({"message": "Inventory sync failed", "data": sync.summary()}), 500
+
+    return jsonify({
+        "message": f"Inventory for store {user_id} synced",
+        "data": summary
+    }), 200
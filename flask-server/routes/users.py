@@ -1,25 +1,53 @@
-from flask import Blueprint, jsonify, request
-from models import User
-from extensions import db
-from schemas import UserSchema, UserCreateSchema
+from flask import Blueprint, current_app, g, jsonify, request
+from models import User, Purchase, FoodListing, ArchivedFoodListing, Reservation, utcnow
+from extensions import db, upsert
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from schemas import UserSchema, UserCreateSchema, PurchaseSchema
 from marshmallow import ValidationError
+from pagination import SortKey, PaginationError, get_page_args, paginate
+from serializers import RowSerializer, Projection, FieldSelectionError
+from streaming import wants_stream, stream_rows
+from versioning import versioned
+from entity_cache import user_cache
+from firebase_auth import caller_is_admin, check_acting_user, check_firebase_identity
+from inventory import release_holds
 
 user_bp = Blueprint("users", __name__)
 user_schema = UserSchema()
 users_schema = UserSchema(many=True)
+user_rows = RowSerializer(user_schema)  # fast path for read-only lists
+purchase_rows = RowSerializer(PurchaseSchema())
 user_create_schema = UserCreateSchema()
 
 @user_bp.route("/", methods=["GET"])
+@versioned("user")
 def get_users():
-    users = User.query.all()
+    try:
+        projection = Projection(user_rows)
+    except FieldSelectionError as err:
+        return jsonify({"message": str(err)}), 400
+
+    keys = [SortKey(User.id)]
+    if wants_stream():
+        return stream_rows(projection.query(keys), keys, projection.dump_many)
+
+    try:
+        limit, after = get_page_args(keys)
+    except PaginationError as err:
+        return jsonify({"message": str(err)}), 400
+
+    users, next_cursor = paginate(projection.query(keys), keys, limit, after)
     return jsonify({
         "message": "All users retrieved successfully",
-        "data": users_schema.dump(users)
+        "data": projection.dump_many(users),
+        "next_cursor": next_cursor
     }), 200
 
 @user_bp.route("/<int:user_id>", methods=["GET"])
+@versioned("user")
 def get_user(user_id):
-    user = User.query.get(user_id)
+    user = user_cache.get(user_id)
     if not user:
         return jsonify({"message": "User not found"}), 404
     return jsonify({
@@ -27,6 +55,52 @@ def get_user(user_id):
         "data": user_schema.dump(user)
     }), 200
 
+@user_bp.route("/<int:user_id>/purchases", methods=["GET"])
+@versioned("purchase", expand={"food": "food_listing"})
+def get_user_purchases(user_id):
+    expand = [name.strip() for name in request.args.get("expand", "").split(",") if name.strip()]
+    unknown = [name for name in expand if name != "food"]
+    if unknown:
+        return jsonify({"message": f"Cannot expand: {', '.join(unknown)}"}), 400
+
+    # Walks ix_purchase_user_date backwards: newest purchases first
+    keys = [SortKey(Purchase.purchase_date, descending=True), SortKey(Purchase.id, descending=True)]
+    try:
+        limit, after = get_page_args(keys)
+    except PaginationError as err:
+        return jsonify({"message": str(err)}), 400
+
+    if user_cache.get(user_id) is None:
+        return jsonify({"message": "User not found"}), 404
+    if not caller_is_admin():
+        denied = check_acting_user(user_id)
+        if denied:
+            return denied
+
+    query = purchase_rows.query().filter(Purchase.user_id == user_id)
+    if "food" in expand:
+        # Archived listings still name the item in the buyer's history
+        query = (
+            query.outerjoin(FoodListing, FoodListing.id == Purchase.food_id)
+            .outerjoin(ArchivedFoodListing, ArchivedFoodListing.id == Purchase.archived_food_id)
+            .add_columns(
+                func.coalesce(FoodListing.name, ArchivedFoodListing.name).label("food_name"),
+                func.coalesce(FoodListing.price, ArchivedFoodListing.price).label("food_price"),
+            )
+        )
+
+    purchases, next_cursor = paginate(query, keys, limit, after)
+    data = purchase_rows.dump_many(purchases)
+    if "food" in expand:
+        for item, row in zip(data, purchases):
+            item["food"] = {"name": row.food_name, "price": row.food_price}
+
+    return jsonify({
+        "message": f"Purchases for user {user_id} retrieved successfully",
+        "data": data,
+        "next_cursor": next_cursor
+    }), 200
+
 @user_bp.route("/", methods=["POST"])
 def create_user():
     try:
@@ -35,6 +109,23 @@ def create_user():
     except ValidationError as err:
         return jsonify({"message": "Validation error", "errors": err.messages}), 400
     
+    # Only an admin may pick the role and Firebase UID freely; anyone else
+    # signs up as themselves, with the UID taken from their verified ID token
+    firebase_uid = validated_data.get("firebase_uid")
+    if not caller_is_admin():
+        if validated_data["role"] == "admin":
+            return jsonify({"message": "Only an admin can create admin users"}), 403
+        claims = g.get("firebase")
+        if claims is not None:
+            denied = check_firebase_identity(claims["sub"], validated_data["email"])
+            if denied:
+                return denied
+            firebase_uid = claims["sub"]
+        elif current_app.config.get("FIREBASE_AUTH_REQUIRED"):
+            return jsonify({"message": "Firebase ID token required"}), 401
+        elif firebase_uid:
+            return jsonify({"message": "firebase_uid must come from a verified ID token"}), 403
+
     # Check if user with email already exists
     existing_user = User.query.filter_by(email=validated_data["email"]).first()
     if existing_user:
@@ -44,7 +135,7 @@ def create_user():
         name=validated_data["name"],
         email=validated_data["email"],
         role=validated_data["role"],
-        firebase_uid=validated_data.get("firebase_uid")
+        firebase_uid=firebase_uid
     )
     
     try:
@@ -63,12 +154,23 @@ def update_user(user_id):
     user = User.query.get(user_id)
     if not user:
         return jsonify({"message": "User not found"}), 404
+    admin = caller_is_admin()
+    if not admin:
+        denied = check_acting_user(user_id)
+        if denied:
+            return denied
     
     try:
         # Validate input data
         validated_data = user_create_schema.load(request.json, partial=True)
     except ValidationError as err:
         return jsonify({"message": "Validation error", "errors": err.messages}), 400
+
+    # The role and the UID other routes trust as this user's identity are admin-only
+    if not admin and any(
+        key in validated_data and validated_data[key] != getattr(user, key) for key in ("role", "firebase_uid")
+    ):
+        return jsonify({"message": "Only an admin can change a user's role or Firebase UID"}), 403
     
     # Update user attributes
     for key, value in validated_data.items():
@@ -89,8 +191,14 @@ def delete_user(user_id):
     user = User.query.get(user_id)
     if not user:
         return jsonify({"message": "User not found"}), 404
+    if not caller_is_admin():
+        denied = check_acting_user(user_id)
+        if denied:
+            return denied
     
     try:
+        # Their holds are deleted with them; put the held stock back on sale
+        release_holds(Reservation.user_id == user_id)
         db.session.delete(user)
         db.session.commit()
         return jsonify({"message": f"User {user_id} deleted successfully"}), 200
@@ -99,8 +207,9 @@ def delete_user(user_id):
         return jsonify({"message": "Failed to delete user"}), 500
 
 @user_bp.route("/by-email/<email>", methods=["GET"])
+@versioned("user")
 def get_user_by_email(email):
-    user = User.query.filter_by(email=email).first()
+    user = user_cache.get_by("email", email)
     if not user:
         return jsonify({"message": "User not found"}), 404
     return jsonify({
@@ -109,8 +218,12 @@ def get_user_by_email(email):
     }), 200
 
 @user_bp.route("/by-firebase-uid/<firebase_uid>", methods=["GET"])
+@versioned("user")
 def get_user_by_firebase_uid(firebase_uid):
-    user = User.query.filter_by(firebase_uid=firebase_uid).first()
+    denied = check_firebase_identity(firebase_uid)
+    if denied:
+        return denied
+    user = user_cache.get_by("firebase_uid", firebase_uid)
     if not user:
         return jsonify({"message": "User not found"}), 404
     return jsonify({
@@ -120,6 +233,11 @@ def get_user_by_firebase_uid(firebase_uid):
 
 @user_bp.route("/sync-firebase", methods=["POST"])
 def sync_firebase_user():
+    """
+    Called on every client login. Repeat logins are answered from the identity
+    cache; otherwise one upsert creates the user, or links the Firebase UID to
+    the account with that email, and returns the row.
+    """
     try:
         data = request.json
         firebase_uid = data.get("firebase_uid")
@@ -128,26 +246,17 @@ def sync_firebase_user():
         
         if not firebase_uid or not email:
             return jsonify({"message": "Firebase UID and email are required"}), 400
+        denied = check_firebase_identity(firebase_uid, email)
+        if denied:
+            return denied
         
-        # Check if user already exists by Firebase UID
-        existing_user = User.query.filter_by(firebase_uid=firebase_uid).first()
+        existing_user = user_cache.get_by("firebase_uid", firebase_uid)
         if existing_user:
             return jsonify({
                 "message": "User already exists",
                 "data": user_schema.dump(existing_user)
             }), 200
         
-        # Check if user exists by email
-        existing_email_user = User.query.filter_by(email=email).first()
-        if existing_email_user:
-            # Update existing user with Firebase UID (preserve existing role)
-            existing_email_user.firebase_uid = firebase_uid
-            db.session.commit()
-            return jsonify({
-                "message": "User updated with Firebase UID",
-                "data": user_schema.dump(existing_email_user)
-            }), 200
-        
         # For new users, determine role based on email (legacy fallback)
         if email.endswith('@store.'):
             role = 'store_owner'
@@ -156,17 +265,44 @@ def sync_firebase_user():
         else:
             role = 'customer'
         
-        # Create new user
-        user = User(
+        # An existing account with this email keeps its name and role and only gains
+        # the UID; a new row is told apart by carrying the created_at we sent
+        now = utcnow()
+        statement = upsert(User).values(
             name=name or email.split('@')[0],
             email=email,
             role=role,
-            firebase_uid=firebase_uid
+            firebase_uid=firebase_uid,
+            created_at=now
         )
+        try:
+            user = dict(db.session.execute(
+                statement.on_conflict_do_update(
+                    index_elements=["email"],
+                    set_={"firebase_uid": statement.excluded.firebase_uid}
+                ).returning(*user_cache.columns)
+            ).mappings().one())
+            user_cache.mark_changed([user["id"]])
+            db.session.commit()
+        except IntegrityError:
+            # Lost a race for this UID (under another email); that row is the answer.
+            # Read it from the database: the cache may remember the UID as missing.
+            db.session.rollback()
+            user_cache.forget_missing("firebase_uid", firebase_uid)
+            existing_user = db.session.execute(select(User).where(User.firebase_uid == firebase_uid)).scalar()
+            if existing_user is None:
+                raise
+            return jsonify({
+                "message": "User already exists",
+                "data": user_schema.dump(existing_user)
+            }), 200
         
-        db.session.add(user)
-        db.session.commit()
-        
+        user_cache.prime(user)
+        if user["created_at"] != now:
+            return jsonify({
+                "message": "User updated with Firebase UID",
+                "data": user_schema.dump(user)
+            }), 200
         return jsonify({
             "message": "User created and synced with Firebase",
             "data": user_schema.dump(user)
@@ -1,12 +1,18 @@
-from marshmallow import Schema, fields, validate
+from marshmallow import Schema, fields, validate, validates_schema, ValidationError, EXCLUDE
 from marshmallow_sqlalchemy import SQLAlchemyAutoSchema
-from models import User, FoodListing, Purchase
+from models import User, FoodListing, Purchase, Reservation
 
 class UserSchema(SQLAlchemyAutoSchema):
     class Meta:
         model = User
         load_instance = True
 
+class ReservationSchema(SQLAlchemyAutoSchema):
+    class Meta:
+        model = Reservation
+        load_instance = True
+        include_fk = True
+
 class FoodListingSchema(SQLAlchemyAutoSchema):
     class Meta:
         model = FoodListing
@@ -34,8 +40,89 @@ class FoodListingCreateSchema(Schema):
     stock = fields.Int(validate=validate.Range(min=0), missing=1)
     price = fields.Float(validate=validate.Range(min=0), missing=0.0)
     expiry_date = fields.Date(allow_none=True)
+    sku = fields.Str(allow_none=True, validate=validate.Length(min=1, max=64))
+
+class InventoryRowSchema(Schema):
+    # One line of a store's inventory-sync upload
+    class Meta:
+        unknown = EXCLUDE
+
+    sku = fields.Str(required=True, validate=validate.Length(min=1, max=64))
+    name = fields.Str(required=True, validate=validate.Length(min=1, max=100))
+    description = fields.Str(allow_none=True, load_default=None)
+    category = fields.Str(required=True)
+    stock = fields.Int(required=True, validate=validate.Range(min=0))
+    price = fields.Float(required=True, validate=validate.Range(min=0))
+    expiry_date = fields.Date(allow_none=True, load_default=None)
 
 class PurchaseCreateSchema(Schema):
     user_id = fields.Int(required=True)
     food_id = fields.Int(required=True)
     quantity_bought = fields.Int(required=True, validate=validate.Range(min=1))
+
+class ReservationCreateSchema(Schema):
+    user_id = fields.Int(required=True)
+    food_id = fields.Int(required=True)
+    quantity = fields.Int(required=True, validate=validate.Range(min=1))
+    minutes = fields.Int(validate=validate.Range(min=1, max=60), load_default=15)
+
+class PurchaseLineSchema(Schema):
+    food_id = fields.Int(required=True)
+    quantity_bought = fields.Int(required=True, validate=validate.Range(min=1))
+
+class PurchaseBatchCreateSchema(Schema):
+    user_id = fields.Int(required=True)
+    items = fields.List(fields.Nested(PurchaseLineSchema), required=True, validate=validate.Length(min=1, max=200))
+    atomic = fields.Bool(load_default=True)  # False = buy whatever lines can be filled
+
+# Query-string schemas for list endpoints
+class FoodListingQuerySchema(Schema):
+    class Meta:
+        unknown = EXCLUDE
+
+    owner = fields.Int()
+    category = fields.Str()
+    min_price = fields.Float(validate=validate.Range(min=0))
+    max_price = fields.Float(validate=validate.Range(min=0))
+    expires_before = fields.Date()
+    in_stock = fields.Bool()
+    include_expired = fields.Bool(load_default=False)
+    sort = fields.Str(validate=validate.OneOf(['price', 'expiry', 'newest']))
+
+class ExpiringQuerySchema(Schema):
+    class Meta:
+        unknown = EXCLUDE
+
+    within = fields.Int(validate=validate.Range(min=1, max=24 * 30), load_default=48)  # hours
+
+class ExportQuerySchema(Schema):
+    class Meta:
+        unknown = EXCLUDE
+
+    format = fields.Str(validate=validate.OneOf(['csv', 'ndjson', 'parquet']), load_default='csv')
+    start = fields.Date(data_key='from')
+    end = fields.Date(data_key='to')
+
+    @validates_schema
+    def validate_range(self, data, **kwargs):
+        if 'start' in data and 'end' in data and data['start'] > data['end']:
+            raise ValidationError("'from' must not be after 'to'", 'from')
+
+class SalesQuerySchema(Schema):
+    class Meta:
+        unknown = EXCLUDE
+
+    granularity = fields.Str(validate=validate.OneOf(['day', 'week', 'month']), load_default='day')
+    start = fields.Date(data_key='from')
+    end = fields.Date(data_key='to')
+    store_id = fields.Int()
+    category = fields.Str()
+    group_by = fields.Str(load_default='')  # comma-separated: store, category
+
+    @validates_schema
+    def validate_range(self, data, **kwargs):
+        if 'start' in data and 'end' in data and data['start'] > data['end']:
+            raise ValidationError("'from' must not be after 'to'", 'from')
+        unknown = set(filter(None, data['group_by'].split(','))) - {'store', 'category'}
+        if unknown:
+            raise ValidationError(f"Cannot group by: {', '.join(sorted(unknown))}", 'group_by')
@@ -0,0 +1,96 @@
+import re
+from sqlalchemy import text
+from extensions import db
+
+# Text that gets indexed for each listing; name is weighted highest when ranking
+DOCUMENT_SQL = "(name || ' ' || coalesce(description, '') || ' ' || category)"
+
+SQLITE_SETUP = [
+    # External-content FTS5 table: stores only the index, rows live in food_listing.
+    # The trigram tokenizer gives substring matching, which is what makes typos survivable.
+    """CREATE VIRTUAL TABLE IF NOT EXISTS food_listing_fts USING fts5(
+        name, description, category,
+        content='food_listing', content_rowid='id', tokenize='trigram'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS food_listing_fts_ai AFTER INSERT ON food_listing BEGIN
+        INSERT INTO food_listing_fts(rowid, name, description, category)
+        VALUES (new.id, new.name, new.description, new.category);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS food_listing_fts_ad AFTER DELETE ON food_listing BEGIN
+        INSERT INTO food_listing_fts(food_listing_fts, rowid, name, description, category)
+        VALUES ('delete', old.id, old.name, old.description, old.category);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS food_listing_fts_au AFTER UPDATE OF name, description, category ON food_listing BEGIN
+        INSERT INTO food_listing_fts(food_listing_fts, rowid, name, description, category)
+        VALUES ('delete', old.id, old.name, old.description, old.category);
+        INSERT INTO food_listing_fts(rowid, name, description, category)
+        VALUES (new.id, new.name, new.description, new.category);
+    END""",
+]
+
+POSTGRES_SETUP = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    f"""CREATE INDEX IF NOT EXISTS ix_food_listing_search_tsv ON food_listing
+        USING gin (to_tsvector('english', {DOCUMENT_SQL}))""",
+    f"""CREATE INDEX IF NOT EXISTS ix_food_listing_search_trgm ON food_listing
+        USING gin ({DOCUMENT_SQL} gin_trgm_ops)""",
+]
+
+
+def ensure_search_index():
+    """Create the text index for the current database (safe to run on every start)"""
+    dialect = db.engine.dialect.name
+    if dialect == "sqlite":
+        with db.engine.begin() as conn:
+            is_new = conn.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE name = 'food_listing_fts'"
+            )).first() is None
+            for statement in SQLITE_SETUP:
+                conn.execute(text(statement))
+            if is_new:
+                # Index listings that existed before the FTS table did
+                conn.execute(text("INSERT INTO food_listing_fts(food_listing_fts) VALUES ('rebuild')"))
+    elif dialect == "postgresql":
+        with db.engine.begin() as conn:
+            for statement in POSTGRES_SETUP:
+                conn.execute(text(statement))
+
+
+def _trigrams(q):
+    """Lowercased 3-character windows of every word in the query"""
+    grams = []
+    for word in re.findall(r"\w+", q.lower()):
+        for i in range(len(word) - 2):
+            gram = word[i:i + 3]
+            if gram not in grams:
+                grams.append(gram)
+    return grams
+
+
+def search_food_ids(q, limit):
+    """Return ids of the listings that best match `q`, best match first"""
+    dialect = db.engine.dialect.name
+    grams = _trigrams(q)
+    if dialect == "sqlite" and grams:
+        # OR-ing the query's trigrams turns bm25 into a typo-tolerant similarity score
+        match = " OR ".join('"%s"' % gram.replace('"', '""') for gram in grams)
+        rows = db.session.execute(text(
+            "SELECT rowid FROM food_listing_fts WHERE food_listing_fts MATCH :match "
+            "ORDER BY bm25(food_listing_fts, 10.0, 2.0, 5.0) LIMIT :limit"
+        ), {"match": match, "limit": limit})
+    elif dialect == "postgresql":
+        rows = db.session.execute(text(
+            f"SELECT id FROM food_listing "
+            f"WHERE to_tsvector('english', {DOCUMENT_SQL}) @@ plainto_tsquery('english', :q) "
+            f"OR :q <% {DOCUMENT_SQL} "
+            f"ORDER BY ts_rank(to_tsvector('english', {DOCUMENT_SQL}), plainto_tsquery('english', :q)) "
+            f"+ word_similarity(:q, {DOCUMENT_SQL}) DESC, id "
+            f"LIMIT :limit"
+        ), {"q": q, "limit": limit})
+    else:
+        # Queries too short for trigrams (and other databases) fall back to a plain scan
+        pattern = f"%{q}%"
+        rows = db.session.execute(text(
+            f"SELECT id FROM food_listing WHERE {DOCUMENT_SQL} LIKE :pattern ORDER BY id LIMIT :limit"
+        ), {"pattern": pattern, "limit": limit})
+    return [row[0] for row in rows]
@@ -0,0 +1,37 @@
+from flask import Response, current_app, request, stream_with_context
+
+NDJSON_MIMETYPE = "application/x-ndjson"
+STREAM_BATCH_SIZE = 1000
+
+
+def wants_stream():
+    """True when the client asked for NDJSON via ?stream=1 or the Accept header"""
+    if request.args.get("stream", "").lower() in ("1", "true"):
+        return True
+    return request.accept_mimetypes.best_match(["application/json", NDJSON_MIMETYPE]) == NDJSON_MIMETYPE
+
+
+def stream_rows(query, keys, dump_many):
+    """
+    Stream every row of `query` (ordered by `keys`) as NDJSON, one object per line.
+    Rows are fetched STREAM_BATCH_SIZE at a time from a server-side cursor and
+    handed to `dump_many` a batch at a time, so memory stays flat no matter how
+    large the table is.
+    """
+    query = query.order_by(*[key.order_by() for key in keys]).yield_per(STREAM_BATCH_SIZE)
+    dumps = current_app.json.dumps
+
+    def encode(batch):
+        return "".join(dumps(item) + "\n" for item in dump_many(batch))
+
+    def generate():
+        batch = []
+        for row in query:
+            batch.append(row)
+            if len(batch) >= STREAM_BATCH_SIZE:
+                yield encode(batch)
+                batch = []
+        if batch:
+            yield encode(batch)
+
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
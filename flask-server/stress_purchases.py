@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Concurrency harness for POST /api/purchases/: many workers buy one unit at a
+time from a single listing until it sells out, then the totals are checked for
+oversells.
+Usage: python stress_purchases.py [--workers N] [--stock N] [--processes] [--database-url URL]
+Without --database-url a throwaway SQLite (WAL) database is used; point it at
+a scratch Postgres database to test that backend.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Hammer one listing with concurrent purchases")
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--stock", type=int, default=500)
+    parser.add_argument("--processes", action="store_true", help="use processes instead of threads")
+    parser.add_argument("--database-url", help="defaults to a temporary SQLite file")
+    return parser.parse_args()
+
+
+args = parse_args()
+os.environ["DATABASE_URL"] = args.database_url or "sqlite:///" + os.path.join(tempfile.mkdtemp(), "stress.db")
+
+from app import app
+from extensions import db
+from models import User, FoodListing, Purchase
+
+
+def setup(stock):
+    with app.app_context():
+        buyer = User(name="Stress Buyer", email=f"stress-{time.time_ns()}@test.local", role="customer")
+        db.session.add(buyer)
+        db.session.flush()
+        food = FoodListing(name="Hot item", category="Bakery", user_id=buyer.id, stock=stock, price=1.0)
+        db.session.add(food)
+        db.session.commit()
+        return buyer.id, food.id
+
+
+def reset_pool():
+    # Forked processes must not share the parent's pooled connections
+    with app.app_context():
+        db.engine.dispose()
+
+
+def buy_until_sold_out(user_id, food_id):
+    client = app.test_client()
+    bought = failed = 0
+    while True:
+        response = client.post("/api/purchases/", json={"user_id": user_id, "food_id": food_id, "quantity_bought": 1})
+        if response.status_code == 201:
+            bought += 1
+        elif response.status_code == 400:
+            return bought, failed
+        else:
+            failed += 1
+
+
+def main():
+    user_id, food_id = setup(args.stock)
+    if args.processes:
+        executor = ProcessPoolExecutor(args.workers, initializer=reset_pool)
+    else:
+        executor = ThreadPoolExecutor(args.workers)
+
+    start = time.perf_counter()
+    with executor:
+        results = list(executor.map(buy_until_sold_out, [user_id] * args.workers, [food_id] * args.workers))
+    elapsed = time.perf_counter() - start
+
+    bought = sum(r[0] for r in results)
+    failed = sum(r[1] for r in results)
+    with app.app_context():
+        final_stock = db.session.get(FoodListing, food_id).stock
+        sold = db.session.query(db.func.coalesce(db.func.sum(Purchase.quantity_bought), 0)).filter(
+            Purchase.food_id == food_id
+        ).scalar()
+        dialect = db.engine.dialect.name
+
+    mode = "processes" if args.processes else "threads"
+    print(f"{dialect}, {args.workers} {mode}, stock {args.stock}")
+    print(f"  purchases: {bought} ok, {failed} errors in {elapsed:.2f}s ({bought / elapsed:,.0f}/s)")
+    print(f"  final stock: {final_stock}, units sold: {sold}")
+    oversold = sold - args.stock
+    print(f"  oversells: {max(oversold, 0)}")
+    return 0 if oversold <= 0 and final_stock == args.stock - sold and final_stock >= 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+import threading
+import time
+from datetime import date, timedelta
+from sqlalchemy import case, delete, exists, insert, literal, select, update
+from extensions import db
+from models import FoodListing, ArchivedFoodListing, Purchase, Reservation, utcnow
+from idempotency import sweep_idempotency_keys
+from inventory import release_expired_reservations
+
+DEFAULT_BATCH_SIZE = 500
+EXPIRED_GRACE_DAYS = 1     # keep a listing around for a day after its expiry date
+SOLD_OUT_GRACE_DAYS = 7    # archive sold-out listings once nobody has bought them for a week
+
+
+def _candidate_ids(batch_size, expired_before, sold_out_before):
+    """Ids of up to `batch_size` listings that are expired or long sold out"""
+    recent_purchase = exists().where(
+        Purchase.food_id == FoodListing.id,
+        Purchase.purchase_date >= sold_out_before,
+    )
+    # Listings with outstanding holds stay until the holds are checked out or released
+    held = exists().where(Reservation.food_id == FoodListing.id)
+    query = select(FoodListing.id).where(
+        (FoodListing.expiry_date < expired_before)
+        | ((FoodListing.stock <= 0) & ~recent_purchase),
+        ~held,
+    ).order_by(FoodListing.id).limit(batch_size)
+    return [row[0] for row in db.session.execute(query)]
+
+
+def archive_batch(ids, expired_before=None, reason=None):
+    """
+    Move the given listings into archived_food_listing in one transaction.
+    Without an explicit `reason` each is marked expired or sold_out.
+    """
+    if reason is None:
+        reason = case((FoodListing.expiry_date < expired_before, "expired"), else_="sold_out")
+    else:
+        reason = literal(reason)
+    columns = ["id", "name", "description", "category", "user_id", "stock", "price",
+               "expiry_date", "sku", "created_at", "archived_at", "archive_reason"]
+    db.session.execute(insert(ArchivedFoodListing).from_select(
+        columns,
+        select(
+            FoodListing.id, FoodListing.name, FoodListing.description, FoodListing.category,
+            FoodListing.user_id, FoodListing.stock, FoodListing.price, FoodListing.expiry_date,
+            FoodListing.sku, FoodListing.created_at, literal(utcnow()), reason,
+        ).where(FoodListing.id.in_(ids))
+    ))
+    # Re-point purchases at the archived row before the live row disappears
+    db.session.execute(
+        update(Purchase)
+        .where(Purchase.food_id.in_(ids))
+        .values(archived_food_id=Purchase.food_id, food_id=None)
+    )
+    db.session.execute(delete(FoodListing).where(FoodListing.id.in_(ids)).execution_options(entity_ids=ids))
+    db.session.commit()
+
+
+def sweep_listings(batch_size=DEFAULT_BATCH_SIZE, max_batches=None):
+    """
+    Archive expired and long-sold-out listings in bounded batches.
+    Each batch is its own transaction so writers are never blocked for long.
+    Returns the number of listings archived.
+    """
+    expired_before = date.today() - timedelta(days=EXPIRED_GRACE_DAYS)
+    sold_out_before = utcnow() - timedelta(days=SOLD_OUT_GRACE_DAYS)
+
+    archived = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        ids = _candidate_ids(batch_size, expired_before, sold_out_before)
+        if not ids:
+            break
+        try:
+            archive_batch(ids, expired_before)
+        except Exception:
+            db.session.rollback()
+            raise
+        archived += len(ids)
+        batches += 1
+        if len(ids) < batch_size:
+            break
+    return archived
+
+
+def start_sweeper(app, interval):
+    """Run the reservation, listing and idempotency-key sweeps every `interval` seconds on a daemon thread"""
+    def run():
+        while True:
+            time.sleep(interval)
+            with app.app_context():
+                try:
+                    release_expired_reservations()
+                except Exception:
+                    db.session.rollback()
+                    app.logger.exception("Reservation release failed")
+                try:
+                    archived = sweep_listings()
+                    if archived:
+                        app.logger.info("Archived %d expired/sold-out listings", archived)
+                except Exception:
+                    app.logger.exception("Listing sweep failed")
+                try:
+                    sweep_idempotency_keys()
+                except Exception:
+                    db.session.rollback()
+                    app.logger.exception("Idempotency key sweep failed")
+
+    thread = threading.Thread(target=run, name="listing-sweeper", daemon=True)
+    thread.start()
+    return thread
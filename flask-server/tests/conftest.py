@@ -0,0 +1,145 @@
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jwt.algorithms import RSAAlgorithm
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# The app reads its database and export directory at import time
+_scratch = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(_scratch, "test.db")
+os.environ["EXPORT_DIR"] = os.path.join(_scratch, "exports")
+os.environ["ADMIN_TOKEN_KEYS"] = "k1:first-test-key"
+
+from app import app as flask_app  # noqa: E402
+from extensions import db  # noqa: E402
+from models import User  # noqa: E402
+import entity_cache  # noqa: E402
+import idempotency  # noqa: E402
+from firebase_auth import FirebaseVerifier  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    yield flask_app
+    # Empty every table (the version counters stay) and forget cached rows and responses
+    with flask_app.app_context():
+        db.session.remove()
+        with db.engine.begin() as conn:
+            for table in reversed(db.metadata.sorted_tables):
+                if table.name != "table_version":
+                    conn.execute(table.delete())
+    for cache in entity_cache._caches.values():
+        cache.invalidate(entity_cache.ALL)
+    idempotency._recent.clear()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def add_user(app):
+    """Insert a user directly (as an operator would, e.g. an admin or a pre-linked UID); returns its id"""
+    def add(name, email, role="customer", firebase_uid=None):
+        with app.app_context():
+            user = User(name=name, email=email, role=role, firebase_uid=firebase_uid)
+            db.session.add(user)
+            db.session.commit()
+            return user.id
+    return add
+
+
+@pytest.fixture
+def admin(client, add_user):
+    """Headers carrying an admin token"""
+    add_user("Admin", "admin@example.com", role="admin")
+    response = client.post("/api/admin/login", json={
+        "secret_key": "lastbite_admin_2024_secret", "email": "admin@example.com"
+    })
+    return {"Authorization": f"Bearer {response.get_json()['data']['admin_token']}"}
+
+
+@pytest.fixture
+def store(client):
+    """A store owner; returns its id"""
+    response = client.post("/api/users/", json={"name": "Store", "email": "store@example.com", "role": "store_owner"})
+    return response.get_json()["data"]["id"]
+
+
+@pytest.fixture
+def make_food(client, store):
+    """Create a listing for `store`; returns its id"""
+    def make(**fields):
+        body = {"name": "Bread", "category": "Bakery", "user_id": store, "stock": 3, "price": 2.5,
+                "expiry_date": "2099-01-01", **fields}
+        response = client.post("/api/foods/", json=body)
+        assert response.status_code == 201, response.get_json()
+        return response.get_json()["data"]["id"]
+    return make
+
+
+class KeyServer:
+    """Stands in for Google's key endpoint: serves `keys` as a JWK set and counts fetches"""
+
+    def __init__(self, max_age=3600):
+        self.keys = {}
+        self.max_age = max_age
+        self.fetches = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.fetches += 1
+                body = json.dumps({"keys": [
+                    {**json.loads(RSAAlgorithm.to_jwk(key.public_key())), "kid": kid, "alg": "RS256", "use": "sig"}
+                    for kid, key in server.keys.items()
+                ]}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Cache-Control", f"public, max-age={server.max_age}, must-revalidate")
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = HTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}/keys"
+        threading.Thread(target=self.httpd.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True).start()
+
+
+@pytest.fixture(scope="session")
+def rsa_key():
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+@pytest.fixture
+def firebase(app, rsa_key):
+    """
+    Point the app's ID token verifier at a local key server holding `rsa_key` as
+    kid "k1". `firebase.token(uid, **claims)` signs a valid token for the test project.
+    """
+    server = KeyServer()
+    server.keys["k1"] = rsa_key
+    original = app.extensions["firebase_auth"]
+    app.extensions["firebase_auth"] = FirebaseVerifier("test-project", server.url)
+
+    def token(uid, key=rsa_key, kid="k1", **claims):
+        now = int(time.time())
+        payload = {"iss": "https://securetoken.google.com/test-project", "aud": "test-project",
+                   "sub": uid, "iat": now, "auth_time": now, "exp": now + 3600, **claims}
+        return jwt.encode(payload, key, algorithm="RS256", headers={"kid": kid})
+
+    server.token = token
+    server.verifier = app.extensions["firebase_auth"]
+    yield server
+    app.extensions["firebase_auth"] = original
+    server.httpd.shutdown()
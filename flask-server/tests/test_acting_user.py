@@ -0,0 +1,118 @@
+import pytest
+
+
+@pytest.fixture
+def buyer(add_user):
+    return add_user("Buyer", "buyer@example.com", firebase_uid="buyer-uid")
+
+
+def bearer(token):
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_purchases_need_the_buyers_token_when_one_is_sent(client, firebase, buyer, make_food):
+    food_id = make_food()
+    body = {"user_id": buyer, "food_id": food_id, "quantity_bought": 1}
+
+    assert client.post("/api/purchases/", json=body, headers=bearer(firebase.token("intruder"))).status_code == 403
+    created = client.post("/api/purchases/", json=body, headers=bearer(firebase.token("buyer-uid")))
+    assert created.status_code == 201
+    purchase_id = created.get_json()["data"]["id"]
+
+    assert client.delete(f"/api/purchases/{purchase_id}", headers=bearer(firebase.token("intruder"))).status_code == 403
+    assert client.delete(f"/api/purchases/{purchase_id}", headers=bearer(firebase.token("buyer-uid"))).status_code == 200
+
+
+def test_tokenless_writes_follow_firebase_auth_required(app, client, buyer, make_food):
+    body = {"user_id": buyer, "food_id": make_food(), "quantity_bought": 1}
+    assert client.post("/api/purchases/", json=body).status_code == 201
+
+    app.config["FIREBASE_AUTH_REQUIRED"] = True
+    try:
+        assert client.post("/api/purchases/", json=body).status_code == 401
+    finally:
+        app.config["FIREBASE_AUTH_REQUIRED"] = False
+
+
+def test_reservations_need_the_holders_token(client, firebase, buyer, make_food):
+    body = {"user_id": buyer, "food_id": make_food(), "quantity": 1}
+    assert client.post("/api/reservations/", json=body, headers=bearer(firebase.token("intruder"))).status_code == 403
+    held = client.post("/api/reservations/", json=body, headers=bearer(firebase.token("buyer-uid")))
+    reservation_id = held.get_json()["data"]["id"]
+
+    stranger = bearer(firebase.token("intruder"))
+    assert client.post(f"/api/reservations/{reservation_id}/checkout", headers=stranger).status_code == 403
+    assert client.delete(f"/api/reservations/{reservation_id}", headers=stranger).status_code == 403
+    assert client.delete(f"/api/reservations/{reservation_id}", headers=bearer(firebase.token("buyer-uid"))).status_code == 200
+
+
+def test_listings_need_the_owners_token(client, firebase, buyer, make_food):
+    food_id = make_food()
+    # The store fixture has no Firebase UID, so no token can act for it
+    stranger = bearer(firebase.token("buyer-uid"))
+    assert client.put(f"/api/foods/{food_id}", json={"stock": 9}, headers=stranger).status_code == 403
+    assert client.delete(f"/api/foods/{food_id}", headers=stranger).status_code == 403
+    listing = {"name": "Soup", "category": "Meals", "stock": 1, "price": 3.0, "user_id": buyer}
+    assert client.post("/api/foods/bulk", json=[listing], headers=bearer(firebase.token("intruder"))).status_code == 403
+    assert client.post("/api/foods/bulk", json=[listing], headers=stranger).status_code == 201
+
+
+@pytest.fixture
+def required(app):
+    app.config["FIREBASE_AUTH_REQUIRED"] = True
+    yield
+    app.config["FIREBASE_AUTH_REQUIRED"] = False
+
+
+def test_user_writes_need_a_token_when_required(client, firebase, buyer, required):
+    assert client.put(f"/api/users/{buyer}", json={"name": "X"}).status_code == 401
+    assert client.delete(f"/api/users/{buyer}").status_code == 401
+    assert client.post("/api/users/", json={"name": "N", "email": "n@example.com", "role": "customer"}).status_code == 401
+
+
+def test_users_can_only_change_themselves(client, firebase, buyer, add_user):
+    other = add_user("Other", "other@example.com", firebase_uid="other-uid")
+    mine = bearer(firebase.token("buyer-uid"))
+    assert client.put(f"/api/users/{other}", json={"name": "X"}, headers=mine).status_code == 403
+    assert client.delete(f"/api/users/{other}", headers=mine).status_code == 403
+    assert client.put(f"/api/users/{buyer}", json={"name": "Bea"}, headers=mine).status_code == 200
+    assert client.delete(f"/api/users/{buyer}", headers=mine).status_code == 200
+
+
+@pytest.mark.parametrize("change", [{"role": "admin"}, {"firebase_uid": "attacker"}])
+def test_role_and_uid_changes_are_admin_only(client, firebase, buyer, add_user, change):
+    mine = bearer(firebase.token("buyer-uid"))
+    assert client.put(f"/api/users/{buyer}", json=change, headers=mine).status_code == 403
+    # Unchanged values are fine (clients send the whole user back)
+    assert client.put(f"/api/users/{buyer}", json={"role": "customer", "firebase_uid": "buyer-uid"},
+                      headers=mine).status_code == 200
+
+    add_user("Admin", "admin@example.com", role="admin", firebase_uid="admin-uid")
+    admin = bearer(firebase.token("admin-uid"))
+    assert client.put(f"/api/users/{buyer}", json=change, headers=admin).status_code == 200
+
+
+def test_purchase_history_is_private(client, firebase, buyer, add_user, required):
+    assert client.get(f"/api/users/{buyer}/purchases").status_code == 401
+    assert client.get(f"/api/users/{buyer}/purchases", headers=bearer(firebase.token("intruder"))).status_code == 403
+    assert client.get(f"/api/users/{buyer}/purchases", headers=bearer(firebase.token("buyer-uid"))).status_code == 200
+
+    add_user("Admin", "admin@example.com", role="admin", firebase_uid="admin-uid")
+    assert client.get(f"/api/users/{buyer}/purchases", headers=bearer(firebase.token("admin-uid"))).status_code == 200
+
+
+def test_sign_up_takes_the_uid_from_the_token(client, firebase):
+    body = {"name": "Ann", "email": "ann@example.com", "role": "customer", "firebase_uid": "someone-else"}
+    created = client.post("/api/users/", json=body, headers=bearer(firebase.token("ann-uid", email="ann@example.com")))
+    assert created.status_code == 201
+    assert created.get_json()["data"]["firebase_uid"] == "ann-uid"
+
+    mismatch = {**body, "email": "bo@example.com"}
+    assert client.post("/api/users/", json=mismatch, headers=bearer(firebase.token("bo-uid", email="x@example.com"))).status_code == 403
+
+
+def test_tokenless_sign_up_cannot_claim_a_uid_or_admin(client):
+    body = {"name": "Ann", "email": "ann@example.com", "role": "customer"}
+    assert client.post("/api/users/", json={**body, "firebase_uid": "victim"}).status_code == 403
+    assert client.post("/api/users/", json={**body, "role": "admin"}).status_code == 403
+    assert client.post("/api/users/", json=body).status_code == 201
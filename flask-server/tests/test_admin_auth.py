@@ -0,0 +1,84 @@
+import time
+from types import SimpleNamespace
+import pytest
+from flask import Flask
+from admin_auth import AdminTokenError, init_admin_tokens, issue_token, verify_token
+
+ADMIN = SimpleNamespace(id=7, role="admin")
+
+
+def make_app(keys, debug=False):
+    app = Flask(__name__)
+    app.debug = debug
+    init_admin_tokens(app, keys)
+    return app
+
+
+def test_issued_tokens_verify_until_they_expire(monkeypatch):
+    with make_app("k1:secret").app_context():
+        token, expires = issue_token(ADMIN, ttl=60)
+        claims = verify_token(token)
+        assert (claims["sub"], claims["role"], claims["exp"], claims["kid"]) == (7, "admin", expires, "k1")
+
+        monkeypatch.setattr(time, "time", lambda: expires + 1)
+        with pytest.raises(AdminTokenError, match="expired"):
+            verify_token(token)
+
+
+@pytest.mark.parametrize("tamper", [
+    lambda token: token + "x",
+    lambda token: "x" + token,
+    lambda token: token.replace(".", ""),
+    lambda token: "",
+])
+def test_tampered_tokens_are_rejected(tamper):
+    with make_app("k1:secret").app_context():
+        token, _ = issue_token(ADMIN)
+        with pytest.raises(AdminTokenError):
+            verify_token(tamper(token))
+
+
+def test_rotated_keys_keep_old_tokens_valid_until_dropped():
+    with make_app("k1:old").app_context():
+        old_token, _ = issue_token(ADMIN)
+
+    with make_app("k2:new,k1:old").app_context():
+        assert verify_token(old_token)["kid"] == "k1"
+        new_token, _ = issue_token(ADMIN)
+        assert verify_token(new_token)["kid"] == "k2"
+
+    with make_app("k2:new").app_context():
+        assert verify_token(new_token)["kid"] == "k2"
+        with pytest.raises(AdminTokenError, match="Invalid"):
+            verify_token(old_token)
+
+
+def test_missing_keys_only_fall_back_to_a_random_key_in_debug():
+    assert make_app("", debug=True).config["ADMIN_TOKEN_KEYS"][0][0] == "dev"
+    assert make_app("", debug=False).config["ADMIN_TOKEN_KEYS"] == []
+
+
+@pytest.mark.parametrize("secret", [123, ["lastbite_admin_2024_secret"], None, "", "lästbite"])
+def test_login_rejects_bad_secrets_with_401(client, add_user, secret):
+    add_user("Admin", "admin@example.com", role="admin")
+    response = client.post("/api/admin/login", json={"secret_key": secret, "email": "admin@example.com"})
+    assert response.status_code == 401
+
+
+def test_login_is_disabled_without_signing_keys(app, client, add_user):
+    add_user("Admin", "admin@example.com", role="admin")
+    keys = app.config["ADMIN_TOKEN_KEYS"]
+    app.config["ADMIN_TOKEN_KEYS"] = []
+    try:
+        response = client.post("/api/admin/login", json={
+            "secret_key": "lastbite_admin_2024_secret", "email": "admin@example.com"
+        })
+        assert response.status_code == 503
+    finally:
+        app.config["ADMIN_TOKEN_KEYS"] = keys
+
+
+def test_admin_routes_need_a_valid_token(client, admin):
+    assert client.get("/api/admin/users").status_code == 401
+    assert client.get("/api/admin/users", headers={"Authorization": "Bearer nope"}).status_code == 401
+    assert client.get("/api/admin/users", headers=admin).status_code == 200
@@ -0,0 +1,67 @@
+from sqlalchemy import update
+from extensions import db
+from entity_cache import food_cache, user_cache
+from models import FoodListing, TableVersion, User
+
+
+def write_elsewhere(table, row_id, **values):
+    """A write committed by another worker: this process' caches never hear of it"""
+    with db.engine.begin() as conn:
+        conn.execute(update(table.__table__).where(table.__table__.c.id == row_id).values(**values))
+        conn.execute(
+            update(TableVersion.__table__)
+            .where(TableVersion.__table__.c.name == table.__tablename__)
+            .values(version=TableVersion.__table__.c.version + 1)
+        )
+
+
+def test_versioned_get_never_serves_a_stale_row_under_a_new_etag(app, client, store):
+    first = client.get(f"/api/users/{store}")
+    assert client.get(f"/api/users/{store}").get_json()["data"]["name"] == "Store"
+
+    with app.app_context():
+        write_elsewhere(User, store, name="Renamed")
+
+    second = client.get(f"/api/users/{store}")
+    assert second.headers["ETag"] != first.headers["ETag"]
+    assert second.get_json()["data"]["name"] == "Renamed"
+    by_email = client.get("/api/users/by-email/store@example.com")
+    assert by_email.get_json()["data"]["name"] == "Renamed"
+
+
+def test_lookups_outside_versioned_views_use_the_cache(app, store):
+    with app.app_context():
+        assert user_cache.get(store).name == "Store"
+        write_elsewhere(User, store, name="Renamed")
+        # Up to a TTL stale, which existence and ownership checks tolerate
+        assert user_cache.get(store).name == "Store"
+
+
+def test_stock_is_never_cached(app, client, make_food):
+    food_id = make_food(stock=3)
+    with app.app_context():
+        assert not hasattr(food_cache.get(food_id), "stock")
+        with db.engine.begin() as conn:
+            conn.execute(update(FoodListing.__table__).where(FoodListing.__table__.c.id == food_id).values(stock=1))
+    assert client.get(f"/api/foods/{food_id}").get_json()["data"]["stock"] == 1
+
+
+def test_savepoint_rollback_keeps_the_outer_transactions_invalidations(app, store):
+    with app.app_context():
+        user_cache.get(store)
+        db.session.get(User, store).name = "Renamed"
+        db.session.flush()
+        savepoint = db.session.begin_nested()
+        savepoint.rollback()
+        db.session.commit()
+        assert user_cache.get(store).name == "Renamed"
+
+
+def test_admin_login_reads_the_role_from_the_database(app, client, store):
+    with app.app_context():
+        assert user_cache.get_by("email", "store@example.com").role == "store_owner"
+        write_elsewhere(User, store, role="admin")
+    response = client.post("/api/admin/login", json={
+        "secret_key": "lastbite_admin_2024_secret", "email": "store@example.com"
+    })
+    assert response.status_code == 200
@@ -0,0 +1,52 @@
+from datetime import date, timedelta
+import pytest
+
+
+def in_days(days):
+    return (date.today() + timedelta(days=days)).isoformat()
+
+
+@pytest.fixture
+def listings(make_food):
+    make_food(name="Day two", expiry_date=in_days(2))
+    make_food(name="Today", expiry_date=in_days(0))
+    make_food(name="No expiry", expiry_date=None)
+    make_food(name="Tomorrow", expiry_date=in_days(1))
+    make_food(name="Sold out", expiry_date=in_days(1), stock=0)
+    make_food(name="Expired", expiry_date=in_days(-1))
+    make_food(name="Next week", expiry_date=in_days(7))
+    make_food(name="Also tomorrow", expiry_date=in_days(1))
+
+
+def expiring(client, query=""):
+    response = client.get(f"/api/foods/expiring?{query}")
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def test_soonest_first_within_the_default_window(client, listings):
+    # 48 hours from now reaches into the day after tomorrow
+    names = [food["name"] for food in expiring(client)["data"]]
+    assert names == ["Today", "Tomorrow", "Also tomorrow", "Day two"]
+
+
+def test_window_is_in_hours(client, listings):
+    assert [food["name"] for food in expiring(client, "within=1")["data"]][0] == "Today"
+    assert "Next week" not in [food["name"] for food in expiring(client, "within=144")["data"]]
+    assert [food["name"] for food in expiring(client, "within=200")["data"]][-1] == "Next week"
+
+
+def test_pages_keep_the_order(client, listings):
+    seen, cursor = [], None
+    while True:
+        body = expiring(client, "limit=1" + (f"&after={cursor}" if cursor else ""))
+        seen += [food["name"] for food in body["data"]]
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == ["Today", "Tomorrow", "Also tomorrow", "Day two"]
+
+
+@pytest.mark.parametrize("within", ["0", "721", "soon"])
+def test_window_is_validated(client, within):
+    assert client.get(f"/api/foods/expiring?within={within}").status_code == 400
@@ -0,0 +1,39 @@
+import io
+import time
+from datetime import date
+import pyarrow.parquet as pq
+import pytest
+
+
+def test_parquet_export_keeps_column_types(client, admin, make_food):
+    make_food(name="Bread", price=2.5, expiry_date="2099-01-01")
+    make_food(name="Soup", price=4.0, expiry_date=None)
+
+    response = client.get("/api/admin/export/foods?format=parquet", headers=admin)
+    assert response.status_code == 200
+    assert response.mimetype == "application/vnd.apache.parquet"
+
+    table = pq.read_table(io.BytesIO(response.data))
+    rows = table.to_pylist()
+    assert [row["name"] for row in rows] == ["Bread", "Soup"]
+    assert rows[0]["price"] == 2.5
+    assert rows[0]["expiry_date"] == date(2099, 1, 1)
+    assert rows[1]["expiry_date"] is None
+    assert str(table.schema.field("created_at").type) == "timestamp[us]"
+
+
+def test_parquet_export_job_writes_a_readable_file(client, admin, store):
+    started = client.post("/api/admin/export/users/jobs?format=parquet", headers=admin)
+    assert started.status_code == 202
+    status_url = started.get_json()["data"]["status_url"]
+
+    for _ in range(100):
+        data = client.get(status_url, headers=admin).get_json()["data"]
+        if data["status"] != "running":
+            break
+        time.sleep(0.02)
+    assert data["status"] == "done"
+
+    download = client.get(data["download_url"], headers=admin)
+    emails = pq.read_table(io.BytesIO(download.data)).column("email").to_pylist()
+    assert sorted(emails) == ["admin@example.com", "store@example.com"]
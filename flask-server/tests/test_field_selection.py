@@ -0,0 +1,46 @@
+import pytest
+
+
+def test_fields_limit_each_item_to_the_named_keys(client, make_food):
+    food_id = make_food(name="Bread", price=2.5)
+    response = client.get("/api/foods/?fields=id,name,price")
+    assert response.status_code == 200
+    assert response.get_json()["data"] == [{"id": food_id, "name": "Bread", "price": 2.5}]
+
+
+def test_fields_still_page_and_sort_on_unselected_columns(client, make_food):
+    for name, price in [("Cake", 6.0), ("Bun", 1.0), ("Bread", 2.0)]:
+        make_food(name=name, price=price)
+    body = client.get("/api/foods/?fields=name&sort=price&limit=2").get_json()
+    assert body["data"] == [{"name": "Bun"}, {"name": "Bread"}]
+    rest = client.get(f"/api/foods/?fields=name&sort=price&limit=2&after={body['next_cursor']}").get_json()
+    assert rest["data"] == [{"name": "Cake"}]
+
+
+def test_expand_embeds_the_related_record(client, store, make_food):
+    make_food(name="Bread")
+    item = client.get("/api/foods/?fields=name&expand=owner").get_json()["data"][0]
+    assert item["name"] == "Bread"
+    assert item["owner"]["id"] == store
+    assert item["owner"]["email"] == "store@example.com"
+
+
+def test_purchase_expansions(client, store, make_food):
+    food_id = make_food(name="Bread")
+    client.post("/api/purchases/", json={"user_id": store, "food_id": food_id, "quantity_bought": 1})
+    item = client.get("/api/purchases/?fields=quantity_bought&expand=food_item,buyer").get_json()["data"][0]
+    assert item["quantity_bought"] == 1
+    assert item["food_item"]["name"] == "Bread"
+    assert item["buyer"]["id"] == store
+
+
+@pytest.mark.parametrize("query, message", [
+    ("fields=id,colour", "Unknown fields: colour"),
+    ("expand=store", "Cannot expand: store"),
+])
+@pytest.mark.parametrize("path", ["/api/foods/", "/api/foods/expiring", "/api/foods/search?q=bread&"])
+def test_unknown_names_are_400(client, path, query, message):
+    separator = "" if path.endswith("&") else "?"
+    response = client.get(f"{path}{separator}{query}")
+    assert response.status_code == 400
+    assert response.get_json()["message"] == message
@@ -0,0 +1,101 @@
+import base64
+import json
+import time
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+from firebase_auth import MIN_KEYS_REFRESH, FirebaseTokenError
+
+
+def _b64(data):
+    return base64.urlsafe_b64encode(json.dumps(data).encode()).rstrip(b"=").decode()
+
+
+@pytest.fixture(scope="module")
+def other_key():
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+def test_valid_token(firebase):
+    claims = firebase.verifier.verify(firebase.token("uid-1", email="a@example.com"))
+    assert claims["sub"] == "uid-1"
+    assert claims["email"] == "a@example.com"
+
+
+def test_keys_are_cached_for_their_max_age(firebase):
+    firebase.verifier.verify(firebase.token("uid-1"))
+    firebase.verifier.verify(firebase.token("uid-2"))
+    assert firebase.fetches == 1
+    assert firebase.verifier.keys.expires == pytest.approx(time.time() + firebase.max_age, abs=5)
+
+
+def test_verified_tokens_are_memoized(firebase):
+    token = firebase.token("uid-1")
+    first = firebase.verifier.verify(token)
+    assert firebase.verifier.verify(token) is first
+
+
+def test_tampered_payload(firebase):
+    header, _, signature = firebase.token("uid-1").split(".")
+    now = int(time.time())
+    forged = _b64({"iss": "https://securetoken.google.com/test-project", "aud": "test-project",
+                   "sub": "admin", "iat": now, "auth_time": now, "exp": now + 3600})
+    with pytest.raises(FirebaseTokenError, match="signature"):
+        firebase.verifier.verify(f"{header}.{forged}.{signature}")
+
+
+def test_signed_by_another_key(firebase, other_key):
+    with pytest.raises(FirebaseTokenError, match="signature"):
+        firebase.verifier.verify(firebase.token("uid-1", key=other_key))
+
+
+@pytest.mark.parametrize("claims, message", [
+    ({"aud": "other-project"}, "another project"),
+    ({"iss": "https://securetoken.google.com/other-project"}, "issuer"),
+    ({"exp": int(time.time()) - 1}, "expired"),
+    ({"iat": int(time.time()) + 600}, "future"),
+    ({"sub": ""}, "subject"),
+])
+def test_rejected_claims(firebase, claims, message):
+    with pytest.raises(FirebaseTokenError, match=message):
+        firebase.verifier.verify(firebase.token("uid-1", **claims))
+
+
+def test_unknown_kid_refetches_at_most_once_a_minute(firebase, other_key):
+    firebase.verifier.verify(firebase.token("uid-1"))
+    firebase.keys["k2"] = other_key
+    rotated = firebase.token("uid-1", key=other_key, kid="k2")
+
+    # Keys were fetched moments ago, so an unknown kid doesn't trigger another fetch
+    with pytest.raises(FirebaseTokenError, match="unknown key"):
+        firebase.verifier.verify(rotated)
+    assert firebase.fetches == 1
+
+    firebase.verifier.keys.fetched -= MIN_KEYS_REFRESH
+    assert firebase.verifier.verify(rotated)["sub"] == "uid-1"
+    assert firebase.fetches == 2
+
+
+@pytest.mark.parametrize("header", [
+    {"alg": "RS256", "kid": ["k1"]},
+    {"alg": "RS256", "kid": {"k": 1}},
+    {"alg": "RS256"},
+    {"alg": "HS256", "kid": "k1"},
+    {"alg": "none", "kid": "k1"},
+    ["not", "an", "object"],
+])
+def test_malformed_header(firebase, header):
+    _, payload, signature = firebase.token("uid-1").split(".")
+    with pytest.raises(FirebaseTokenError):
+        firebase.verifier.verify(f"{_b64(header)}.{payload}.{signature}")
+
+
+@pytest.mark.parametrize("token", ["", "abc", "a.b", "a.b.c", "!!!.@@@.###"])
+def test_malformed_token(firebase, token):
+    with pytest.raises(FirebaseTokenError):
+        firebase.verifier.verify(token)
+
+
+def test_bad_bearer_token_is_401_not_500(client, firebase):
+    bad = _b64({"alg": "RS256", "kid": ["x"]}) + ".e30.c2ln"
+    response = client.get("/api/foods/", headers={"Authorization": f"Bearer {bad}"})
+    assert response.status_code == 401
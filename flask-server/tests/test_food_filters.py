@@ -0,0 +1,60 @@
+from datetime import date, timedelta
+import pytest
+
+
+@pytest.fixture
+def catalogue(client, store, make_food):
+    other = client.post("/api/users/", json={"name": "Deli", "email": "deli@example.com", "role": "store_owner"})
+    deli = other.get_json()["data"]["id"]
+    yesterday = (date.today() - timedelta(days=1)).isoformat()
+    make_food(name="Bread", category="Bakery", price=2.0, stock=3, expiry_date="2099-01-01")
+    make_food(name="Cake", category="Bakery", price=6.0, stock=0, expiry_date="2099-06-01")
+    make_food(name="Bun", category="Bakery", price=1.0, stock=5, expiry_date=None)
+    make_food(name="Stale", category="Bakery", price=0.5, stock=4, expiry_date=yesterday)
+    make_food(name="Soup", category="Meals", price=4.0, stock=2, expiry_date="2099-03-01", user_id=deli)
+    return {"store": store, "deli": deli}
+
+
+def names(client, query):
+    response = client.get(f"/api/foods/?{query}")
+    assert response.status_code == 200, response.get_json()
+    return [food["name"] for food in response.get_json()["data"]]
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("", ["Bread", "Cake", "Bun", "Soup"]),
+    ("include_expired=true", ["Bread", "Cake", "Bun", "Stale", "Soup"]),
+    ("category=Bakery&in_stock=true", ["Bread", "Bun"]),
+    ("category=Bakery&in_stock=false", ["Cake"]),
+    ("min_price=1.5&max_price=5", ["Bread", "Soup"]),
+    ("category=Bakery&max_price=2&sort=price", ["Bun", "Bread"]),
+    ("expires_before=2099-04-01&sort=expiry", ["Bread", "Soup"]),
+    ("in_stock=true&sort=expiry", ["Bread", "Soup", "Bun"]),
+    ("include_expired=true&max_price=1&sort=price", ["Stale", "Bun"]),
+    ("category=Meals&min_price=5", []),
+])
+def test_filters_combine(client, catalogue, query, expected):
+    assert names(client, query) == expected
+
+
+def test_owner_filter_combines_with_the_rest(client, catalogue):
+    assert names(client, f"owner={catalogue['deli']}") == ["Soup"]
+    assert names(client, f"owner={catalogue['store']}&in_stock=true&sort=price") == ["Bun", "Bread"]
+    assert names(client, f"owner={catalogue['deli']}&category=Bakery") == []
+
+
+def test_filters_hold_across_pages(client, catalogue):
+    seen, cursor = [], None
+    while True:
+        page = client.get("/api/foods/?in_stock=true&sort=price&limit=1" + (f"&after={cursor}" if cursor else ""))
+        body = page.get_json()
+        seen += [food["name"] for food in body["data"]]
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == ["Bun", "Bread", "Soup"]
+
+
+@pytest.mark.parametrize("query", ["min_price=-1", "in_stock=maybe", "sort=name", "expires_before=soon"])
+def test_invalid_filters_are_400(client, query):
+    assert client.get(f"/api/foods/?{query}").status_code == 400
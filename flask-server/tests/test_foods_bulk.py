@@ -0,0 +1,51 @@
+def listing(store, **fields):
+    return {"name": "Bread", "category": "Bakery", "user_id": store, "stock": 2, "price": 1.5, **fields}
+
+
+def names(client):
+    return [food["name"] for food in client.get("/api/foods/").get_json()["data"]]
+
+
+def mixed(store):
+    return [
+        listing(store, name="Bagel", sku="B-1"),
+        listing(store, name="Bad price", price=-1),
+        listing(store, name="Scone", sku="B-1"),
+        listing(999999, name="Orphan"),
+        listing(store, name="Soup", category="Meals"),
+    ]
+
+
+def test_valid_rows_are_created_and_the_rest_reported_by_index(client, store):
+    response = client.post("/api/foods/bulk", json=mixed(store))
+    assert response.status_code == 201
+    body = response.get_json()
+    assert [food["name"] for food in body["data"]] == ["Bagel", "Soup"]
+    assert [(error["index"], sorted(error["errors"])) for error in body["errors"]] == [
+        (1, ["price"]), (2, ["sku"]), (3, ["user_id"]),
+    ]
+    assert names(client) == ["Bagel", "Soup"]
+
+
+def test_atomic_requests_create_nothing_if_any_row_fails(client, store):
+    response = client.post("/api/foods/bulk?atomic=true", json=mixed(store))
+    assert response.status_code == 400
+    assert [error["index"] for error in response.get_json()["errors"]] == [1, 2, 3]
+    assert names(client) == []
+
+    valid = [listing(store, name="Bagel"), listing(store, name="Soup")]
+    assert client.post("/api/foods/bulk?atomic=true", json=valid).status_code == 201
+    assert names(client) == ["Bagel", "Soup"]
+
+
+def test_skus_already_on_file_are_reported(client, store, make_food):
+    make_food(name="Old", sku="B-1")
+    response = client.post("/api/foods/bulk", json=[listing(store, sku="B-1"), listing(store, name="New")])
+    assert response.status_code == 201
+    assert response.get_json()["errors"] == [{"index": 0, "errors": {"sku": ["A listing with this SKU already exists"]}}]
+
+
+def test_a_request_without_a_valid_row_is_refused(client, store):
+    assert client.post("/api/foods/bulk", json=[listing(store, price=-1)]).status_code == 400
+    assert client.post("/api/foods/bulk", json=[]).status_code == 400
+    assert client.post("/api/foods/bulk", json={"name": "Bread"}).status_code == 400
@@ -0,0 +1,50 @@
+import pytest
+from extensions import db
+from entity_cache import user_cache
+from models import IdempotencyKey
+
+
+@pytest.fixture
+def buyers(client):
+    return [
+        client.post("/api/users/", json={"name": name, "email": f"{name}@example.com", "role": "customer"})
+        .get_json()["data"]["id"]
+        for name in ("ann", "bo")
+    ]
+
+
+def purchase(client, user_id, food_id, key="order-1"):
+    return client.post("/api/purchases/", json={"user_id": user_id, "food_id": food_id, "quantity_bought": 1},
+                       headers={"Idempotency-Key": key})
+
+
+def test_retry_replays_the_stored_response(client, buyers, make_food):
+    food_id = make_food()
+    first = purchase(client, buyers[0], food_id)
+    retry = purchase(client, buyers[0], food_id)
+    assert first.status_code == retry.status_code == 201
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.get_json() == first.get_json()
+
+
+def test_keys_are_scoped_per_user(client, buyers, make_food):
+    food_id = make_food()
+    assert purchase(client, buyers[0], food_id).status_code == 201
+    second = purchase(client, buyers[1], food_id)
+    assert second.status_code == 201
+    assert "Idempotent-Replayed" not in second.headers
+
+
+def test_a_view_that_raises_releases_its_key(app, client, buyers, make_food, monkeypatch):
+    food_id = make_food()
+
+    def broken(pk):
+        raise RuntimeError("database went away")
+
+    monkeypatch.setattr(user_cache, "get", broken)
+    assert purchase(client, buyers[0], food_id).status_code == 500
+    with app.app_context():
+        assert db.session.query(IdempotencyKey).count() == 0
+
+    monkeypatch.undo()
+    assert purchase(client, buyers[0], food_id).status_code == 201
@@ -0,0 +1,52 @@
+import pytest
+from models import FoodListing
+
+CSV = "sku,name,category,stock,price\nA1,Bread,Bakery,5,2.5\nB2,Milk,Dairy,3,1.0\n"
+
+
+@pytest.fixture
+def pos_store(add_user):
+    return add_user("POS Store", "pos@example.com", role="store_owner", firebase_uid="store-uid")
+
+
+def sync(client, store_id, body, token=None, **args):
+    headers = {"Content-Type": "text/csv"}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    query = "&".join(f"{key}={value}" for key, value in args.items())
+    return client.post(f"/api/stores/{store_id}/inventory-sync?{query}", data=body, headers=headers)
+
+
+def skus(app, store_id):
+    with app.app_context():
+        return sorted(row.sku for row in FoodListing.query.filter_by(user_id=store_id))
+
+
+def test_requires_the_stores_token(client, firebase, pos_store):
+    assert sync(client, pos_store, CSV).status_code == 401
+    assert sync(client, pos_store, CSV, token=firebase.token("someone-else")).status_code == 403
+    assert sync(client, pos_store, CSV, token=firebase.token("store-uid")).status_code == 200
+
+
+def test_keeps_missing_skus_unless_asked(app, client, firebase, pos_store):
+    token = firebase.token("store-uid")
+    sync(client, pos_store, CSV, token=token)
+
+    response = sync(client, pos_store, "sku,name,category,stock,price\nA1,Bread,Bakery,4,2.5\n", token=token)
+    assert response.get_json()["data"]["removed"] == 0
+    assert skus(app, pos_store) == ["A1", "B2"]
+
+    response = sync(client, pos_store, "sku,name,category,stock,price\nA1,Bread,Bakery,4,2.5\n",
+                    token=token, delete_missing="true")
+    assert response.get_json()["data"]["removed"] == 1
+    assert skus(app, pos_store) == ["A1"]
+
+
+@pytest.mark.parametrize("body", ["sku,name,category,stock,price\n", "sku,name\nA1,\nB2,\n"])
+def test_refuses_to_prune_without_valid_rows(app, client, firebase, pos_store, body):
+    token = firebase.token("store-uid")
+    sync(client, pos_store, CSV, token=token)
+
+    response = sync(client, pos_store, body, token=token, delete_missing="true")
+    assert response.status_code == 400
+    assert skus(app, pos_store) == ["A1", "B2"]
@@ -0,0 +1,29 @@
+import json
+from datetime import date, datetime, timezone
+from decimal import Decimal
+import pytest
+from json_provider import OrjsonProvider, StdlibJSONProvider
+
+VALUE = {
+    "day": date(2024, 3, 1),
+    "naive": datetime(2024, 3, 1, 12, 30, 5, 123000),
+    "aware": datetime(2024, 3, 1, 12, 30, tzinfo=timezone.utc),
+    "price": Decimal("2.50"),
+}
+
+
+@pytest.mark.parametrize("provider", [StdlibJSONProvider, OrjsonProvider])
+def test_dates_are_iso_8601(app, provider):
+    body = json.loads(provider(app).dumps(VALUE))
+    assert body == {
+        "day": "2024-03-01",
+        "naive": "2024-03-01T12:30:05.123000",
+        "aware": "2024-03-01T12:30:00+00:00",
+        "price": "2.50",
+    }
+
+
+def test_providers_agree_on_responses(app):
+    with app.test_request_context():
+        bodies = [json.loads(provider(app).response(VALUE).get_data()) for provider in (StdlibJSONProvider, OrjsonProvider)]
+    assert bodies[0] == bodies[1]
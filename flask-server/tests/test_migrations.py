@@ -0,0 +1,103 @@
+import pytest
+from sqlalchemy import create_engine, inspect, select, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from extensions import db
+from migrations import ensure_schema
+from models import FoodListing, Purchase, User
+from sweeper import archive_batch
+
+# Tables as the first release created them
+BASELINE_SCHEMA = [
+    """CREATE TABLE user (
+        id INTEGER NOT NULL, name VARCHAR(100) NOT NULL, email VARCHAR(120) NOT NULL,
+        role VARCHAR(20) NOT NULL, firebase_uid VARCHAR(128),
+        PRIMARY KEY (id), UNIQUE (email), UNIQUE (firebase_uid))""",
+    """CREATE TABLE food_listing (
+        id INTEGER NOT NULL, name VARCHAR(100) NOT NULL, description VARCHAR(500),
+        category VARCHAR(50) NOT NULL, user_id INTEGER NOT NULL, stock INTEGER NOT NULL,
+        price FLOAT NOT NULL, expiry_date DATE,
+        PRIMARY KEY (id), FOREIGN KEY(user_id) REFERENCES user (id))""",
+    """CREATE TABLE purchase (
+        id INTEGER NOT NULL, user_id INTEGER NOT NULL, food_id INTEGER NOT NULL,
+        quantity_bought INTEGER NOT NULL, purchase_date DATETIME NOT NULL,
+        PRIMARY KEY (id), FOREIGN KEY(user_id) REFERENCES user (id),
+        FOREIGN KEY(food_id) REFERENCES food_listing (id))""",
+    "INSERT INTO user VALUES (1, 'Store', 'store@example.com', 'store_owner', NULL)",
+    "INSERT INTO food_listing VALUES (1, 'Bread', NULL, 'Bakery', 1, 3, 2.5, '2099-01-01')",
+    "INSERT INTO purchase VALUES (1, 1, 1, 2, '2024-05-01 10:00:00')",
+]
+
+
+@pytest.fixture
+def baseline_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'baseline.db'}")
+    with engine.begin() as conn:
+        for statement in BASELINE_SCHEMA:
+            conn.execute(text(statement))
+    db.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+def test_upgrades_baseline_tables(baseline_engine):
+    ensure_schema(baseline_engine)
+    ensure_schema(baseline_engine)  # second run is a no-op
+
+    inspector = inspect(baseline_engine)
+    columns = {column["name"]: column for column in inspector.get_columns("purchase")}
+    assert columns["food_id"]["nullable"]
+    assert "archived_food_id" in columns
+    assert {"ix_purchase_user_date", "ix_purchase_food_date"} <= {i["name"] for i in inspector.get_indexes("purchase")}
+    assert "ix_food_listing_expiring" in {i["name"] for i in inspector.get_indexes("food_listing")}
+
+    with Session(baseline_engine) as session:
+        # Every mapped column is readable and the old rows survived
+        assert session.execute(select(User.email)).scalar_one() == "store@example.com"
+        assert session.execute(select(FoodListing.name)).scalar_one() == "Bread"
+        assert session.execute(select(Purchase.food_id, Purchase.quantity_bought)).one() == (1, 2)
+        # Sale prices weren't recorded, so old purchases take the listing's price
+        assert session.execute(select(Purchase.unit_price)).scalar_one() == 2.5
+        sql = session.execute(text("SELECT sql FROM sqlite_master WHERE name = 'food_listing'")).scalar()
+        assert "AUTOINCREMENT" in sql
+
+
+def test_archived_listing_id_is_never_reused(app, make_food):
+    first = make_food(stock=0)
+    with app.app_context():
+        archive_batch([first], reason="sold_out")
+    second = make_food(stock=0)
+    assert second > first
+    with app.app_context():
+        archive_batch([second], reason="sold_out")  # used to fail on archived_food_listing.id
+
+
+def test_backfills_created_at_from_purchase_history(baseline_engine):
+    with baseline_engine.begin() as conn:
+        conn.execute(text("INSERT INTO user VALUES (2, 'Idle', 'idle@example.com', 'customer', NULL)"))
+    ensure_schema(baseline_engine)
+
+    with Session(baseline_engine) as session:
+        created = dict(session.execute(select(User.email, User.created_at)).all())
+        assert created["store@example.com"].isoformat() == "2024-05-01T10:00:00"
+        # No purchases of its own: the first purchase on record
+        assert created["idle@example.com"].isoformat() == "2024-05-01T10:00:00"
+        assert session.execute(select(FoodListing.created_at)).scalar_one().isoformat() == "2024-05-01T10:00:00"
+        columns = {column["name"]: column for column in inspect(baseline_engine).get_columns("user")}
+        assert not columns["created_at"]["nullable"]
+
+
+def test_adds_sku_column_and_unique_index(baseline_engine):
+    ensure_schema(baseline_engine)
+
+    inspector = inspect(baseline_engine)
+    assert "sku" in {column["name"] for column in inspector.get_columns("food_listing")}
+    indexes = {index["name"]: index for index in inspector.get_indexes("food_listing")}
+    assert indexes["ux_food_listing_user_sku"]["unique"]
+    with baseline_engine.begin() as conn:
+        conn.execute(text("UPDATE food_listing SET sku = 'A1' WHERE id = 1"))
+    with pytest.raises(IntegrityError), baseline_engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO food_listing (name, category, user_id, stock, price, sku, created_at) "
+            "VALUES ('Copy', 'Bakery', 1, 1, 1.0, 'A1', '2024-05-02')"
+        ))
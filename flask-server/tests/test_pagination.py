@@ -0,0 +1,43 @@
+import pytest
+from pagination import encode_cursor
+
+
+def test_pages_through_every_listing(client, make_food):
+    ids = [make_food(name=f"Bread {n}") for n in range(5)]
+    seen, cursor = [], None
+    while True:
+        response = client.get("/api/foods/?limit=2" + (f"&after={cursor}" if cursor else ""))
+        body = response.get_json()
+        seen += [food["id"] for food in body["data"]]
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == ids
+
+
+@pytest.mark.parametrize("path, values", [
+    ("/api/foods/", ["1"]),
+    ("/api/foods/", [True]),
+    ("/api/foods/?sort=price", ["cheap", 1]),
+    ("/api/foods/?sort=expiry", [{"dt": "2099-01-01T00:00:00"}, 1]),
+    ("/api/purchases/", [None]),
+    ("/api/users/", [1.5]),
+])
+def test_cursor_values_of_the_wrong_type_are_rejected(client, path, values):
+    separator = "&" if "?" in path else "?"
+    response = client.get(f"{path}{separator}after={encode_cursor(values)}")
+    assert response.status_code == 400
+    assert response.get_json()["message"] == "Invalid cursor"
+
+
+@pytest.mark.parametrize("values", [[{"dt": "garbage"}, 1], [{"d": "x"}, 1], [{"dt": 5}, 1], [{"d": None}, 1]])
+def test_malformed_dates_in_a_cursor_are_rejected(client, values):
+    response = client.get(f"/api/foods/?sort=expiry&after={encode_cursor(values)}")
+    assert response.status_code == 400
+    assert response.get_json()["message"] == "Invalid cursor"
+
+
+def test_cursor_values_of_the_right_type_are_accepted(client, make_food):
+    make_food()
+    assert client.get(f"/api/foods/?sort=price&after={encode_cursor([1, 0])}").status_code == 200
+    assert client.get(f"/api/foods/?sort=expiry&after={encode_cursor([None, 0])}").status_code == 200
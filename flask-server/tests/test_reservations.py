@@ -0,0 +1,82 @@
+from datetime import timedelta
+import pytest
+from sqlalchemy import update
+from extensions import db
+from models import FoodListing, Reservation, utcnow
+
+
+@pytest.fixture
+def buyer(client):
+    return client.post("/api/users/", json={"name": "Ann", "email": "ann@example.com", "role": "customer"}).get_json()["data"]["id"]
+
+
+def hold(client, user_id, food_id, quantity):
+    response = client.post("/api/reservations/", json={"user_id": user_id, "food_id": food_id, "quantity": quantity})
+    assert response.status_code == 201, response.get_json()
+    return response.get_json()["data"]["id"]
+
+
+def stock(app, food_id):
+    with app.app_context():
+        return db.session.get(FoodListing, food_id).stock
+
+
+def holds(app):
+    with app.app_context():
+        return db.session.query(Reservation).count()
+
+
+def test_expired_holds_are_released_when_stock_runs_short(app, client, buyer, make_food):
+    food_id = make_food(stock=3)
+    hold(client, buyer, food_id, 3)
+    with app.app_context():
+        db.session.execute(update(Reservation).values(expires_at=utcnow() - timedelta(minutes=1)))
+        db.session.commit()
+
+    response = client.post("/api/purchases/", json={"user_id": buyer, "food_id": food_id, "quantity_bought": 2})
+    assert response.status_code == 201
+    assert stock(app, food_id) == 1
+    assert holds(app) == 0
+
+
+def test_live_holds_are_not_released(client, buyer, make_food):
+    food_id = make_food(stock=3)
+    hold(client, buyer, food_id, 3)
+    response = client.post("/api/purchases/", json={"user_id": buyer, "food_id": food_id, "quantity_bought": 1})
+    assert response.status_code == 400
+
+
+def test_deleting_a_user_puts_their_holds_back_on_sale(app, client, buyer, make_food):
+    food_id = make_food(stock=3)
+    hold(client, buyer, food_id, 2)
+    assert client.delete(f"/api/users/{buyer}").status_code == 200
+    assert stock(app, food_id) == 3
+    assert holds(app) == 0
+
+
+def test_deleting_a_listing_or_its_store_drops_its_holds(app, client, store, buyer, make_food):
+    food_id = make_food(stock=3)
+    hold(client, buyer, food_id, 1)
+    assert client.delete(f"/api/foods/{food_id}").status_code == 200
+    assert holds(app) == 0
+
+    hold(client, buyer, make_food(stock=3), 1)
+    assert client.delete(f"/api/users/{store}").status_code == 200
+    assert holds(app) == 0
+
+
+def test_expired_holds_count_as_stock_in_listing_reads(app, client, buyer, make_food):
+    soon = (utcnow() + timedelta(hours=24)).date().isoformat()
+    food_id = make_food(stock=2, expiry_date=soon)
+    hold(client, buyer, food_id, 2)
+    assert client.get("/api/foods/?in_stock=true").get_json()["data"] == []
+    assert client.get("/api/foods/expiring").get_json()["data"] == []
+
+    with app.app_context():
+        db.session.execute(update(Reservation).values(expires_at=utcnow() - timedelta(minutes=1)))
+        db.session.commit()
+
+    assert [food["id"] for food in client.get("/api/foods/?in_stock=true").get_json()["data"]] == [food_id]
+    assert [food["id"] for food in client.get("/api/foods/expiring").get_json()["data"]] == [food_id]
+    assert client.get(f"/api/foods/{food_id}").get_json()["data"]["stock"] == 2
+    assert holds(app) == 0
@@ -0,0 +1,59 @@
+from extensions import db
+from models import SalesRollup
+from rollups import backfill_sales
+
+
+def totals(client, admin):
+    series = client.get("/api/admin/analytics/sales", headers=admin).get_json()["data"]
+    return [(item["orders"], item["units"], item["revenue"]) for item in series]
+
+
+def rollup_rows(app):
+    with app.app_context():
+        return sorted(
+            (row.store_id, row.category, row.orders, row.units, row.revenue)
+            for row in db.session.query(SalesRollup)
+        )
+
+
+def test_sales_keep_the_price_they_were_made_at(app, client, admin, store, make_food):
+    food_id = make_food(stock=10, price=2.0)
+    bought = client.post("/api/purchases/", json={"user_id": store, "food_id": food_id, "quantity_bought": 2})
+    assert bought.get_json()["data"]["unit_price"] == 2.0
+    purchase_id = bought.get_json()["data"]["id"]
+
+    assert client.put(f"/api/foods/{food_id}", json={"price": 100.0}).status_code == 200
+    assert totals(client, admin) == [(1, 2, 4.0)]
+
+    # Extra units are priced like the rest of the purchase, not at today's price
+    assert client.put(f"/api/purchases/{purchase_id}", json={"quantity_bought": 4}).status_code == 200
+    assert totals(client, admin) == [(1, 4, 8.0)]
+
+    # A new sale at the new price sits next to the old one
+    client.post("/api/purchases/", json={"user_id": store, "food_id": food_id, "quantity_bought": 1})
+    assert totals(client, admin) == [(2, 5, 108.0)]
+    assert client.get(f"/api/stores/{store}/dashboard").get_json()["data"]["orders"]["revenue"] == 108.0
+
+    # Cancelling takes back exactly what the sale added
+    assert client.delete(f"/api/purchases/{purchase_id}").status_code == 200
+    assert totals(client, admin) == [(1, 1, 100.0)]
+
+
+def test_backfill_rebuilds_what_the_live_increments_wrote(app, client, admin, store, make_food):
+    bread = make_food(stock=10, price=2.0)
+    soup = make_food(name="Soup", category="Meals", stock=10, price=3.5)
+    first = client.post("/api/purchases/", json={"user_id": store, "food_id": bread, "quantity_bought": 3})
+    client.post("/api/purchases/batch", json={"user_id": store, "items": [
+        {"food_id": bread, "quantity_bought": 1}, {"food_id": soup, "quantity_bought": 2},
+    ]})
+    client.put(f"/api/foods/{bread}", json={"price": 9.0})
+    client.put(f"/api/purchases/{first.get_json()['data']['id']}", json={"quantity_bought": 2})
+    held = client.post("/api/reservations/", json={"user_id": store, "food_id": soup, "quantity": 1})
+    client.post(f"/api/reservations/{held.get_json()['data']['id']}/checkout")
+    client.put(f"/api/foods/{soup}", json={"price": 0.5})
+
+    live = rollup_rows(app)
+    assert live == [(store, "Bakery", 2, 3, 6.0), (store, "Meals", 2, 3, 10.5)]
+    with app.app_context():
+        backfill_sales()
+    assert rollup_rows(app) == live
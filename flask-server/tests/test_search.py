@@ -0,0 +1,43 @@
+def search(client, q, **params):
+    response = client.get("/api/foods/search", query_string={"q": q, **params})
+    assert response.status_code == 200, response.get_json()
+    return [food["name"] for food in response.get_json()["data"]]
+
+
+def test_finds_words_in_name_description_and_category(client, make_food):
+    make_food(name="Sourdough loaf", description="Baked this morning", category="Bakery")
+    make_food(name="Tomato soup", description="With basil", category="Meals")
+    # Trigram matching is fuzzy, so the best match comes first rather than alone
+    assert search(client, "sourdough")[0] == "Sourdough loaf"
+    assert search(client, "basil") == ["Tomato soup"]
+    assert search(client, "meals") == ["Tomato soup"]
+
+
+def test_typos_still_match(client, make_food):
+    make_food(name="Croissant", category="Bakery")
+    make_food(name="Lasagne", category="Meals")
+    assert search(client, "croisant") == ["Croissant"]
+    assert search(client, "lasagna")[0] == "Lasagne"
+
+
+def test_name_matches_rank_above_description_matches(client, make_food):
+    make_food(name="Sandwich", description="Cheese and pickle on rye")
+    make_food(name="Cheese board", description="Three cheeses")
+    assert search(client, "cheese") == ["Cheese board", "Sandwich"]
+
+
+def test_the_index_follows_updates_and_deletes(client, make_food):
+    food_id = make_food(name="Muffin")
+    client.put(f"/api/foods/{food_id}", json={"name": "Brownie"})
+    assert search(client, "muffin") == []
+    assert search(client, "brownie") == ["Brownie"]
+    client.delete(f"/api/foods/{food_id}")
+    assert search(client, "brownie") == []
+
+
+def test_short_queries_and_limits(client, make_food):
+    for n in range(3):
+        make_food(name=f"Pie {n}")
+    assert search(client, "pi") == ["Pie 0", "Pie 1", "Pie 2"]
+    assert len(search(client, "pie", limit=2)) == 2
+    assert client.get("/api/foods/search?q=%20").status_code == 400
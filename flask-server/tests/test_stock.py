@@ -0,0 +1,87 @@
+import sqlite3
+import threading
+import pytest
+from sqlalchemy.exc import IntegrityError, OperationalError
+from extensions import db
+from models import FoodListing, Purchase
+from transactions import with_retries
+
+
+def stock(app, food_id):
+    with app.app_context():
+        return db.session.get(FoodListing, food_id).stock
+
+
+def test_concurrent_buyers_never_oversell(app, store, make_food):
+    food_id = make_food(stock=3)
+    statuses = []
+    start = threading.Barrier(10)
+
+    def buy():
+        client = app.test_client()
+        start.wait()
+        response = client.post("/api/purchases/", json={"user_id": store, "food_id": food_id, "quantity_bought": 1})
+        statuses.append(response.status_code)
+
+    threads = [threading.Thread(target=buy) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(statuses) == [201] * 3 + [400] * 7
+    assert stock(app, food_id) == 0
+    with app.app_context():
+        assert db.session.query(Purchase).count() == 3
+
+
+@pytest.mark.parametrize("bad_line", [{"food_id": 999999, "quantity_bought": 1}, "short"])
+def test_atomic_batch_with_a_bad_line_changes_nothing(app, client, store, make_food, bad_line):
+    first, second = make_food(stock=5), make_food(stock=1)
+    if bad_line == "short":
+        bad_line = {"food_id": second, "quantity_bought": 2}
+    response = client.post("/api/purchases/batch", json={
+        "user_id": store, "items": [{"food_id": first, "quantity_bought": 2}, bad_line],
+    })
+    assert response.status_code == 400
+    assert stock(app, first) == 5
+    assert stock(app, second) == 1
+    with app.app_context():
+        assert db.session.query(Purchase).count() == 0
+
+
+def failing(errors):
+    """A unit of work that raises each of `errors` in turn, then succeeds"""
+    calls = []
+
+    def work():
+        calls.append(1)
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return "done"
+    return work, calls
+
+
+def locked():
+    return OperationalError("UPDATE food_listing", {}, sqlite3.OperationalError("database is locked"))
+
+
+def test_lock_timeouts_are_retried(app):
+    work, calls = failing([locked(), locked()])
+    with app.app_context():
+        assert with_retries(work) == "done"
+    assert len(calls) == 3
+
+
+def test_retries_give_up_after_the_last_attempt(app):
+    work, calls = failing([locked()] * 3)
+    with app.app_context(), pytest.raises(OperationalError):
+        with_retries(work, attempts=3)
+    assert len(calls) == 3
+
+
+def test_other_errors_are_not_retried(app):
+    work, calls = failing([IntegrityError("INSERT", {}, sqlite3.IntegrityError("UNIQUE constraint failed"))])
+    with app.app_context(), pytest.raises(IntegrityError):
+        with_retries(work)
+    assert len(calls) == 1
@@ -0,0 +1,34 @@
+def test_dashboard_totals_cover_all_orders(client, store, make_food):
+    bread = make_food(stock=100, price=2.5)
+    make_food(name="Milk", stock=0)
+    for _ in range(60):
+        client.post("/api/purchases/", json={"user_id": store, "food_id": bread, "quantity_bought": 1})
+
+    response = client.get(f"/api/stores/{store}/dashboard")
+    assert response.status_code == 200
+    data = response.get_json()["data"]
+    assert data["listings"] == {"total": 2, "active": 1, "urgent": 0, "units_in_stock": 40}
+    # More orders than one page of the order list
+    assert data["orders"] == {"total": 60, "last_24h": 60, "units_sold": 60, "revenue": 150.0}
+
+
+def test_dashboard_of_an_unknown_store_is_404(client):
+    assert client.get("/api/stores/999999/dashboard").status_code == 404
+
+
+def test_orders_are_only_shown_to_the_store_or_an_admin(app, client, firebase, add_user):
+    store = add_user("Store", "store@example.com", role="store_owner", firebase_uid="store-uid")
+    add_user("Admin", "admin@example.com", role="admin", firebase_uid="admin-uid")
+    url = f"/api/stores/{store}/orders"
+
+    def status(uid):
+        return client.get(url, headers={"Authorization": f"Bearer {firebase.token(uid)}"}).status_code
+
+    assert status("someone-else") == 403
+    assert status("store-uid") == 200
+    assert status("admin-uid") == 200
+    app.config["FIREBASE_AUTH_REQUIRED"] = True
+    try:
+        assert client.get(url).status_code == 401
+    finally:
+        app.config["FIREBASE_AUTH_REQUIRED"] = False
@@ -0,0 +1,39 @@
+from sqlalchemy import insert
+from extensions import db
+from entity_cache import user_cache
+from models import User, utcnow
+
+
+def sync(client, uid, email, **body):
+    return client.post("/api/users/sync-firebase", json={"firebase_uid": uid, "email": email, **body})
+
+
+def test_creates_then_finds_the_user(client):
+    created = sync(client, "uid-1", "ann@example.com", name="Ann")
+    assert created.status_code == 201
+    again = sync(client, "uid-1", "ann@example.com")
+    assert again.status_code == 200
+    assert again.get_json()["data"]["id"] == created.get_json()["data"]["id"]
+
+
+def test_links_the_uid_to_an_existing_email(client, store):
+    response = sync(client, "store-uid", "store@example.com")
+    assert response.status_code == 200
+    assert response.get_json()["data"]["id"] == store
+    assert response.get_json()["data"]["firebase_uid"] == "store-uid"
+
+
+def test_uid_taken_after_a_cached_miss_returns_that_user(app, client):
+    with app.app_context():
+        # This worker remembers the UID as missing; another one then creates it
+        assert user_cache.get_by("firebase_uid", "uid-2") is None
+        with db.engine.begin() as conn:
+            conn.execute(insert(User.__table__).values(
+                name="Bo", email="bo@example.com", role="customer", firebase_uid="uid-2", created_at=utcnow()
+            ))
+
+    response = sync(client, "uid-2", "bo.other@example.com")
+    assert response.status_code == 200
+    assert response.get_json()["data"]["email"] == "bo@example.com"
+    with app.app_context():
+        assert user_cache.get_by("firebase_uid", "uid-2").email == "bo@example.com"
@@ -0,0 +1,44 @@
+from extensions import db
+from models import TableVersion, User
+
+
+def versions(app):
+    with app.app_context():
+        return dict(db.session.query(TableVersion.name, TableVersion.version))
+
+
+def test_json_and_ndjson_get_different_etags(client, make_food):
+    make_food()
+    as_json = client.get("/api/foods/")
+    as_ndjson = client.get("/api/foods/", headers={"Accept": "application/x-ndjson"})
+    as_ndjson.close()  # streamed: closing ends the generator and its request context
+    assert as_json.headers["ETag"] != as_ndjson.headers["ETag"]
+    assert "Accept" in as_json.headers["Vary"]
+
+    # A JSON ETag doesn't validate the NDJSON representation
+    retry = client.get("/api/foods/", headers={"Accept": "application/x-ndjson", "If-None-Match": as_json.headers["ETag"]})
+    retry.close()
+    assert retry.status_code == 200
+    cached = client.get("/api/foods/", headers={"If-None-Match": as_json.headers["ETag"]})
+    assert cached.status_code == 304
+
+
+def test_only_tables_behind_get_endpoints_are_versioned(app, client, store, make_food):
+    food_id = make_food()
+    before = versions(app)
+    client.post("/api/reservations/", json={"user_id": store, "food_id": food_id, "quantity": 1},
+                headers={"Idempotency-Key": "hold-1"})
+    after = versions(app)
+    assert after["food_listing"] == before["food_listing"] + 1
+    for name in ("reservation", "idempotency_key", "sales_rollup", "stat_counter"):
+        assert after[name] == before[name]
+
+
+def test_savepoint_rollback_keeps_the_outer_transactions_bump(app, store):
+    before = versions(app)["user"]
+    with app.app_context():
+        db.session.get(User, store).name = "Renamed"
+        db.session.flush()
+        db.session.begin_nested().rollback()
+        db.session.commit()
+    assert versions(app)["user"] == before + 1
@@ -0,0 +1,43 @@
+import random
+import sqlite3
+import time
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError, OperationalError
+from extensions import db
+
+MAX_ATTEMPTS = 5
+# Postgres serialization_failure / deadlock_detected
+RETRYABLE_PGCODES = {"40001", "40P01"}
+
+
+@event.listens_for(Engine, "connect")
+def _configure_sqlite(dbapi_connection, connection_record):
+    """WAL lets readers run alongside the single writer; busy_timeout makes writers queue instead of failing"""
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA busy_timeout=5000")
+        cursor.close()
+
+
+def is_retryable(err):
+    """True for errors that mean 'lost a race, try again' rather than a real failure"""
+    if getattr(err.orig, "pgcode", None) in RETRYABLE_PGCODES:
+        return True
+    return isinstance(err, OperationalError) and "database is locked" in str(err.orig)
+
+
+def with_retries(fn, attempts=MAX_ATTEMPTS):
+    """
+    Run `fn` (which should do its writes and commit) and retry it with jittered
+    backoff when the database reports a serialization failure, deadlock or lock timeout.
+    """
+    for attempt in range(attempts):
+        try:
+            return fn()
+        except DBAPIError as err:
+            db.session.rollback()
+            if not is_retryable(err) or attempt == attempts - 1:
+                raise
+            time.sleep(random.uniform(0, 0.005 * 2 ** attempt))
@@ -0,0 +1,135 @@
+import hashlib
+from datetime import datetime, timezone
+from functools import wraps
+from flask import current_app, g, make_response, request
+from sqlalchemy import event, select, update
+from sqlalchemy.orm import Session
+from extensions import db
+from models import TableVersion
+from streaming import wants_stream
+
+VERSION_TABLE = TableVersion.__tablename__
+
+# Tables some @versioned view reads; writes to any other table bump no counter
+_versioned_tables = set()
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def ensure_table_versions():
+    """Create a counter row for every mapped table that doesn't have one yet"""
+    existing = {row[0] for row in db.session.execute(select(TableVersion.name))}
+    for name in db.metadata.tables:
+        if name != VERSION_TABLE and name not in existing:
+            db.session.add(TableVersion(name=name, version=0, updated_at=_utcnow()))
+    db.session.commit()
+
+
+def _bump(connection, tables):
+    tables = sorted(set(tables) & _versioned_tables)
+    if tables:
+        connection.execute(
+            update(TableVersion.__table__)
+            .where(TableVersion.__table__.c.name.in_(tables))
+            .values(version=TableVersion.__table__.c.version + 1, updated_at=_utcnow())
+        )
+
+
+def _changed_tables(session):
+    return session.info.setdefault("changed_tables", set())
+
+
+def _after_flush(session, flush_context):
+    """Note every table the flush wrote to (cascades included)"""
+    tables = _changed_tables(session)
+    for instance in list(session.new) + list(session.deleted):
+        tables.add(instance.__table__.name)
+    for instance in session.dirty:
+        if session.is_modified(instance, include_collections=False):
+            tables.add(instance.__table__.name)
+
+
+def _do_orm_execute(state):
+    """Bulk insert/update/delete statements bypass the flush, so note them here"""
+    if state.is_insert or state.is_update or state.is_delete:
+        table = getattr(state.statement, "table", None)
+        if table is not None:
+            _changed_tables(state.session).add(table.name)
+
+
+def _before_commit(session):
+    """
+    Bump the noted counters as the last statement of the transaction, so the
+    counter rows (which every writer touches) are locked as briefly as possible.
+    """
+    session.flush()
+    tables = session.info.pop("changed_tables", None)
+    if tables:
+        # Core connection execute, so this doesn't re-enter do_orm_execute
+        _bump(session.connection(), tables)
+
+
+def _after_rollback(session, previous_transaction):
+    # A savepoint rollback leaves the outer transaction's writes in place
+    if previous_transaction.parent is None:
+        session.info.pop("changed_tables", None)
+
+
+def register_version_events():
+    event.listen(Session, "after_flush", _after_flush)
+    event.listen(Session, "do_orm_execute", _do_orm_execute)
+    event.listen(Session, "before_commit", _before_commit)
+    event.listen(Session, "after_soft_rollback", _after_rollback)
+
+
+def versioned(*tables, expand=None, clock=None):
+    """
+    Conditional-GET decorator. The ETag is derived from the request URL and the
+    version counters of `tables` (plus the tables behind any requested ?expand=),
+    so an If-None-Match hit returns 304 after one primary-key lookup and never
+    touches the rows. The negotiated format is part of the ETag too (Vary:
+    Accept). `clock` ("day" or "hour") folds the current time in for views whose
+    result also depends on it.
+    """
+    expand = expand or {}
+    _versioned_tables.update(tables, expand.values())
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            names = set(tables)
+            for name in request.args.get("expand", "").split(","):
+                if name.strip() in expand:
+                    names.add(expand[name.strip()])
+
+            rows = db.session.execute(
+                select(TableVersion.name, TableVersion.version, TableVersion.updated_at)
+                .where(TableVersion.name.in_(names))
+            ).all()
+            # JSON and NDJSON bodies of one URL are different representations
+            parts = [request.full_path, "ndjson" if wants_stream() else "json"]
+            parts += [f"{name}:{version}" for name, version, _ in sorted(rows)]
+            if clock == "day":
+                parts.append(datetime.now().strftime("%Y-%m-%d"))
+            elif clock == "hour":
+                parts.append(datetime.now().strftime("%Y-%m-%d %H"))
+            etag = hashlib.sha1("|".join(parts).encode()).hexdigest()
+            # The entity caches serve this view only rows read at these versions
+            g.table_versions = {name: version for name, version, _ in rows}
+            last_modified = max((updated_at for _, _, updated_at in rows), default=None)
+
+            if request.if_none_match.contains(etag):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            response.vary.add("Accept")
+            if last_modified is not None:
+                response.last_modified = last_modified.replace(tzinfo=timezone.utc)
+            return response
+        return wrapper
+    return decorator